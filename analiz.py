@@ -0,0 +1,799 @@
+import functools
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import hizalama
+import kalite
+from metrikler import asama
+
+# ==========================================
+# 1. YÜZ HARİTALAMA (MediaPipe - 468 Nokta)
+# ==========================================
+
+def yuz_mesh_olustur(max_yuz=1, izleme=False):
+    """
+    Yeni bir FaceMesh örneği kurar. Örnekler thread-safe değildir, her işçi kendi örneğini tutar.
+    izleme=True: video modu, yüz önceki karenin landmark'larından takip edilir (canlı akış).
+    """
+    # mediapipe (~1.5 sn import) modül seviyesinde değil, ilk mesh kurulurken yüklenir:
+    # main'i import etmek (health check, spawn edilen işçiler, araçlar) bu maliyeti ödemez.
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=not izleme,
+        max_num_faces=max_yuz,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+# Grup/klinik fotoğrafları için tek istekte analiz edilebilecek en fazla yüz
+COKLU_YUZ_LIMITI = int(os.environ.get("ANALIZ_COKLU_YUZ_LIMITI", 10))
+
+_yerel = threading.local()
+
+def _coklu_yuz_mesh():
+    # Çok yüzlü mesh sadece ilk çok yüzlü istekte, işçi thread'i başına bir kez kurulur
+    # (tek yüzlü istekler havuzdaki max_num_faces=1 mesh'leri kullanmaya devam eder).
+    if not hasattr(_yerel, "coklu_mesh"):
+        _yerel.coklu_mesh = yuz_mesh_olustur(COKLU_YUZ_LIMITI)
+    return _yerel.coklu_mesh
+
+# ==========================================
+# 2. KARE BAĞLAMI (İstek başına bir kez kurulur)
+# ==========================================
+
+# Bölge landmark indeksleri
+FACE_OVAL = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109]
+T_ZONE = [10, 338, 297, 332, 284, 251, 389, 356, 168, 6, 197, 195, 5, 4]
+LEFT_UNDER_EYE = [349, 348, 347, 346, 345, 340, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
+CHEEK = [116, 117, 118, 100, 126, 209, 198, 50, 101, 203, 205, 36, 123, 137] # kişinin sağ yanağı
+LEFT_CHEEK = [345, 346, 347, 329, 355, 429, 420, 280, 330, 423, 425, 266, 352, 366] # CHEEK'in simetriği
+FOREHEAD = [54, 103, 67, 109, 10, 338, 297, 332, 284, 300, 293, 334, 296, 336, 9, 107, 66, 105, 63, 70] # kaş üstü - saç çizgisi
+
+# ad -> (indeksler, convex hull alınsın mı)
+BOLGELER = {
+    "yuz": (FACE_OVAL, False), # Oval zaten sıralı, eski create_face_mask gibi doğrudan doldurulur
+    "t_bolgesi": (T_ZONE, True),
+    "goz_alti": (LEFT_UNDER_EYE, True),
+    "yanak": (CHEEK, True),
+    "sol_yanak": (LEFT_CHEEK, True),
+    "alin": (FOREHEAD, True),
+}
+
+# İki aşamalı landmark: FaceMesh'e verilen kopyanın uzun kenarı (px)
+LANDMARK_BOYUTU = 640
+
+# Yüz kırpımına eklenen kenar payı: 17x17 blur + 25px adaptive blok (~20px yarıçap)
+# kırpım kenarında da tam kareyle aynı sonucu versin.
+YUZ_PAYI = 24
+
+class Bolge(namedtuple("Bolge", "x y maske")):
+    """Bounding box'a kırpılmış bölge maskesi. (x, y) kırpımın karedeki sol üst köşesi."""
+
+    @property
+    def anahtar(self):
+        return (self.x, self.y) + self.maske.shape
+
+    @property
+    def dilim(self):
+        h, w = self.maske.shape
+        return slice(self.y, self.y + h), slice(self.x, self.x + w)
+
+class KareBaglami:
+    """
+    Bir karenin analiz boyunca paylaşılan durumu. Renk düzlemleri ve bölge
+    maskeleri ilk istendiklerinde hesaplanır ve önbelleğe alınır; maskeler
+    tam kare yerine bölgenin bounding box'ı kadar yer kaplar.
+    """
+
+    def __init__(self, bgr, lab=None, bolgeler=None):
+        self.bgr = bgr
+        self.h, self.w = bgr.shape[:2]
+        self._lab = lab # preprocess_image zaten üretiyor, tekrar dönüştürmeye gerek yok
+        self.noktalar = None
+        self.donusum = None # Kanonik kareye hizalandıysa tam kare -> kanonik 2x3 matris
+        # Kanonik uzayda maskeler önceden hazır gelir (bkz. kanonik_bolgeler)
+        self._bolgeler = dict(bolgeler) if bolgeler else {}
+        self._gri = {}
+        self._hsv = {}
+
+    def landmark_ayarla(self, landmarks, kare_boyutu=None, ofset=(0, 0)):
+        """
+        468+ noktayı tek seferde piksel koordinatına çevirir. Bağlam bir yüz
+        kırpımıysa kare_boyutu (h, w) tam karenin boyutu, ofset de kırpımın
+        tam karedeki (x, y) köşesidir.
+        """
+        h, w = kare_boyutu[:2] if kare_boyutu is not None else (self.h, self.w)
+        normal = np.array([(p.x, p.y) for p in landmarks.landmark], dtype=np.float64)
+        self.noktalar = (normal * (w, h)).astype(np.int32) - np.array(ofset, dtype=np.int32)
+
+    @property
+    def lab(self):
+        if self._lab is None:
+            self._lab = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2LAB)
+        return self._lab
+
+    def bolge(self, ad, pay=0):
+        anahtar = (ad, pay)
+        if anahtar not in self._bolgeler:
+            indeksler, hull_al = BOLGELER[ad]
+            points = self.noktalar[indeksler]
+            if hull_al:
+                points = cv2.convexHull(points)
+            x, y, bw, bh = cv2.boundingRect(points)
+            x0, y0 = max(x - pay, 0), max(y - pay, 0)
+            x1, y1 = min(x + bw + pay, self.w), min(y + bh + pay, self.h)
+            mask = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+            cv2.fillConvexPoly(mask, points - (x0, y0), 255)
+            self._bolgeler[anahtar] = Bolge(x0, y0, mask)
+        return self._bolgeler[anahtar]
+
+    def gri(self, bolge):
+        """Bölge kırpımının gri tonlaması (aynı bölgeyi isteyen modüller paylaşır)."""
+        if bolge.anahtar not in self._gri:
+            self._gri[bolge.anahtar] = cv2.cvtColor(self.bgr[bolge.dilim], cv2.COLOR_BGR2GRAY)
+        return self._gri[bolge.anahtar]
+
+    def hsv(self, bolge):
+        if bolge.anahtar not in self._hsv:
+            self._hsv[bolge.anahtar] = cv2.cvtColor(self.bgr[bolge.dilim], cv2.COLOR_BGR2HSV)
+        return self._hsv[bolge.anahtar]
+
+# ==========================================
+# 3. GÖRÜNTÜ İŞLEME MODÜLLERİ
+# ==========================================
+
+# --- ÖN İŞLEME MOTORLARI (kenar koruyan gürültü azaltma) ---
+# Kanonik karede bilateralFilter(d=9) ön işlemenin neredeyse tamamı; modeli
+# saymazsak pipeline'ın en pahalı adımı. Alternatifler aynı imzayla seçilebilir
+# (ANALIZ_ON_ISLEME). Hepsinin gecikme kazancı ve skorlardaki kayması
+# benchmarks/on_isleme.py ile referans resim setinde ölçülür.
+
+def _bilateral(image):
+    return cv2.bilateralFilter(image, d=9, sigmaColor=75, sigmaSpace=75)
+
+def _hizli_bilateral(image):
+    # İki d=5 geçişi d=9'un yumuşatmasına yakın, ~2.5 kat ucuz
+    denoised = cv2.bilateralFilter(image, d=5, sigmaColor=100, sigmaSpace=75)
+    return cv2.bilateralFilter(denoised, d=5, sigmaColor=100, sigmaSpace=75)
+
+def _kucult_filtrele(image):
+    # Yarı çözünürlükte filtrele, geri büyüt; büyütmenin sildiği ince doku
+    # (tam kare - bulanık kopyası) yarı ağırlıkla geri eklenir.
+    h, w = image.shape[:2]
+    kucuk = cv2.resize(image, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+    filtreli = cv2.resize(cv2.bilateralFilter(kucuk, d=5, sigmaColor=75, sigmaSpace=75), (w, h), interpolation=cv2.INTER_LINEAR)
+    bulanik = cv2.resize(kucuk, (w, h), interpolation=cv2.INTER_LINEAR)
+    return cv2.addWeighted(filtreli, 1.0, cv2.subtract(image, bulanik, dtype=cv2.CV_16S), 0.5, 0, dtype=cv2.CV_8U)
+
+GUIDED_YARICAP, GUIDED_EPS, GUIDED_ALT_ORNEKLEME = 4, 0.004, 2
+
+def _guided(image):
+    """
+    Hızlı guided filter (He & Sun, 2015): gri kılavuz, katsayılar yarı
+    çözünürlükte boxFilter ile hesaplanıp büyütülür. Maliyet yarıçaptan bağımsız.
+    """
+    h, w = image.shape[:2]
+    I = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255
+    p = image.astype(np.float32) / 255
+    s = GUIDED_ALT_ORNEKLEME
+    I_k = cv2.resize(I, (w // s, h // s), interpolation=cv2.INTER_AREA)
+    p_k = cv2.resize(p, (w // s, h // s), interpolation=cv2.INTER_AREA)
+    kutu = (2 * (GUIDED_YARICAP // s) + 1,) * 2
+    ort = lambda x: cv2.boxFilter(x, -1, kutu)
+    ort_I = ort(I_k)
+    var_I = ort(I_k * I_k) - ort_I * ort_I
+    ort_p = ort(p_k)
+    cov_Ip = ort(p_k * I_k[..., None]) - ort_I[..., None] * ort_p
+    a = cov_Ip / (var_I[..., None] + GUIDED_EPS)
+    b = ort_p - a * ort_I[..., None]
+    a = cv2.resize(ort(a), (w, h), interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(ort(b), (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.clip((a * I[..., None] + b) * 255, 0, 255).astype(np.uint8)
+
+ON_ISLEME_MOTORLARI = {
+    "bilateral": _bilateral,
+    "hizli_bilateral": _hizli_bilateral,
+    "kucult_filtrele": _kucult_filtrele,
+    "guided": _guided,
+}
+ON_ISLEME_MOTORU = os.environ.get("ANALIZ_ON_ISLEME", "bilateral")
+if ON_ISLEME_MOTORU not in ON_ISLEME_MOTORLARI:
+    raise ValueError(f"ANALIZ_ON_ISLEME şunlardan biri olmalı: {', '.join(ON_ISLEME_MOTORLARI)}")
+
+def preprocess_image(image, motor=None):
+    """Görüntüyü laboratuvar standardına getirir. (BGR, LAB) çifti döner. motor verilmezse ON_ISLEME_MOTORU."""
+    try:
+        denoised = ON_ISLEME_MOTORLARI[motor or ON_ISLEME_MOTORU](image)
+        lab = cv2.cvtColor(denoised, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        cl = clahe.apply(l)
+        processed = cv2.merge((cl,a,b))
+        return cv2.cvtColor(processed, cv2.COLOR_LAB2BGR), processed
+    except:
+        return image, None
+
+# --- MODÜL 1: KIRIŞIKLIK (Hassasiyet Ayarlı) ---
+def detect_wrinkles_tophat(ctx):
+    try:
+        yuz = ctx.bolge("yuz", YUZ_PAYI)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+        tophat = cv2.morphologyEx(ctx.gri(yuz), cv2.MORPH_TOPHAT, kernel)
+        tophat = cv2.bitwise_and(tophat, tophat, mask=yuz.maske)
+        # Eşik değeri 35'te tutuyoruz (Gençleri yaşlı sanmasın diye)
+        _, thresh = cv2.threshold(tophat, 35, 255, cv2.THRESH_BINARY)
+        wrinkle_pixels = cv2.countNonZero(thresh)
+        face_area = cv2.countNonZero(yuz.maske)
+        if face_area == 0: return 0
+        ratio = (wrinkle_pixels / face_area) * 1000 
+        return ratio
+    except:
+        return 0 
+
+# --- MODÜL 2: LEKE VE AKNE ---
+# Alanlar kanonik karede cv2.contourArea ile aynı (dış konturun poligon alanı);
+# 15-400 aralığı ilk sürümden beri değişmedi, leke sayıları ve skorlar korunur.
+LEKE_MIN_ALAN, LEKE_MAX_ALAN = 15, 400
+LEKE_BOYUT_SINIRLARI = (15, 50, 100, 200, 400)
+# Yanıttaki ad -> BOLGELER'deki ad
+LEKE_BOLGELERI = {"alin": "alin", "sag_yanak": "yanak", "sol_yanak": "sol_yanak"}
+
+def _bos_leke_sonucu():
+    return {
+        "sayi": 0,
+        "boyut_histogrami": {f"{a}-{b}": 0 for a, b in zip(LEKE_BOYUT_SINIRLARI, LEKE_BOYUT_SINIRLARI[1:])},
+        "bolgeler": {ad: 0 for ad in LEKE_BOLGELERI},
+        "merkezler": [],
+    }
+
+def detect_spots_adaptive(ctx):
+    """
+    Kontur alanı cv2.contourArea'dır (C'de kontur başına ~0.5 µs; kanonik
+    karede maliyeti findContours belirler). Alan filtresi, boyut histogramı ve
+    bölge sayımları NumPy ile tüm lekelere birden uygulanır; momentler sadece
+    seçilen konturlar için alınır. Merkezler yüklenen resmin piksel koordinatındadır.
+    """
+    try:
+        yuz = ctx.bolge("yuz", YUZ_PAYI)
+        blur = cv2.GaussianBlur(ctx.gri(yuz), (17, 17), 0)
+        thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 3)
+        thresh = cv2.bitwise_and(thresh, thresh, mask=yuz.maske)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        alanlar = np.array([cv2.contourArea(cnt) for cnt in contours])
+        secili = np.flatnonzero((alanlar > LEKE_MIN_ALAN) & (alanlar < LEKE_MAX_ALAN))
+        alanlar = alanlar[secili]
+        momentler = [cv2.moments(contours[i]) for i in secili] # m00 = alan > LEKE_MIN_ALAN
+        merkezler = np.array([(m["m10"] / m["m00"], m["m01"] / m["m00"]) for m in momentler]).reshape(-1, 2)
+        merkezler = merkezler + (yuz.x, yuz.y) # kanonik kare koordinatı
+
+        sonuc = _bos_leke_sonucu()
+        sonuc["sayi"] = int(alanlar.size)
+        hist, _ = np.histogram(alanlar, bins=LEKE_BOYUT_SINIRLARI)
+        sonuc["boyut_histogrami"] = dict(zip(sonuc["boyut_histogrami"], hist.tolist()))
+
+        tam_sayi = merkezler.astype(np.int32)
+        for ad, bolge_adi in LEKE_BOLGELERI.items():
+            bolge = ctx.bolge(bolge_adi)
+            bh, bw = bolge.maske.shape
+            px, py = tam_sayi[:, 0] - bolge.x, tam_sayi[:, 1] - bolge.y
+            icinde = (px >= 0) & (px < bw) & (py >= 0) & (py < bh)
+            sonuc["bolgeler"][ad] = int(np.count_nonzero(bolge.maske[py[icinde], px[icinde]]))
+
+        if ctx.donusum is not None:
+            merkezler = hizalama.noktalari_donustur(merkezler, cv2.invertAffineTransform(ctx.donusum))
+        sonuc["merkezler"] = np.round(merkezler).astype(int).tolist()
+        return sonuc
+    except Exception as e:
+        print(f"Leke Analizi Hatası: {e}")
+        return _bos_leke_sonucu()
+
+# --- MODÜL 3: CİLT TİPİ (T-Bölgesi Parlaklığı) ---
+def detect_skin_type_advanced(ctx):
+    try:
+        t_zone = ctx.bolge("t_bolgesi")
+        v_channel = ctx.hsv(t_zone)[:,:,2] 
+        t_zone_brightness = cv2.mean(v_channel, mask=t_zone.maske)[0]
+        
+        # Daha bilimsel kategoriler
+        if t_zone_brightness > 160: return "Yağlı/Parlak"
+        elif t_zone_brightness < 100: return "Kuru/Mat"
+        else: return "Karma/Dengeli"
+    except:
+        return "Karma/Dengeli"
+
+# --- MODÜL 4: GÖZ ALTI MORLUKLARI (YENİ 🌟) ---
+def detect_dark_circles(ctx):
+    try:
+        # Sol göz altı bölgesi
+        goz = ctx.bolge("goz_alti")
+        
+        # LAB renk uzayında L (Lightness) kanalına bak
+        l_channel = ctx.lab[goz.dilim][:,:,0]
+        
+        eye_brightness = cv2.mean(l_channel, mask=goz.maske)[0]
+        
+        # Yanak parlaklığıyla kıyasla (Referans noktası)
+        cheek_brightness = eye_brightness + 20 # Varsayılan referans
+        
+        diff = cheek_brightness - eye_brightness
+        
+        if diff > 40: return True # Göz altı çok koyu
+        return False
+    except:
+        return False
+
+# --- MODÜL 5: KIZARIKLIK / HASSASİYET (YENİ 🌟) ---
+def detect_redness(ctx):
+    try:
+        # Yanak bölgesi
+        yanak = ctx.bolge("yanak")
+        
+        # LAB renk uzayında A kanalı (Yeşil-Kırmızı ekseni)
+        a_channel = ctx.lab[yanak.dilim][:,:,1]
+        
+        redness_score = cv2.mean(a_channel, mask=yanak.maske)[0]
+        
+        if redness_score > 150: return True # Cilt kızarık
+        return False
+    except:
+        return False
+
+# ==========================================
+# 4. KARAR MOTORU (MASTERMIND)
+# ==========================================
+
+def goruntu_coz(contents):
+    """Yüklenen baytları BGR kareye çevirir. Çözülemezse None döner."""
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def kucult(frame, uzun_kenar):
+    h, w = frame.shape[:2]
+    olcek = uzun_kenar / max(h, w)
+    if olcek >= 1:
+        return frame
+    return cv2.resize(frame, None, fx=olcek, fy=olcek, interpolation=cv2.INTER_AREA)
+
+def landmark_bul(frame, face_mesh, kucuk=None):
+    """
+    1. aşama: FaceMesh ~640px'lik küçük kopyada çalışır. Landmark'lar normalize
+    koordinat olduğu için geometri tam çözünürlükle aynıdır, maliyet çok düşer.
+    Kopya daha önce üretildiyse (kalite kapısı) kucuk ile verilebilir.
+    """
+    if kucuk is None:
+        kucuk = kucult(frame, LANDMARK_BOYUTU)
+    results = face_mesh.process(cv2.cvtColor(kucuk, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        return None
+    return results.multi_face_landmarks[0]
+
+def yuzleri_bul(frame, kucuk, yuz_sayisi, siralama="boyut"):
+    """
+    Küçük kopyada tek FaceMesh geçişiyle en fazla yuz_sayisi yüz bulur.
+    [(landmarks, kutu), ...] döner; kutu tam karede (x, y, w, h).
+    siralama: "boyut" (büyükten küçüğe) ya da "konum" (soldan sağa, yukarıdan aşağı).
+    """
+    # Mesh en fazla COKLU_YUZ_LIMITI yüzü tespit sırasıyla verir; önce hepsi sıralanır, sonra kesilir
+    results = _coklu_yuz_mesh().process(cv2.cvtColor(kucuk, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        return []
+    h, w = frame.shape[:2]
+    yuzler = []
+    for landmarks in results.multi_face_landmarks:
+        xy = np.array([(p.x * w, p.y * h) for p in landmarks.landmark])
+        x0, y0 = np.maximum(xy.min(axis=0), 0)
+        x1, y1 = np.minimum(xy.max(axis=0), (w, h))
+        yuzler.append((landmarks, [int(x0), int(y0), int(x1 - x0), int(y1 - y0)]))
+    if siralama == "konum":
+        yuzler.sort(key=lambda y: (y[1][0], y[1][1]))
+    else:
+        yuzler.sort(key=lambda y: -y[1][2] * y[1][3])
+    return yuzler[:yuz_sayisi]
+
+@functools.lru_cache(maxsize=1)
+def kanonik_bolgeler():
+    """Bölge maskeleri kanonik uzayda bir kez, şablon landmark'lardan üretilir ve her istekte paylaşılır."""
+    sablon = KareBaglami(np.zeros((hizalama.KANONIK_BOYUT, hizalama.KANONIK_BOYUT, 3), dtype=np.uint8))
+    sablon.noktalar = hizalama.sablon_noktalari().astype(np.int32)
+    for ad in BOLGELER:
+        sablon.bolge(ad)
+    sablon.bolge("yuz", YUZ_PAYI)
+    return sablon._bolgeler
+
+def yuz_baglami_kur(frame, landmarks, sureler=None, kademe="tam"):
+    """
+    2. aşama: yüz, göz ve çene landmark'larıyla sabit boyutlu kanonik kareye
+    hizalanır; ön işleme ve doku modülleri bu kare üzerinde çalışır. Maliyet
+    yükleme çözünürlüğünden bağımsızdır, skorlar cihazlar arası kıyaslanabilir.
+    """
+    sureler = {} if sureler is None else sureler
+    h, w = frame.shape[:2]
+    with asama(sureler, "hizalama"):
+        noktalar = np.array([(p.x * w, p.y * h) for p in landmarks.landmark], dtype=np.float64)
+        M = hizalama.donusum_hesapla(noktalar)
+        kanonik = hizalama.kanonik_kare(frame, M)
+
+    with asama(sureler, "on_isleme"):
+        processed_face, processed_lab = preprocess_image(kanonik, None if kademe == "tam" else KADEME_ON_ISLEME_MOTORU)
+    ctx = KareBaglami(processed_face, processed_lab, kanonik_bolgeler())
+    ctx.noktalar = hizalama.noktalari_donustur(noktalar, M).astype(np.int32)
+    ctx.donusum = M
+    return ctx
+
+def analiz_yap(frame, face_mesh):
+    """
+    Tek karelik deterministik analiz. Ürün önerisi ve DB kaydı burada YAPILMAZ,
+    sadece skorlar ve teşhis döner. Yüz yoksa None döner.
+    """
+    landmarks = landmark_bul(frame, face_mesh)
+    if landmarks is None:
+        return None
+    return skorla(yuz_baglami_kur(frame, landmarks))
+
+# ==========================================
+# MODÜL SEÇİMİ (İstek başına)
+# ==========================================
+# Bazı entegrasyonlar sadece leke sayısını, bazıları sadece cilt tipini
+# istiyor. Modül -> (bağımlılıklar, sonuçtaki alanlar). İstenmeyen modülün
+# dedektörü hiç çalışmaz; gri/HSV/LAB kırpımları KareBaglami'nda tembel
+# üretildiği için onların renk dönüşümleri de yapılmaz.
+# "recete" API tarafındadır (ürün önerisi + DB kaydı), skora ihtiyaç duyar.
+
+MODULLER = {
+    "kirisiklik": ((), ("kirisiklik_skoru", "kirisiklik_indeksi")),
+    "leke": ((), ("leke_skoru", "leke_sayisi", "leke_detay")),
+    "cilt_tipi": ((), ("cilt_tipi",)),
+    "goz_alti": ((), ("goz_alti_morlugu",)),
+    "kizariklik": ((), ("kizariklik",)),
+    "skor": (("kirisiklik", "leke", "cilt_tipi", "goz_alti", "kizariklik"), ("genel_skor", "ana_sorun", "db_kategori")),
+    "recete": (("skor",), ()),
+}
+TUM_MODULLER = frozenset(MODULLER)
+
+def modulleri_coz(istenen):
+    """
+    İstenen modül adlarını bağımlılıklarıyla birlikte frozenset'e çevirir.
+    None ya da boş liste tüm modüller demektir. Bilinmeyen ad ValueError fırlatır.
+    """
+    if not istenen:
+        return TUM_MODULLER
+    bilinmeyen = set(istenen) - TUM_MODULLER
+    if bilinmeyen:
+        raise ValueError(f"Bilinmeyen modül: {', '.join(sorted(bilinmeyen))}. Geçerli modüller: {', '.join(MODULLER)}")
+    cozulen = set()
+    bekleyen = list(istenen)
+    while bekleyen:
+        ad = bekleyen.pop()
+        if ad not in cozulen:
+            cozulen.add(ad)
+            bekleyen.extend(MODULLER[ad][0])
+    return frozenset(cozulen)
+
+def skorla(ctx, sureler=None, moduller=TUM_MODULLER):
+    """
+    Hazır bağlam üzerinde istenen modülleri çalıştırır; "skor" istendiyse
+    puanlar ve teşhis koyar. Sonuçta sadece çalışan modüllerin alanları olur.
+    """
+    sureler = {} if sureler is None else sureler
+    sonuc = {}
+    # Kademe düşürülürken atlanan modüller (bkz. OPSIYONEL_MODULLER) teşhiste "bilinmiyor" sayılır
+    cilt_tipi_raw, has_dark_circles, has_redness = None, False, False
+
+    # --- ANALİZLERİ ÇALIŞTIR ---
+    if "kirisiklik" in moduller:
+        with asama(sureler, "kirisiklik"):
+            wrinkle_index = detect_wrinkles_tophat(ctx)
+        # Gençleri korumak için kırışıklık eşiğini çok yüksek tutuyoruz
+        if wrinkle_index < 12: kirisiklik_puani = 100 # HATA PAYI DÜŞÜRÜLDÜ
+        else: kirisiklik_puani = max(10, 100 - (wrinkle_index * 1.0))
+        sonuc["kirisiklik_skoru"] = int(kirisiklik_puani)
+        sonuc["kirisiklik_indeksi"] = wrinkle_index
+    if "leke" in moduller:
+        with asama(sureler, "leke"):
+            lekeler = detect_spots_adaptive(ctx)
+        spot_count = lekeler.pop("sayi")
+        leke_puani = max(10, 100 - (spot_count * 0.8))
+        sonuc["leke_skoru"] = int(leke_puani)
+        sonuc["leke_sayisi"] = spot_count
+        sonuc["leke_detay"] = lekeler
+    if "cilt_tipi" in moduller:
+        with asama(sureler, "cilt_tipi"):
+            cilt_tipi_raw = detect_skin_type_advanced(ctx)
+        sonuc["cilt_tipi"] = cilt_tipi_raw
+    if "goz_alti" in moduller:
+        with asama(sureler, "goz_alti"):
+            has_dark_circles = detect_dark_circles(ctx)
+        sonuc["goz_alti_morlugu"] = has_dark_circles
+    if "kizariklik" in moduller:
+        with asama(sureler, "kizariklik"):
+            has_redness = detect_redness(ctx)
+        sonuc["kizariklik"] = has_redness
+
+    if "skor" not in moduller:
+        return sonuc
+
+    # --- PUANLAMA MANTIĞI ---
+    genel_skor = int((kirisiklik_puani * 0.45) + (leke_puani * 0.45) + 10)
+
+    # Bonus Puanlar (Cilt iyiyse ödüllendir; çalışmayan modül "sorun yok" sayılmaz)
+    if "goz_alti" in moduller and not has_dark_circles: genel_skor += 2
+    if "kizariklik" in moduller and not has_redness: genel_skor += 2
+    if genel_skor > 100: genel_skor = 100
+
+    # --- TEŞHİS KOYMA (KARAR AĞACI) ---
+    # Burası Elon Musk seviyesi: Sadece sayıya bakmaz, duruma bakar.
+
+    ana_sorun = "Cilt Dengesi İyi" # Varsayılan pozitif
+
+    # 1. Öncelik: CİDDİ SORUNLAR
+    if genel_skor < 85:
+        if spot_count > 25: 
+            ana_sorun = "Akne/Leke Eğilimi"
+        elif kirisiklik_puani < 50: # Sadece puan çok düşükse yaşlanma de
+            ana_sorun = "Elastikiyet Kaybı (Yaşlanma)"
+        elif has_redness:
+            ana_sorun = "Hassas/Kızarık Cilt"
+        elif has_dark_circles:
+            ana_sorun = "Göz Çevresi Yorgunluğu"
+
+    # 2. Öncelik: ORTA SEVİYE SORUNLAR (Gençler buraya düşer)
+    elif genel_skor < 94:
+        if cilt_tipi_raw == "Kuru/Mat":
+            ana_sorun = "Nem İhtiyacı (Kuruluk)"
+        elif cilt_tipi_raw == "Yağlı/Parlak":
+            ana_sorun = "Gözenek/Yağlanma Problemi"
+        elif has_dark_circles:
+            ana_sorun = "Yorgun Görünüm"
+        else:
+            ana_sorun = "Cilt Tonu Eşitsizliği"
+
+    # 3. Öncelik: MÜKEMMEL CİLTLER
+    else:
+        if cilt_tipi_raw == "Yağlı/Parlak":
+            ana_sorun = "Doğal Işıltı (Parlak)"
+        else:
+            ana_sorun = "Mükemmel Cilt Dengesi"
+
+    # --- DB UYUMLULUĞU ---
+    # Veritabanı hala eski anahtar kelimeleri (kuru, yagli, leke, kirisik, normal) bekliyor.
+    # Bu yüzden teşhisi veritabanı diline çeviriyoruz (Mapping).
+
+    db_category = "normal"
+    if "Kuru" in ana_sorun or "Nem" in ana_sorun: db_category = "Kuru Cilt"
+    elif "Yağ" in ana_sorun or "Gözenek" in ana_sorun: db_category = "Yağlı Cilt"
+    elif "Akne" in ana_sorun or "Leke" in ana_sorun or "Ton" in ana_sorun: db_category = "Karma/Normal" # Leke için özel kategori yoksa normalden ver
+    elif "Yaşlanma" in ana_sorun or "Elastikiyet" in ana_sorun: db_category = "Karma/Normal" # Kırışıklık parametresiyle zaten bulunacak
+
+    sonuc["genel_skor"] = genel_skor
+    sonuc["ana_sorun"] = ana_sorun
+    sonuc["db_kategori"] = db_category
+    return sonuc
+
+# Isınmada kullanılan paket içi örnek resim (yoksa boş kareye düşülür)
+ISINMA_RESMI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cilt_Raporu_1764601789.jpg")
+
+def isinma(face_mesh):
+    """
+    Grafiğin ilk çıkarım maliyetini gerçek istekten önce öder. Yüzlü bir kareyle
+    tam pipeline bir kez çalışır: boş kare landmark modelini hiç tetiklemez,
+    kalite kapısının dedektörü ve kanonik maskeler de böylece hazır olur.
+    Bu thread'in çok yüzlü mesh'i de kurulup bir kez çalıştırılır; ilk çok
+    yüzlü istek grafik kurulumunu istek yolunda ödemez.
+    """
+    frame = cv2.imread(ISINMA_RESMI)
+    if frame is None:
+        bos = np.zeros((256, 256, 3), dtype=np.uint8)
+        face_mesh.process(bos)
+        _coklu_yuz_mesh().process(bos)
+        return
+    yuzleri_bul(frame, kucult(frame, LANDMARK_BOYUTU), 1)
+    # İlk çalıştırma grafik kurulumunu da ölçer, kademe tahminine yazılmaz; sıcak maliyet yazılır.
+    kare_analiz(frame, face_mesh, tahmine_kaydet=False)
+    kare_analiz(frame, face_mesh)
+
+def mesh_isinma(face_mesh):
+    """Sadece verilen mesh'in ilk çıkarımını öder (canlı akış bağlantıları; tam pipeline çalışmaz)."""
+    frame = cv2.imread(ISINMA_RESMI)
+    if frame is None:
+        face_mesh.process(np.zeros((256, 256, 3), dtype=np.uint8))
+        return
+    landmark_bul(frame, face_mesh)
+
+# ==========================================
+# ÇOK YÜZLÜ ANALİZ
+# ==========================================
+# Decode, kalite kapısı ve landmark geçişi kare başına bir kez yapılır; her
+# yüz paylaşılan tam kareden kendi kanonik karesine hizalanır ve dedektörler
+# yüz başına paralel çalışır (OpenCV çağrıları GIL'i bırakır). Çekirdeğe
+# sabitlenmiş süreç işçilerinde havuz tek thread'e düşer, yüzler sırayla işlenir.
+
+YUZ_ISCI_SAYISI = int(os.environ.get("ANALIZ_YUZ_ISCI_SAYISI", 0)) # 0: kullanılabilir çekirdek sayısı
+
+_yuz_havuzu = None
+_yuz_havuzu_kilidi = threading.Lock()
+
+def _yuz_havuzu_al():
+    global _yuz_havuzu
+    with _yuz_havuzu_kilidi:
+        if _yuz_havuzu is None:
+            cekirdek = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+            isci = YUZ_ISCI_SAYISI or cekirdek
+            _yuz_havuzu = ThreadPoolExecutor(max_workers=isci, thread_name_prefix="yuz") if isci > 1 else False
+        return _yuz_havuzu
+
+def _yuz_analizi(frame, landmarks, kutu, moduller, kademe):
+    sureler = {}
+    sonuc = skorla(yuz_baglami_kur(frame, landmarks, sureler, kademe), sureler, moduller)
+    sonuc["kutu"] = kutu
+    return sonuc, sureler
+
+def yuzleri_analiz_et(frame, yuzler, sureler, moduller, kademe="tam"):
+    """Her yüz için skorla sonucu (+ 'kutu'). Yüz başına süreler toplanarak sureler'e eklenir."""
+    havuz = _yuz_havuzu_al()
+    isler = [(frame, landmarks, kutu, moduller, kademe) for landmarks, kutu in yuzler]
+    with asama(sureler, "yuzler"):
+        if havuz and len(isler) > 1:
+            ciktilar = list(havuz.map(lambda a: _yuz_analizi(*a), isler))
+        else:
+            ciktilar = [_yuz_analizi(*a) for a in isler]
+    for _, yuz_sureleri in ciktilar:
+        for ad, ms in yuz_sureleri.items():
+            sureler[ad] = sureler.get(ad, 0.0) + ms
+    return [sonuc for sonuc, _ in ciktilar]
+
+# ==========================================
+# GECİKME HEDEFİ (DEADLINE) VE KADEMELER
+# ==========================================
+# Yoğunlukta zaman aşımı yerine biraz daha ucuz bir analiz dönmek tercih
+# edilir. İstek bir deadline (ms, kabulden itibaren) taşıyorsa işçi, kuyrukta
+# ve decode'da geçen süreyi düşüp kalan bütçeye sığan ilk kademeyi seçer.
+# Her kademe bir öncekinin indirimlerini de içerir:
+#   tam          : bilateralFilter(d=9)
+#   hizli_filtre : KADEME_ON_ISLEME_MOTORU (ön işleme ~55 ms -> ~15 ms)
+#   asgari       : skora sadece ek puan/teşhis katan modüller atlanır (ek puanları da verilmez)
+# Kanonik kare her kademede tam kareden çıkarılır: 640px kopyadan 512px'e
+# büyütmek dokuyu siler, leke/kırışıklık sayıları bambaşka çıkar.
+# Kullanılan kademe sonuçta 'kademe' alanında döner; tam olmayanlar önbelleğe
+# ve geçmişe yazılmaz (bkz. main.py).
+
+KADEMELER = ("tam", "hizli_filtre", "asgari")
+OPSIYONEL_MODULLER = frozenset({"cilt_tipi", "goz_alti", "kizariklik"})
+# benchmarks/on_isleme.py: ~3.7 kat hızlı, genel_skor kayması ort. ~2, en fazla 3 puan
+KADEME_ON_ISLEME_MOTORU = "kucult_filtrele"
+
+# Henüz hiç ölçülmemiş kademenin maliyeti, tam kademenin ölçülen maliyetinin bu oranı sayılır
+# (benchmarks/pipeline.py, 1080p yükleme).
+KADEME_ORANLARI = {"tam": 1.0, "hizli_filtre": 0.7, "asgari": 0.65}
+
+# Bir kademenin ölçümü, diğer kademelerin tahminini KADEME_ORANLARI üzerinden
+# bu ağırlıkla çeker. Seçilmeyen kademe hiç ölçülmez; tek yavaş ölçümle şişen
+# "tam" tahmini böylece ucuz kademelerin ölçümleriyle geri iner.
+KADEME_CAPRAZ_AGIRLIK = 0.05
+
+class KademeTahmini:
+    """
+    Kademe başına analiz maliyetinin (kalite kapısından sonuca, ms) kayan
+    ortalaması. Süreç başınadır; her işçi kendi ölçümüyle karar verir.
+    """
+
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self._ort = {}
+
+    def kaydet(self, kademe, ms):
+        with self._kilit:
+            onceki = self._ort.get(kademe)
+            self._ort[kademe] = ms if onceki is None else 0.8 * onceki + 0.2 * ms
+            for diger, tahmin in self._ort.items():
+                if diger != kademe:
+                    beklenen = ms * KADEME_ORANLARI[diger] / KADEME_ORANLARI[kademe]
+                    self._ort[diger] = (1 - KADEME_CAPRAZ_AGIRLIK) * tahmin + KADEME_CAPRAZ_AGIRLIK * beklenen
+
+    def tahmin(self, kademe):
+        with self._kilit:
+            if kademe in self._ort:
+                return self._ort[kademe]
+            tam = self._ort.get("tam")
+        return tam * KADEME_ORANLARI[kademe] if tam is not None else 0.0
+
+    def sec(self, kalan_ms):
+        """Kalan bütçeye sığan en dolu kademe; hiçbiri sığmıyorsa en ucuzu."""
+        for kademe in KADEMELER:
+            if self.tahmin(kademe) <= kalan_ms:
+                return kademe
+        return KADEMELER[-1]
+
+kademe_tahmini = KademeTahmini()
+
+# Motorların işçiye ilettiği istek seçenekleri ve varsayılanları
+VARSAYILAN_SECENEKLER = {"moduller": TUM_MODULLER, "yuz_sayisi": 1, "siralama": "boyut", "deadline_ms": 0}
+
+def bytes_analiz(contents, face_mesh, sureler=None, **secenekler):
+    """İşçi giriş noktası: çöz + analiz et. Sonuç sözlüğünde 'durum' alanı vardır."""
+    sureler = {} if sureler is None else sureler
+    with asama(sureler, "decode"):
+        frame = goruntu_coz(contents)
+    if frame is None:
+        return {"durum": "gecersiz", "sureler": sureler}
+    return kare_analiz(frame, face_mesh, sureler, **secenekler)
+
+def kare_analiz(frame, face_mesh, sureler=None, moduller=TUM_MODULLER, yuz_sayisi=1, siralama="boyut", deadline_ms=0,
+                tahmine_kaydet=True):
+    """
+    Çözülmüş kare için işçi giriş noktası. Önce ucuz kalite kapısı çalışır;
+    reddedilen kare ('durum': 'red') FaceMesh ve ön işleme maliyetini hiç ödemez.
+    Aşama süreleri (ms) sonucun 'sureler' alanında döner. moduller, modulleri_coz
+    ile çözülmüş küme olmalıdır. yuz_sayisi > 1 ise sonuç tek yüzün alanları
+    yerine 'yuzler' listesi taşır (bkz. yuzleri_bul sıralaması). deadline_ms > 0
+    ise sureler'de zaten geçmiş süre (kuyruk, decode) düşülerek kademe seçilir.
+    tahmine_kaydet=False: süre kademe tahminine yazılmaz (ısınma).
+    """
+    sureler = {} if sureler is None else sureler
+    kademe = "tam"
+    if deadline_ms:
+        kademe = kademe_tahmini.sec(deadline_ms - sum(sureler.values()))
+    if kademe == "asgari" and "skor" in moduller:
+        moduller = moduller - OPSIYONEL_MODULLER
+    t0 = time.perf_counter()
+    with asama(sureler, "kalite"):
+        kucuk = kucult(frame, LANDMARK_BOYUTU)
+        kalite_sonucu = kalite.kontrol(kucuk)
+    t1 = time.perf_counter()
+    kalite_sonucu["sure_ms"] = round((t1 - t0) * 1000, 2)
+    if kalite_sonucu["red"]:
+        return {"durum": "red", "kalite": kalite_sonucu, "sureler": sureler}
+
+    if yuz_sayisi > 1:
+        with asama(sureler, "landmark"):
+            yuzler = yuzleri_bul(frame, kucuk, min(yuz_sayisi, COKLU_YUZ_LIMITI), siralama)
+        if not yuzler:
+            sonuc = {"durum": "yuz_yok"}
+        else:
+            sonuc = {"durum": "tamam", "yuzler": yuzleri_analiz_et(frame, yuzler, sureler, moduller, kademe),
+                     "kademe": kademe}
+        sonuc["kalite"] = kalite_sonucu
+        sonuc["analiz_ms"] = round((time.perf_counter() - t1) * 1000, 2)
+        sonuc["sureler"] = sureler
+        return sonuc
+
+    with asama(sureler, "landmark"):
+        landmarks = landmark_bul(frame, face_mesh, kucuk)
+    if landmarks is None:
+        sonuc = {"durum": "yuz_yok"}
+    else:
+        sonuc = skorla(yuz_baglami_kur(frame, landmarks, sureler, kademe), sureler, moduller)
+        sonuc["durum"] = "tamam"
+        sonuc["kademe"] = kademe
+        if tahmine_kaydet:
+            kademe_tahmini.kaydet(kademe, (time.perf_counter() - t0) * 1000)
+    sonuc["kalite"] = kalite_sonucu
+    sonuc["analiz_ms"] = round((time.perf_counter() - t1) * 1000, 2)
+    sonuc["sureler"] = sureler
+    return sonuc
+
+def canli_kare_analiz(contents, face_mesh, moduller=TUM_MODULLER):
+    """
+    Canlı akış karesi (bkz. canli.py). face_mesh izleme modundadır; yüz
+    yokluğunu zaten ucuza söylediği için kalite kapısı çalıştırılmaz.
+    """
+    sureler = {}
+    with asama(sureler, "decode"):
+        frame = goruntu_coz(contents)
+    if frame is None:
+        return {"durum": "gecersiz", "sureler": sureler}
+    with asama(sureler, "landmark"):
+        landmarks = landmark_bul(frame, face_mesh)
+    if landmarks is None:
+        return {"durum": "yuz_yok", "sureler": sureler}
+    sonuc = skorla(yuz_baglami_kur(frame, landmarks, sureler), sureler, moduller)
+    sonuc["durum"] = "tamam"
+    sonuc["sureler"] = sureler
+    return sonuc
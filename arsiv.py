@@ -0,0 +1,239 @@
+"""
+Analiz geçmişi için saklama süresi, arşivleme ve sıkıştırma.
+
+Saklama süresinden (ARSIV_SAKLAMA_GUN) eski 'analizler' satırları aylık
+gzip'li JSONL dosyalarına (ARSIV_DIZINI/analizler-YYYY-AA.jsonl.gz) taşınır.
+Her yığın önce dosyaya yazılıp fsync edilir, sonra kısa bir transaction'da
+silinir; yazma kilidi hiçbir zaman bir yığından uzun tutulmaz, istek yolundaki
+yazıcı en fazla birkaç ms bekler. Yarıda kesilen bir çalışma aynı satırları
+tekrar yazabilir; okuyucu id'ye göre tekilleştirir.
+
+Özet tabloları (gunluk_ozet vb.) sadece INSERT'te güncellendiği için
+silinen satırlar özetlerde kalır. Boşalan sayfalar dosyaya
+PRAGMA incremental_vacuum ile küçük dilimler halinde geri verilir
+(auto_vacuum=INCREMENTAL gerekir; eski veritabanları için bir kerelik
+'vakum-modu' komutu).
+
+Kullanım:
+    python arsiv.py arsivle [--gun 180] [--kuru]
+    python arsiv.py listele
+    python arsiv.py sorgu "SELECT COUNT(*), AVG(genel_skor) FROM analizler" [--ay 2026-03 ...]
+    python arsiv.py vakum-modu    # bir kerelik, tam VACUUM (servis kapalıyken)
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+
+ARSIV_SAKLAMA_GUN = int(os.environ.get("ARSIV_SAKLAMA_GUN", 180))
+ARSIV_DIZINI = os.environ.get("ARSIV_DIZINI", "arsiv")
+ARSIV_ARALIGI_SAAT = float(os.environ.get("ARSIV_ARALIGI_SAAT", 0)) # API içinde periyodik çalışma (0: kapalı)
+ARSIV_YIGINI = 500 # Tek silme transaction'ındaki satır
+VAKUM_DILIMI = 256 # Tek incremental_vacuum adımında serbest bırakılan sayfa
+DILIM_ARASI_SN = 0.02 # Yığın/dilim arası bekleme: yazıcıya kilit sırası bırakılır
+
+ALANLAR = ("id", "tarih", "leke_sayisi", "genel_skor", "onerilen_urun", "urun_id")
+
+sayaclar = {"arsivlenen": 0, "vakum_sayfa": 0, "calisma": 0}
+
+
+def _baglan(db_yolu):
+    conn = sqlite3.connect(db_yolu, isolation_level=None, timeout=5)
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+
+def ay_dosyasi(ay, dizin=None):
+    return os.path.join(dizin or ARSIV_DIZINI, f"analizler-{ay}.jsonl.gz")
+
+
+def sinir_zamani(gun):
+    """Bu zamandan eski satırlar arşivlenir (DB'deki gibi UTC, 'YYYY-MM-DD HH:MM:SS')."""
+    return (datetime.now(timezone.utc) - timedelta(days=gun)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def arsivle(gun=ARSIV_SAKLAMA_GUN, db_yolu=None, dizin=None, kuru=False):
+    """Saklama süresini aşan satırları taşır, ardından dosyayı küçültür. Ay -> taşınan satır döner."""
+    db_yolu = db_yolu or database.DB_YOLU
+    dizin = dizin or ARSIV_DIZINI
+    sinir = sinir_zamani(gun)
+    conn = _baglan(db_yolu)
+    tasinan = {}
+    try:
+        if kuru:
+            return dict(conn.execute('SELECT substr(tarih, 1, 7), COUNT(*) FROM analizler WHERE tarih < ? GROUP BY 1',
+                                     (sinir,)).fetchall())
+        os.makedirs(dizin, exist_ok=True)
+        while True:
+            # Okuma kilitsiz (WAL); sıra (tarih, id) indeksinden gelir
+            satirlar = conn.execute(f'SELECT {", ".join(ALANLAR)} FROM analizler WHERE tarih < ? ORDER BY tarih, id LIMIT ?',
+                                    (sinir, ARSIV_YIGINI)).fetchall()
+            if not satirlar:
+                break
+            gruplar = {}
+            for satir in satirlar:
+                gruplar.setdefault(satir[1][:7], []).append(dict(zip(ALANLAR, satir)))
+            for ay, kayitlar in gruplar.items():
+                with open(ay_dosyasi(ay, dizin), "ab") as ham:
+                    with gzip.GzipFile(fileobj=ham, mode="wb") as f: # Her yığın ayrı gzip üyesi
+                        f.write("".join(json.dumps(k, ensure_ascii=False) + "\n" for k in kayitlar).encode("utf-8"))
+                    ham.flush()
+                    os.fsync(ham.fileno())
+                tasinan[ay] = tasinan.get(ay, 0) + len(kayitlar)
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('DELETE FROM analizler WHERE id = ?', [(s[0],) for s in satirlar])
+            conn.execute('COMMIT')
+            sayaclar["arsivlenen"] += len(satirlar)
+            time.sleep(DILIM_ARASI_SN)
+        if tasinan:
+            kucult(conn)
+        sayaclar["calisma"] += 1
+    finally:
+        conn.close()
+    return tasinan
+
+
+def kucult(conn):
+    """Serbest sayfaları küçük dilimlerle dosyaya geri verir; auto_vacuum INCREMENTAL değilse atlanır."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        print("Arşiv Uyarısı: auto_vacuum=INCREMENTAL değil, dosya küçültülmedi (bkz. 'python arsiv.py vakum-modu')")
+        return
+    while True:
+        bos = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if bos == 0:
+            break
+        # execute() sayfa başına bir adım atar (tek sayfa); executescript dilimi sonuna kadar çalıştırır
+        conn.executescript(f'PRAGMA incremental_vacuum({VAKUM_DILIMI});')
+        sayaclar["vakum_sayfa"] += min(bos, VAKUM_DILIMI)
+        time.sleep(DILIM_ARASI_SN)
+    conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+
+
+def vakum_modunu_ac(db_yolu=None):
+    """Eski veritabanını auto_vacuum=INCREMENTAL'a geçirir. Tam VACUUM: servis kapalıyken çalıştırın."""
+    conn = _baglan(db_yolu or database.DB_YOLU)
+    try:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+# ==========================================
+# SALT OKUNUR YÜKLEYİCİ
+# ==========================================
+
+def aylar(dizin=None):
+    """Arşivdeki aylar ('YYYY-AA'), eskiden yeniye."""
+    dizin = dizin or ARSIV_DIZINI
+    if not os.path.isdir(dizin):
+        return []
+    return sorted(ad[len("analizler-"):-len(".jsonl.gz")] for ad in os.listdir(dizin)
+                  if ad.startswith("analizler-") and ad.endswith(".jsonl.gz"))
+
+
+def oku(secilen_aylar=None, dizin=None):
+    """Arşiv satırlarını (sözlük) üretir; tekrar yazılmış satırlar bir kez döner."""
+    gorulen = set()
+    for ay in secilen_aylar or aylar(dizin):
+        yol = ay_dosyasi(ay, dizin)
+        if not os.path.exists(yol):
+            continue
+        with gzip.open(yol, "rt", encoding="utf-8") as f:
+            for satir in f:
+                kayit = json.loads(satir)
+                if kayit["id"] not in gorulen:
+                    gorulen.add(kayit["id"])
+                    yield kayit
+
+
+def yukle(secilen_aylar=None, dizin=None):
+    """
+    Arşivi bellek içi, salt okunur bir SQLite bağlantısına yükler: canlı
+    tabloyla aynı 'analizler' şeması ve indeksleri, aynı SQL sorguları.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE analizler (id INTEGER PRIMARY KEY, tarih TIMESTAMP, leke_sayisi INTEGER, genel_skor INTEGER, '
+                 'onerilen_urun TEXT, urun_id INTEGER)')
+    # Şema 2'den önce yazılmış satırlarda urun_id yok (NULL)
+    conn.executemany(f'INSERT INTO analizler VALUES ({", ".join("?" * len(ALANLAR))})',
+                     ([k.get(a) for a in ALANLAR] for k in oku(secilen_aylar, dizin)))
+    conn.execute('CREATE INDEX analizler_tarih ON analizler (tarih, id)')
+    conn.execute('CREATE INDEX analizler_urun_id ON analizler (urun_id, tarih, id)')
+    conn.commit()
+    conn.execute('PRAGMA query_only=1')
+    return conn
+
+
+# ==========================================
+# PERİYODİK ÇALIŞMA (API içinde, isteğe bağlı)
+# ==========================================
+
+_durdur = threading.Event()
+
+
+def _dongu(aralik_sn):
+    while not _durdur.wait(aralik_sn):
+        try:
+            tasinan = arsivle()
+            if tasinan:
+                print(f"Arşiv: {sum(tasinan.values())} satır taşındı ({', '.join(sorted(tasinan))})")
+        except Exception as e:
+            print(f"Arşiv Hatası: {e}")
+
+
+def zamanlayici_baslat(aralik_saat=ARSIV_ARALIGI_SAAT):
+    """aralik_saat > 0 ise arka planda periyodik arşivlemeyi başlatır."""
+    if aralik_saat <= 0:
+        return None
+    _durdur.clear()
+    thread = threading.Thread(target=_dongu, args=(aralik_saat * 3600,), name="arsiv", daemon=True)
+    thread.start()
+    return thread
+
+
+def zamanlayici_durdur():
+    _durdur.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    alt = parser.add_subparsers(dest="komut", required=True)
+    p = alt.add_parser("arsivle", help="Eski satırları arşive taşı ve dosyayı küçült")
+    p.add_argument("--gun", type=int, default=ARSIV_SAKLAMA_GUN)
+    p.add_argument("--kuru", action="store_true", help="Sadece taşınacak satırları say")
+    alt.add_parser("listele", help="Arşivdeki aylar ve satır sayıları")
+    p = alt.add_parser("sorgu", help="Arşiv üzerinde salt okunur SQL")
+    p.add_argument("sql")
+    p.add_argument("--ay", nargs="*", help="Sadece bu aylar (YYYY-AA)")
+    alt.add_parser("vakum-modu", help="Eski veritabanını auto_vacuum=INCREMENTAL'a geçir (tam VACUUM)")
+    args = parser.parse_args()
+
+    if args.komut == "arsivle":
+        database.tablolari_olustur() # Şema güncel değilse urun_id sütunu yoktur
+        sonuc = arsivle(args.gun, kuru=args.kuru)
+        for ay, adet in sorted(sonuc.items()):
+            print(f"{ay}  {adet:>8} satır" + ("  (kuru çalışma)" if args.kuru else ""))
+        print(f"Toplam: {sum(sonuc.values())} satır, vakum: {sayaclar['vakum_sayfa']} sayfa")
+    elif args.komut == "listele":
+        for ay in aylar():
+            yol = ay_dosyasi(ay)
+            print(f"{ay}  {sum(1 for _ in oku([ay])):>8} satır  {os.path.getsize(yol) / 1024:>8.1f} KB")
+    elif args.komut == "sorgu":
+        conn = yukle(args.ay)
+        for satir in conn.execute(args.sql):
+            print(tuple(satir))
+    elif args.komut == "vakum-modu":
+        print("Tamam" if vakum_modunu_ac() else "auto_vacuum değiştirilemedi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+İki aşamalı landmark karşılaştırması (eski yol vs. yeni yol).
+
+Eski yol: tam kare bilateral + CLAHE, FaceMesh tam kare üzerinde.
+Yeni yol: FaceMesh ~640px kopyada, yüz kanonik kareye hizalanır ve ön işleme
+ile doku modülleri sadece o karede çalışır (bkz. hizalama.py).
+
+Kullanım:
+    python benchmarks/iki_asamali_landmark.py [--tekrar 10] [resim.jpg ...]
+
+Resim verilmezse paketteki Cilt_Raporu_1764601789.jpg ve ondan üretilen
+büyük varyantlar (2x, 3x, 4x) kullanılır.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KOK)
+
+import analiz  # noqa: E402
+
+REFERANS = os.path.join(KOK, "Cilt_Raporu_1764601789.jpg")
+
+
+def eski_yol(frame, face_mesh):
+    processed, lab = analiz.preprocess_image(frame)
+    results = face_mesh.process(cv2.cvtColor(processed, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        return None, None
+    landmarks = results.multi_face_landmarks[0]
+    ctx = analiz.KareBaglami(processed, lab)
+    ctx.landmark_ayarla(landmarks)
+    return landmarks, analiz.skorla(ctx)
+
+
+def yeni_yol(frame, face_mesh):
+    landmarks = analiz.landmark_bul(frame, face_mesh)
+    if landmarks is None:
+        return None, None
+    return landmarks, analiz.skorla(analiz.yuz_baglami_kur(frame, landmarks))
+
+
+def piksel(landmarks, shape):
+    h, w = shape[:2]
+    return np.array([(p.x * w, p.y * h) for p in landmarks.landmark])
+
+
+def olc(fonksiyon, frame, face_mesh, tekrar):
+    fonksiyon(frame, face_mesh) # ısınma
+    sureler = []
+    for _ in range(tekrar):
+        t0 = time.perf_counter()
+        sonuc = fonksiyon(frame, face_mesh)
+        sureler.append((time.perf_counter() - t0) * 1000)
+    return sonuc, statistics.median(sureler)
+
+
+def varyantlar(yollar):
+    if yollar:
+        for yol in yollar:
+            yield os.path.basename(yol), cv2.imread(yol)
+        return
+    taban = cv2.imread(REFERANS)
+    yield "referans", taban
+    for kat in (2, 3, 4):
+        yield f"{kat}x", cv2.resize(taban, None, fx=kat, fy=kat, interpolation=cv2.INTER_CUBIC)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("resimler", nargs="*")
+    parser.add_argument("--tekrar", type=int, default=10)
+    args = parser.parse_args()
+
+    face_mesh = analiz.yuz_mesh_olustur()
+    print(f"{'resim':<12}{'boyut':>12}{'eski ms':>10}{'yeni ms':>10}{'hız':>7}"
+          f"{'drift ort':>11}{'drift maks':>11}{'leke':>11}{'kirisik':>15}{'skor':>9}")
+    for ad, frame in varyantlar(args.resimler):
+        if frame is None:
+            print(f"{ad:<12} okunamadı")
+            continue
+        (lm_eski, s_eski), t_eski = olc(eski_yol, frame, face_mesh, args.tekrar)
+        (lm_yeni, s_yeni), t_yeni = olc(yeni_yol, frame, face_mesh, args.tekrar)
+        boyut = f"{frame.shape[1]}x{frame.shape[0]}"
+        if lm_eski is None or lm_yeni is None:
+            print(f"{ad:<12}{boyut:>12}{t_eski:>10.1f}{t_yeni:>10.1f}  yüz bulunamadı (eski={lm_eski is not None}, yeni={lm_yeni is not None})")
+            continue
+        drift = np.linalg.norm(piksel(lm_eski, frame.shape) - piksel(lm_yeni, frame.shape), axis=1)
+        # Drift, yüz genişliğine oranla da anlamlı olsun diye göz arası mesafeye bölünmüş hali de verilir.
+        goz_arasi = np.linalg.norm(piksel(lm_eski, frame.shape)[33] - piksel(lm_eski, frame.shape)[263])
+        print(f"{ad:<12}{boyut:>12}{t_eski:>10.1f}{t_yeni:>10.1f}{t_eski / t_yeni:>6.1f}x"
+              f"{drift.mean():>8.2f}px{drift.max():>9.2f}px"
+              f"{s_eski['leke_sayisi']:>5}->{s_yeni['leke_sayisi']:<5}"
+              f"{s_eski['kirisiklik_indeksi']:>7.2f}->{s_yeni['kirisiklik_indeksi']:<6.2f}"
+              f"{s_eski['genel_skor']:>4}->{s_yeni['genel_skor']:<4}")
+        print(f"{'':<12}{'':>12}  drift / göz arası: ort {drift.mean() / goz_arasi:.3%}, maks {drift.max() / goz_arasi:.3%}")
+    face_mesh.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Leke tespiti karşılaştırması.
+
+1. bölüm: tam dedektör kanonik yüz karesinde; paketteki resim ve üzerine
+   yapay akne noktaları çizilmiş (kontur yoğun) varyantları. Eski dedektör
+   sadece sayı döner; yenisi aynı sayıyla birlikte boyut histogramı, bölge
+   sayımları ve merkezleri de üretir. Sayılar her satırda eşit çıkmalı.
+2. bölüm: sadece sayım çekirdeği, rastgele leke dolu ikili maskelerde
+   512px'ten 4096px'e: kontur başına contourArea döngüsü vs.
+   connectedComponentsWithStats (Grana) piksel alanı, aynı 15-400 aralığıyla.
+   Bileşen alanı kontur poligonu alanından büyük çıktığı için sayılar kayar;
+   hız farkı da küçüktür (maliyeti ikisinde de etiketleme belirler). Dedektör
+   bu yüzden contourArea'da kaldı.
+
+Kullanım:
+    python benchmarks/leke_tespiti.py [--tekrar 20] [resim.jpg]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KOK)
+
+import analiz  # noqa: E402
+
+REFERANS = os.path.join(KOK, "Cilt_Raporu_1764601789.jpg")
+AKNE_YOGUNLUKLARI = (0, 500, 2000, 5000)
+
+
+def eski_dedektor(ctx):
+    """Değişiklik öncesi detect_spots_adaptive (sadece sayı döner)."""
+    yuz = ctx.bolge("yuz", analiz.YUZ_PAYI)
+    blur = cv2.GaussianBlur(ctx.gri(yuz), (17, 17), 0)
+    thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 3)
+    thresh = cv2.bitwise_and(thresh, thresh, mask=yuz.maske)
+    return eski_sayim(thresh)
+
+
+def eski_sayim(thresh):
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    spot_count = 0
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+        if 15 < area < 400: spot_count += 1
+    return spot_count
+
+
+def bilesen_sayim(thresh):
+    _, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(thresh, 8, cv2.CV_32S, cv2.CCL_GRANA)
+    alanlar = stats[1:, cv2.CC_STAT_AREA] # 0. bileşen arka plan
+    return int(np.count_nonzero((alanlar > analiz.LEKE_MIN_ALAN) & (alanlar < analiz.LEKE_MAX_ALAN)))
+
+
+def olc(fonksiyon, arguman, tekrar):
+    fonksiyon(arguman)
+    sureler = []
+    for _ in range(tekrar):
+        t0 = time.perf_counter()
+        sonuc = fonksiyon(arguman)
+        sureler.append((time.perf_counter() - t0) * 1000)
+    return sonuc, statistics.median(sureler)
+
+
+def akne_ciz(bgr, adet, rng):
+    """Rastgele koyu, küçük noktalar (2-7 px yarıçap) çizer."""
+    kare = bgr.copy()
+    h, w = kare.shape[:2]
+    for x, y, r in zip(rng.integers(0, w, adet), rng.integers(0, h, adet), rng.integers(2, 8, adet)):
+        renk = tuple(int(c) for c in rng.integers(20, 70, 3))
+        cv2.circle(kare, (int(x), int(y)), int(r), renk, -1)
+    return kare
+
+
+def rastgele_maske(boyut, rng):
+    """Yaklaşık her 400 px²'ye bir leke düşen ikili maske."""
+    maske = np.zeros((boyut, boyut), dtype=np.uint8)
+    adet = boyut * boyut // 400
+    for x, y, r in zip(rng.integers(0, boyut, adet), rng.integers(0, boyut, adet), rng.integers(1, 12, adet)):
+        cv2.circle(maske, (int(x), int(y)), int(r), 255, -1)
+    return maske
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("resim", nargs="?", default=REFERANS)
+    parser.add_argument("--tekrar", type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    frame = cv2.imread(args.resim)
+    face_mesh = analiz.yuz_mesh_olustur()
+    landmarks = analiz.landmark_bul(frame, face_mesh)
+    face_mesh.close()
+    if landmarks is None:
+        print("Yüz bulunamadı.")
+        return
+    taban = analiz.yuz_baglami_kur(frame, landmarks)
+
+    print("1) Tam dedektör, kanonik yüz karesi")
+    print(f"{'akne':>6}{'eski ms':>10}{'yeni ms':>10}{'hız':>7}{'eski sayı':>11}{'yeni sayı':>11}")
+    for adet in AKNE_YOGUNLUKLARI:
+        ctx = analiz.KareBaglami(akne_ciz(taban.bgr, adet, rng), None, analiz.kanonik_bolgeler())
+        ctx.noktalar, ctx.donusum = taban.noktalar, taban.donusum
+        # Bağlam gri kırpımı önbelleğe alır; ikisi de aynı hazır kırpımla ölçülsün.
+        ctx.gri(ctx.bolge("yuz", analiz.YUZ_PAYI))
+        eski, t_eski = olc(eski_dedektor, ctx, args.tekrar)
+        yeni, t_yeni = olc(analiz.detect_spots_adaptive, ctx, args.tekrar)
+        print(f"{adet:>6}{t_eski:>10.2f}{t_yeni:>10.2f}{t_eski / t_yeni:>6.1f}x{eski:>11}{yeni['sayi']:>11}")
+
+    print("\n2) Sadece sayım çekirdeği, rastgele leke maskesi (contourArea vs. bileşen piksel alanı)")
+    print(f"{'boyut':>6}{'kontur':>9}{'kontur ms':>11}{'bileşen ms':>12}{'hız':>7}{'kontur sayı':>13}{'bileşen sayı':>14}")
+    for boyut in (512, 1024, 2048, 4096):
+        maske = rastgele_maske(boyut, rng)
+        kontur = len(cv2.findContours(maske, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+        eski, t_eski = olc(eski_sayim, maske, args.tekrar)
+        yeni, t_yeni = olc(bilesen_sayim, maske, args.tekrar)
+        print(f"{boyut:>6}{kontur:>9}{t_eski:>11.2f}{t_yeni:>12.2f}{t_eski / t_yeni:>6.1f}x{eski:>13}{yeni:>14}")
+
+
+if __name__ == "__main__":
+    main()
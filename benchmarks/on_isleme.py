@@ -0,0 +1,136 @@
+"""
+Ön işleme motorlarının değerlendirmesi: gecikme kazancı ve skor kayması.
+
+Her motor (analiz.ON_ISLEME_MOTORLARI) referans resim setinde tam pipeline
+ile çalıştırılır. Gecikme, üretimdeki "on_isleme" aşamasının p50'sidir;
+kayma, mevcut motorun (bilateral) sonucuna göre kirisiklik_indeksi,
+leke_sayisi ve genel_skor farklarıdır (ortalama ve en büyük mutlak fark).
+
+Kullanım:
+    python benchmarks/on_isleme.py [--tekrar 15] [--kaydet rapor.json]
+    python benchmarks/on_isleme.py resim.jpg klasor/ ...
+
+Resim verilmezse paketteki Cilt_Raporu_1764601789.jpg, ondan üretilen 1080p
+ve 2160p varyantları ve üzerine yapay akne noktaları çizilmiş (kontur yoğun)
+iki varyant kullanılır. Klasör verilirse içindeki jpg/png dosyaları okunur.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+import cv2
+import numpy as np
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KOK)
+
+import analiz  # noqa: E402
+
+REFERANS = os.path.join(KOK, "Cilt_Raporu_1764601789.jpg")
+TABAN_MOTOR = "bilateral"
+ALANLAR = (("kirisiklik_indeksi", "kırışıklık"), ("leke_sayisi", "leke"), ("genel_skor", "skor"))
+
+
+def akne_ciz(bgr, adet, rng):
+    """Rastgele koyu, küçük noktalar (2-7 px yarıçap) çizer."""
+    kare = bgr.copy()
+    h, w = kare.shape[:2]
+    for x, y, r in zip(rng.integers(0, w, adet), rng.integers(0, h, adet), rng.integers(2, 8, adet)):
+        renk = tuple(int(c) for c in rng.integers(20, 70, 3))
+        cv2.circle(kare, (int(x), int(y)), int(r), renk, -1)
+    return kare
+
+
+def referans_seti(yollar):
+    """(ad, BGR kare) üretir."""
+    if yollar:
+        for yol in yollar:
+            if os.path.isdir(yol):
+                for ad in sorted(os.listdir(yol)):
+                    if ad.lower().endswith((".jpg", ".jpeg", ".png")):
+                        yield ad, cv2.imread(os.path.join(yol, ad))
+            else:
+                yield os.path.basename(yol), cv2.imread(yol)
+        return
+    taban = cv2.imread(REFERANS)
+    yield "referans", taban
+    for kisa in (1080, 2160):
+        olcek = kisa / min(taban.shape[:2])
+        yield f"{kisa}p", cv2.resize(taban, None, fx=olcek, fy=olcek, interpolation=cv2.INTER_CUBIC)
+    rng = np.random.default_rng(0)
+    for adet in (300, 600):
+        yield f"akne_{adet}", akne_ciz(taban, adet, rng)
+
+
+def olc(frame, face_mesh, motor, tekrar):
+    """Motorla tam pipeline; (sonuç, on_isleme p50 ms, toplam p50 ms)."""
+    analiz.ON_ISLEME_MOTORU = motor
+    sonuc = analiz.kare_analiz(frame, face_mesh) # ısınma
+    if sonuc["durum"] != "tamam":
+        return sonuc, None, None
+    on_isleme, toplam = [], []
+    for _ in range(tekrar):
+        sonuc = analiz.kare_analiz(frame, face_mesh)
+        on_isleme.append(sonuc["sureler"]["on_isleme"])
+        toplam.append(sum(sonuc["sureler"].values()))
+    return sonuc, statistics.median(on_isleme), statistics.median(toplam)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("resimler", nargs="*")
+    parser.add_argument("--tekrar", type=int, default=15)
+    parser.add_argument("--kaydet", help="Raporu JSON olarak bu dosyaya yaz")
+    args = parser.parse_args()
+
+    motorlar = [TABAN_MOTOR] + [m for m in analiz.ON_ISLEME_MOTORLARI if m != TABAN_MOTOR]
+    face_mesh = analiz.yuz_mesh_olustur()
+    analiz.isinma(face_mesh)
+
+    olcumler = {m: [] for m in motorlar} # motor -> [(resim, sonuç, on_isleme ms, toplam ms)]
+    print(f"{'resim':<12}{'motor':<17}{'ön işl. ms':>11}{'toplam ms':>11}{'kırışıklık':>12}{'leke':>6}{'skor':>6}")
+    for ad, frame in referans_seti(args.resimler):
+        if frame is None:
+            print(f"{ad:<12}okunamadı")
+            continue
+        for motor in motorlar:
+            sonuc, ms, toplam = olc(frame, face_mesh, motor, args.tekrar)
+            if sonuc["durum"] != "tamam":
+                print(f"{ad:<12}{motor:<17}{sonuc['durum']}")
+                break
+            olcumler[motor].append((ad, sonuc, ms, toplam))
+            print(f"{ad:<12}{motor:<17}{ms:>11.2f}{toplam:>11.2f}{sonuc['kirisiklik_indeksi']:>12.2f}"
+                  f"{sonuc['leke_sayisi']:>6}{sonuc['genel_skor']:>6}")
+    face_mesh.close()
+
+    taban = {ad: (sonuc, ms) for ad, sonuc, ms, _ in olcumler[TABAN_MOTOR]}
+    if not taban:
+        print("Yüzlü resim yok, rapor üretilemedi.")
+        return
+    rapor = {}
+    print(f"\nÖzet ({TABAN_MOTOR} motoruna göre; kayma = ortalama / en büyük mutlak fark)")
+    print(f"{'motor':<17}{'ön işl. ms':>11}{'hız':>7}" + "".join(f"{etiket:>16}" for _, etiket in ALANLAR))
+    for motor in motorlar:
+        satirlar = [(ad, sonuc, ms) for ad, sonuc, ms, _ in olcumler[motor] if ad in taban]
+        if not satirlar:
+            continue
+        ms = statistics.median(m for _, _, m in satirlar)
+        taban_ms = statistics.median(taban[ad][1] for ad, _, _ in satirlar)
+        ozet = {"on_isleme_ms": round(ms, 2), "hizlanma": round(taban_ms / ms, 2), "kayma": {}}
+        for alan, _ in ALANLAR:
+            farklar = [abs(sonuc[alan] - taban[ad][0][alan]) for ad, sonuc, _ in satirlar]
+            ozet["kayma"][alan] = {"ort": round(statistics.mean(farklar), 2), "maks": round(max(farklar), 2)}
+        rapor[motor] = ozet
+        print(f"{motor:<17}{ms:>11.2f}{ozet['hizlanma']:>6.1f}x" +
+              "".join(f"{ozet['kayma'][alan]['ort']:>9.2f} /{ozet['kayma'][alan]['maks']:>5.1f}" for alan, _ in ALANLAR))
+
+    if args.kaydet:
+        with open(args.kaydet, "w", encoding="utf-8") as f:
+            json.dump({"taban_motor": TABAN_MOTOR, "tekrar": args.tekrar, "motorlar": rapor}, f, ensure_ascii=False, indent=2)
+        print(f"\nRapor kaydedildi: {args.kaydet}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Analiz pipeline'ı performans ölçümü (aşama aşama + uçtan uca).
+
+Her aşama, üretimdeki Server-Timing ile aynı kaynaktan ölçülür: bytes_analiz
+sonuçtaki "sureler" alanına decode, kalite, landmark, hizalama, on_isleme ve
+modül sürelerini yazar. Ayrıca bytes_analiz'in toplam süresi ve isteğe bağlı
+olarak /analiz_et'in TestClient ile süreç içi uçtan uca süresi ölçülür.
+
+Kullanım:
+    python benchmarks/pipeline.py [--tekrar 30] [--kaydet taban.json]
+    python benchmarks/pipeline.py --karsilastir taban.json [--esik 0.10]
+    python benchmarks/pipeline.py resim.jpg ...
+
+Resim verilmezse paketteki Cilt_Raporu_1764601789.jpg ve ondan üretilen
+480p, 720p, 1080p, 1440p ve 4K (kısa kenar) varyantları kullanılır.
+Karşılaştırma modunda p50'si eşikten fazla yavaşlayan aşamalar işaretlenir ve
+çıkış kodu 1 olur (CI'da kullanılabilir).
+
+Soğuk başlangıç da ayrı süreçlerde ölçülür ("soguk_baslangic" varyantı):
+main'in import süresi, FaceMesh kurulumu, ısınma ve ısınma sonrası ilk
+analiz; ayrıca -X importtime ile en pahalı import'lar listelenir.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KOK)
+
+import analiz  # noqa: E402
+
+REFERANS = os.path.join(KOK, "Cilt_Raporu_1764601789.jpg")
+COZUNURLUKLER = (480, 720, 1080, 1440, 2160)
+
+# Çok kısa aşamalarda (<1 ms) yüzdelik gürültü yüksek; bunun altındaki farklar gerileme sayılmaz.
+MUTLAK_ESIK_MS = 0.5
+
+
+def varyantlar(yollar):
+    """(ad, jpeg baytları) üretir. Baytlar üretimdeki gibi decode'dan geçsin diye JPEG tutulur."""
+    if yollar:
+        for yol in yollar:
+            with open(yol, "rb") as f:
+                yield os.path.basename(yol), f.read()
+        return
+    with open(REFERANS, "rb") as f:
+        icerik = f.read()
+    yield "referans", icerik
+    taban = cv2.imdecode(np.frombuffer(icerik, np.uint8), cv2.IMREAD_COLOR)
+    for kisa in COZUNURLUKLER:
+        olcek = kisa / min(taban.shape[:2])
+        kare = cv2.resize(taban, None, fx=olcek, fy=olcek, interpolation=cv2.INTER_AREA if olcek < 1 else cv2.INTER_CUBIC)
+        yield f"{kisa}p", cv2.imencode(".jpg", kare, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+
+def ozet(ms_listesi):
+    dizi = np.asarray(ms_listesi, dtype=np.float64)
+    p50, p95, p99 = np.percentile(dizi, [50, 95, 99])
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3), "ort": round(dizi.mean(), 3), "n": len(dizi)}
+
+
+def tepe_rss_mb():
+    # Linux'ta ru_maxrss KB cinsinden ve süreç ömrü boyunca tepe değerdir
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def pipeline_olc(icerik, face_mesh, tekrar):
+    analiz.bytes_analiz(icerik, face_mesh) # ısınma (lru_cache, CLAHE, model)
+    asamalar = {}
+    toplam = []
+    t_bas = time.perf_counter()
+    for _ in range(tekrar):
+        t0 = time.perf_counter()
+        sonuc = analiz.bytes_analiz(icerik, face_mesh)
+        toplam.append((time.perf_counter() - t0) * 1000)
+        for ad, ms in sonuc["sureler"].items():
+            asamalar.setdefault(ad, []).append(ms)
+    gecen = time.perf_counter() - t_bas
+
+    rapor = {ad: ozet(v) for ad, v in asamalar.items()}
+    rapor["toplam"] = ozet(toplam)
+    return rapor, round(tekrar / gecen, 2), sonuc["durum"]
+
+
+def api_istemcisi():
+    """
+    main.app için TestClient. Önbellek kapatılır (her istek motora gitsin) ve
+    main'in beauty.db'si çalışma dizinini kirletmesin diye geçici dizine geçilir.
+    """
+    os.environ["ONBELLEK_KAPASITE"] = "0"
+    os.environ["ONBELLEK_DIZINI"] = ""
+    os.chdir(tempfile.mkdtemp(prefix="beauty_bench_"))
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+def api_olc(istemci, icerik, tekrar):
+    dosya = {"file": ("bench.jpg", icerik, "image/jpeg")}
+    istemci.post("/analiz_et", files=dosya)
+    sureler = []
+    t_bas = time.perf_counter()
+    for _ in range(tekrar):
+        t0 = time.perf_counter()
+        istemci.post("/analiz_et", files=dosya)
+        sureler.append((time.perf_counter() - t0) * 1000)
+    return ozet(sureler), round(tekrar / (time.perf_counter() - t_bas), 2)
+
+
+# Temiz bir süreçte çalışır; her adımın süresini JSON olarak basar.
+SOGUK_BASLANGIC_KODU = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+import analiz
+mesh = analiz.yuz_mesh_olustur()
+t2 = time.perf_counter()
+analiz.isinma(mesh)
+t3 = time.perf_counter()
+with open(analiz.ISINMA_RESMI, "rb") as f:
+    analiz.bytes_analiz(f.read(), mesh)
+t4 = time.perf_counter()
+print(json.dumps({"import_main": (t1 - t0) * 1000, "mesh_kurulum": (t2 - t1) * 1000,
+                  "isinma": (t3 - t2) * 1000, "ilk_analiz": (t4 - t3) * 1000}))
+"""
+
+
+def _alt_surec(arguman, **kwargs):
+    ortam_degiskenleri = dict(os.environ, PYTHONPATH=KOK + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, *arguman], cwd=tempfile.gettempdir(), env=ortam_degiskenleri,
+                          capture_output=True, text=True, check=True, **kwargs)
+
+
+def soguk_baslangic(tekrar):
+    """Her tekrar yeni bir süreçte: import -> mesh -> ısınma -> ilk analiz (ms)."""
+    olcumler = {}
+    for _ in range(tekrar):
+        cikti = _alt_surec(["-c", SOGUK_BASLANGIC_KODU]).stdout.strip().splitlines()[-1]
+        for ad, ms in json.loads(cikti).items():
+            olcumler.setdefault(ad, []).append(ms)
+    return {ad: ozet(v) for ad, v in olcumler.items()}
+
+
+def en_pahali_importlar(adet=8):
+    """python -X importtime çıktısından main'in doğrudan çektiği en pahalı modüller (kümülatif ms)."""
+    satirlar = _alt_surec(["-X", "importtime", "-c", "import main"]).stderr.splitlines()
+    # Çocuk modüller ebeveynden önce, iki boşluk daha girintili basılır.
+    cocuklar = []
+    for satir in satirlar:
+        if not satir.startswith("import time:"):
+            continue
+        _, kumulatif, modul = satir.split(":", 1)[1].split("|")
+        if not kumulatif.strip().isdigit():
+            continue # başlık satırı
+        girinti = len(modul) - len(modul.lstrip())
+        if girinti == 1: # üst seviye
+            if modul.strip() == "main":
+                break
+            cocuklar = []
+        elif girinti == 3:
+            cocuklar.append((modul.strip(), round(int(kumulatif) / 1000, 1)))
+    return sorted(cocuklar, key=lambda x: -x[1])[:adet]
+
+
+def ortam():
+    import mediapipe as mp
+    return {
+        "tarih": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "mediapipe": getattr(mp, "__version__", "?"),
+        "opencv_thread": cv2.getNumThreads(),
+    }
+
+
+def karsilastir(taban, yeni, esik):
+    """p50'si tabana göre esik oranından fazla artan (varyant, aşama) çiftlerini döner."""
+    gerilemeler = []
+    for varyant, yeni_v in yeni["sonuclar"].items():
+        taban_v = taban["sonuclar"].get(varyant)
+        if taban_v is None:
+            continue
+        for asama, yeni_a in yeni_v["asamalar"].items():
+            taban_a = taban_v["asamalar"].get(asama)
+            if taban_a is None:
+                continue
+            eski_ms, yeni_ms = taban_a["p50"], yeni_a["p50"]
+            if yeni_ms > eski_ms * (1 + esik) and yeni_ms - eski_ms > MUTLAK_ESIK_MS:
+                gerilemeler.append((varyant, asama, eski_ms, yeni_ms))
+    return gerilemeler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("resimler", nargs="*")
+    parser.add_argument("--tekrar", type=int, default=30)
+    parser.add_argument("--kaydet", help="Sonuçları bu JSON dosyasına taban olarak yaz")
+    parser.add_argument("--karsilastir", help="Bu JSON tabanına göre gerilemeleri işaretle")
+    parser.add_argument("--esik", type=float, default=0.10, help="p50 artış eşiği (0.10 = %%10)")
+    parser.add_argument("--api-yok", action="store_true", help="/analiz_et uçtan uca ölçümünü atla")
+    parser.add_argument("--soguk-tekrar", type=int, default=3, help="Soğuk başlangıç ölçümü için süreç sayısı (0 = atla)")
+    args = parser.parse_args()
+
+    # Göreli yollar api_istemcisi() çalışma dizinini değiştirmeden önce çözülür
+    kaydet = os.path.abspath(args.kaydet) if args.kaydet else None
+    karsilastir_yolu = os.path.abspath(args.karsilastir) if args.karsilastir else None
+    resimler = [os.path.abspath(y) for y in args.resimler]
+
+    rapor = {"ortam": ortam(), "tekrar": args.tekrar, "sonuclar": {}}
+    # Soğuk başlangıç, bu süreçte hiçbir şey ısınmadan/ölçüm yükü binmeden önce
+    if args.soguk_tekrar > 0:
+        asamalar = soguk_baslangic(args.soguk_tekrar)
+        importlar = en_pahali_importlar()
+        rapor["sonuclar"]["soguk_baslangic"] = {"asamalar": asamalar, "importlar": importlar}
+        print(f"soguk_baslangic ({args.soguk_tekrar} süreç)")
+        print(f"  {'aşama':<14}{'p50':>9}{'maks':>9}")
+        for asama, o in asamalar.items():
+            print(f"  {asama:<14}{o['p50']:>9.1f}{o['p99']:>9.1f}")
+        print("  en pahalı import'lar (kümülatif ms): " + ", ".join(f"{m} {ms}" for m, ms in importlar))
+
+    face_mesh = analiz.yuz_mesh_olustur()
+    istemci = None if args.api_yok else api_istemcisi().__enter__()
+
+    for ad, icerik in varyantlar(resimler):
+        asamalar, verim, durum = pipeline_olc(icerik, face_mesh, args.tekrar)
+        kayit = {"durum": durum, "bayt": len(icerik), "verim_rps": verim, "asamalar": asamalar}
+        if istemci is not None:
+            asamalar["api"], kayit["api_verim_rps"] = api_olc(istemci, icerik, args.tekrar)
+        kayit["tepe_rss_mb"] = tepe_rss_mb()
+        rapor["sonuclar"][ad] = kayit
+
+        print(f"\n{ad} ({len(icerik) / 1024:.0f} KB, {durum}) verim {verim:.1f} rps, tepe RSS {kayit['tepe_rss_mb']} MB")
+        print(f"  {'aşama':<12}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for asama, o in asamalar.items():
+            print(f"  {asama:<12}{o['p50']:>9.2f}{o['p95']:>9.2f}{o['p99']:>9.2f}")
+
+    face_mesh.close()
+    if istemci is not None:
+        istemci.__exit__(None, None, None)
+
+    if kaydet:
+        with open(kaydet, "w", encoding="utf-8") as f:
+            json.dump(rapor, f, ensure_ascii=False, indent=2)
+        print(f"\nTaban kaydedildi: {kaydet}")
+
+    if karsilastir_yolu:
+        with open(karsilastir_yolu, "r", encoding="utf-8") as f:
+            taban = json.load(f)
+        gerilemeler = karsilastir(taban, rapor, args.esik)
+        if not gerilemeler:
+            print(f"\nGerileme yok (eşik %{args.esik * 100:.0f}).")
+            return 0
+        print(f"\nGERİLEMELER (p50, eşik %{args.esik * 100:.0f}):")
+        for varyant, asama, eski_ms, yeni_ms in gerilemeler:
+            print(f"  {varyant:<10}{asama:<12}{eski_ms:>9.2f} -> {yeni_ms:>9.2f} ms  (+{(yeni_ms / eski_ms - 1):.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
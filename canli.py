@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import analiz
+
+# ==========================================
+# CANLI ANALİZ (WebSocket, izleme modu)
+# ==========================================
+# Masaüstü script'leri (cilt_analizi.py, analiz_raporlu.py) kamera akışında
+# anlık geri bildirim veriyor; sunucuda tek yol her karede yüzü sıfırdan
+# arayan /analiz_et idi. Burada her bağlantı kendi izleme modundaki
+# FaceMesh'ini tutar (önceki karenin landmark'larından devam eder), sadece
+# en son kare işlenir, skorlar kareler arasında yumuşatılır.
+#
+# Protokol: istemci ikili mesaj olarak JPEG/PNG kare, metin mesaj olarak
+# ayar JSON'u ({"butce_ms": 200, "modules": [...], "yumusatma": 0.3}) yollar.
+# Sunucu her işlenen kare için hemen bir JSON sonuç döner; bütçesini kuyrukta
+# aşıp atılan kare için {"durum": "eskimis", "kare": n} döner.
+
+CANLI_BAGLANTI_LIMITI = int(os.environ.get("CANLI_BAGLANTI_LIMITI", 4))
+VARSAYILAN_BUTCE_MS = float(os.environ.get("CANLI_BUTCE_MS", 250)) # Bundan eski kare işlenmeden atılır
+VARSAYILAN_YUMUSATMA = 0.3 # EMA katsayısı: 1 = yumuşatma yok
+KATEGORI_PENCERESI = 5 # Kategorik alanlarda son N karenin çoğunluğu
+
+SAYISAL_ALANLAR = ("genel_skor", "leke_skoru", "leke_sayisi", "kirisiklik_skoru", "kirisiklik_indeksi")
+KATEGORIK_ALANLAR = ("cilt_tipi", "goz_alti_morlugu", "kizariklik", "ana_sorun")
+
+
+class Yumusatici:
+    """Sayısal skorlara EMA, kategorik alanlara kayan pencerede çoğunluk oyu."""
+
+    def __init__(self, alfa=VARSAYILAN_YUMUSATMA):
+        self.alfa = alfa
+        self.sifirla()
+
+    def sifirla(self):
+        self._ema = {}
+        self._pencereler = {alan: deque(maxlen=KATEGORI_PENCERESI) for alan in KATEGORIK_ALANLAR}
+
+    def uygula(self, sonuc):
+        cikti = dict(sonuc)
+        for alan in SAYISAL_ALANLAR:
+            if alan not in sonuc:
+                continue
+            onceki = self._ema.get(alan)
+            deger = sonuc[alan] if onceki is None else self.alfa * sonuc[alan] + (1 - self.alfa) * onceki
+            self._ema[alan] = deger
+            cikti[alan] = deger if isinstance(sonuc[alan], float) else int(round(deger))
+        for alan in KATEGORIK_ALANLAR:
+            if alan not in sonuc:
+                continue
+            pencere = self._pencereler[alan]
+            pencere.append(sonuc[alan])
+            cikti[alan] = Counter(pencere).most_common(1)[0][0]
+        return cikti
+
+
+class CanliSayaclar:
+    """API sürecindeki canlı oturum sayaçları (/metrics)."""
+
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self.baglanti = 0
+        self.reddedilen_baglanti = 0
+        self.kare = {"islenen": 0, "ustune_yazilan": 0, "eskimis": 0}
+
+    def baglan(self):
+        with self._kilit:
+            if self.baglanti >= CANLI_BAGLANTI_LIMITI:
+                self.reddedilen_baglanti += 1
+                return False
+            self.baglanti += 1
+            return True
+
+    def ayril(self):
+        with self._kilit:
+            self.baglanti -= 1
+
+    def kare_say(self, tur):
+        with self._kilit:
+            self.kare[tur] += 1
+
+
+sayaclar = CanliSayaclar()
+
+
+class CanliOturum:
+    """
+    Tek WebSocket bağlantısının durumu. İzleme modundaki mesh thread-safe
+    olmadığı ve karelerin sırasını takip ettiği için bağlantıya ait tek
+    thread'lik bir executor'da kullanılır.
+    """
+
+    def __init__(self, websocket):
+        self.ws = websocket
+        self.butce_ms = VARSAYILAN_BUTCE_MS
+        self.moduller = analiz.modulleri_coz(None) - {"recete"} # Canlı karelerde öneri/DB kaydı yok
+        self.yumusatici = Yumusatici()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="canli")
+        self._mesh = None
+        self._son_kare = None # (sıra, alınma zamanı, baytlar); yeni kare eskisinin üstüne yazılır
+        self._yeni_kare = asyncio.Event()
+        self._bitti = False
+        self._sira = 0
+
+    def _hazirla(self):
+        # Bağlantı başına sadece izleme mesh'i ısıtılır: canlı karede kalite kapısı yok,
+        # kanonik maskeler süreçte ilk karede bir kez kurulur
+        self._mesh = analiz.yuz_mesh_olustur(izleme=True)
+        analiz.mesh_isinma(self._mesh)
+
+    def _kapat_mesh(self):
+        if self._mesh is not None:
+            self._mesh.close()
+
+    def ayarla(self, ayar):
+        """İstemcinin JSON ayar mesajını uygular. Geçersiz değer ValueError fırlatır."""
+        if "butce_ms" in ayar:
+            self.butce_ms = float(ayar["butce_ms"])
+        if "modules" in ayar:
+            self.moduller = analiz.modulleri_coz(ayar["modules"]) - {"recete"}
+        if "yumusatma" in ayar:
+            alfa = float(ayar["yumusatma"])
+            if not 0 < alfa <= 1:
+                raise ValueError("yumusatma 0 ile 1 arasında olmalı.")
+            self.yumusatici.alfa = alfa
+
+    async def calistir(self, yanit_olustur):
+        """Bağlantı kapanana kadar kareleri alır ve işler. yanit_olustur: sonuç -> yanıt sözlüğü."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._hazirla)
+            await self.ws.send_json({"durum": "hazir", "butce_ms": self.butce_ms})
+            alici = asyncio.create_task(self._al())
+            isleyici = asyncio.create_task(self._isle(yanit_olustur))
+            _, bekleyenler = await asyncio.wait({alici, isleyici}, return_when=asyncio.FIRST_COMPLETED)
+            for gorev in bekleyenler:
+                gorev.cancel()
+            await asyncio.gather(alici, isleyici, return_exceptions=True)
+        finally:
+            await loop.run_in_executor(self._executor, self._kapat_mesh)
+            self._executor.shutdown(wait=False)
+
+    async def _al(self):
+        while True:
+            mesaj = await self.ws.receive()
+            if mesaj["type"] == "websocket.disconnect":
+                self._bitti = True
+                self._yeni_kare.set()
+                return
+            if mesaj.get("bytes") is not None:
+                if self._son_kare is not None:
+                    sayaclar.kare_say("ustune_yazilan") # İşleyici yetişemedi, eski kare hiç işlenmeyecek
+                self._son_kare = (self._sira, time.monotonic(), mesaj["bytes"])
+                self._sira += 1
+                self._yeni_kare.set()
+            elif mesaj.get("text"):
+                try:
+                    self.ayarla(json.loads(mesaj["text"]))
+                    await self.ws.send_json({"durum": "ayarlandi", "butce_ms": self.butce_ms, "modules": sorted(self.moduller)})
+                except (ValueError, TypeError, AttributeError) as e:
+                    await self.ws.send_json({"durum": "hata", "hata": f"Geçersiz ayar: {e}"})
+
+    async def _isle(self, yanit_olustur):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._yeni_kare.wait()
+            self._yeni_kare.clear()
+            if self._bitti:
+                return
+            kare, self._son_kare = self._son_kare, None
+            if kare is None:
+                continue
+            sira, alinma, icerik = kare
+            if (time.monotonic() - alinma) * 1000 > self.butce_ms:
+                sayaclar.kare_say("eskimis") # Bütçe kuyrukta harcandı; daha taze kare beklenir
+                # Yanıt bekleyip sonraki kareyi gönderen istemci takılmasın
+                await self.ws.send_json({"durum": "eskimis", "kare": sira})
+                continue
+
+            sonuc = await loop.run_in_executor(self._executor, analiz.canli_kare_analiz, icerik, self._mesh, self.moduller)
+            sayaclar.kare_say("islenen")
+            sureler = sonuc.pop("sureler")
+            if sonuc["durum"] == "tamam":
+                yanit = yanit_olustur(self.yumusatici.uygula(sonuc))
+            else:
+                self.yumusatici.sifirla() # Yüz kayboldu: yeni yüzün skorları eskisiyle karışmasın
+                yanit = {"status": "success" if sonuc["durum"] == "yuz_yok" else "error"}
+            gecikme_ms = (time.monotonic() - alinma) * 1000
+            yanit.update({
+                "durum": sonuc["durum"],
+                "kare": sira,
+                "isleme_ms": round(sum(sureler.values()), 1),
+                "gecikme_ms": round(gecikme_ms, 1),
+                "butce_asildi": gecikme_ms > self.butce_ms,
+            })
+            await self.ws.send_json(yanit)
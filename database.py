@@ -1,9 +1,25 @@
+import base64
+import os
+import queue
 import sqlite3
-import random # Rastgele seçim için gerekli
+import threading
+import time
+
+import katalog
+import metrikler
+import oneri
+import sema
+
+DB_YOLU = os.environ.get("BEAUTY_DB", "beauty.db")
+PAKET_DIZINI = os.path.dirname(os.path.abspath(__file__))
+DATA_JSON_YOLU = os.path.join(PAKET_DIZINI, "data.json")
+ESKI_DB_YOLU = os.path.join(PAKET_DIZINI, "beauty_tech.db") # Admin formunun eski products tablosu
 
 # --- DEVASA ÜRÜN HAVUZU ---
 # Her kategoride birden fazla ürün var.
 # Sistem her seferinde bunlardan birini RASTGELE seçecek.
+# Not: Artık sadece boş veritabanında 'urunler' tablosunu tohumlamak için
+# kullanılır; öneriler katalogdan (katalog.py) okunur.
 
 URUN_HAVUZU = {
     # ---------------------------------------------------------
@@ -71,68 +87,340 @@ URUN_HAVUZU = {
 }
 
 def tablolari_olustur():
-    """Veritabanı tablosunu oluşturur"""
-    conn = sqlite3.connect('beauty.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS analizler (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tarih TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            leke_sayisi INTEGER,
-            genel_skor INTEGER,
-            onerilen_urun TEXT
-        )
-    ''')
-    conn.commit()
+    """Şemayı son sürüme getirir (bkz. sema.py), boş kataloğu tohumlar."""
+    conn = sqlite3.connect(DB_YOLU)
+    # Sadece yeni dosyada etkili (tablolardan önce): arsiv.py silinen sayfaları dilim dilim geri verebilsin
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL kalıcıdır (dosyaya yazılır): okuyucular (frontend, sağlık kontrolü) yazıcıyı beklemez.
+    conn.execute('PRAGMA journal_mode=WAL')
+    sema.guncelle(conn, son=1) # Katalog tabloları
+    if conn.execute('SELECT COUNT(*) FROM urunler').fetchone()[0] == 0:
+        # İlk kurulum: üç eski kaynağı tek tabloya topla. Sonraki göçler
+        # (urun_id doldurma) geçmişteki adları bu ürünlerle eşler.
+        katalog.urunleri_yaz(conn, katalog.havuzdan(URUN_HAVUZU), "havuz")
+        katalog.urunleri_yaz(conn, katalog.eski_dbden(ESKI_DB_YOLU), "admin")
+        katalog.urunleri_yaz(conn, katalog.jsondan(DATA_JSON_YOLU) or [], "json")
+        conn.commit()
+    sema.guncelle(conn)
     conn.close()
+    urun_katalogu.yenile()
 
 def baslangic_verisi_ekle():
     pass 
 
-def analiz_kaydet(leke_sayisi, genel_skor, onerilen_urun):
+def saglik_kontrolu():
+    """Veritabanı açılabiliyor, analizler tablosu okunabiliyor ve yazıcı ayaktaysa True."""
+    if yazici._thread is not None and not yazici.calisiyor:
+        print("DB Sağlık Hatası: yazıcı thread'i durmuş")
+        return False
     try:
-        conn = sqlite3.connect('beauty.db')
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO analizler (leke_sayisi, genel_skor, onerilen_urun) VALUES (?, ?, ?)',
-                       (leke_sayisi, genel_skor, onerilen_urun))
-        conn.commit()
+        conn = sqlite3.connect(DB_YOLU, timeout=1)
+        conn.execute('SELECT 1 FROM analizler LIMIT 1').fetchall()
         conn.close()
+        return True
     except Exception as e:
-        print(f"Kayıt Hatası: {e}")
+        print(f"DB Sağlık Hatası: {e}")
+        return False
+
+# ==========================================
+# ANALİZ ÖZETLERİ (Rollup tabloları)
+# ==========================================
+# Patron ekranı her Streamlit yenilemesinde tüm geçmişi DataFrame'e
+# yüklüyordu. Özetler artık 'analizler'e her INSERT'te tetikleyiciyle, aynı
+# transaction içinde güncellenir; panel gün sayısı kadar satır okur.
+# Sadece INSERT izlenir: arşivlenip silinen satırlar özetlerde kalır.
+
+# Tablolar ve tetikleyici: sema.py. Ürünler urun_id (urunler.id) ile sayılır.
 
-def en_uygun_urunu_bul(leke_sayisi, kirisiklik_indeksi, cilt_tipi="normal"):
+_okuyucular = threading.local()
+
+def _oku(sorgu, parametreler=()):
     """
-    Kategoriye göre ürün listesini bulur ve içinden RASTGELE birini seçer.
+    Thread başına kalıcı, salt okunur bağlantı: sorgular her çağrıda yeniden
+    derlenmez (sqlite3'ün hazır ifade önbelleği bağlantıya bağlıdır).
     """
-    secilen_kategori = "normal"
-    
-    # 1. Önce Cilt Tipi (Kuru/Yağlı)
-    if cilt_tipi == "Kuru Cilt":
-        secilen_kategori = "kuru"
-    elif cilt_tipi == "Yağlı Cilt":
-        # Yağlı ama çok lekeli ise leke kategorisine kay
-        if leke_sayisi > 20:
-             secilen_kategori = "leke"
-        else:
-             secilen_kategori = "yagli"
-    
-    # 2. Eğer cilt tipi 'Karma/Normal' ise Soruna Bak
-    else:
-        # Ciddi kırışıklık varsa
-        if kirisiklik_indeksi > 60: # Eşik değerler main.py ile uyumlu
-            secilen_kategori = "kirisik"
-        # Ciddi leke varsa
-        elif leke_sayisi > 15:
-            secilen_kategori = "leke"
-        else:
-            secilen_kategori = "normal"
-            
-    # LİSTEDEN RASTGELE SEÇİM YAP (SİHİRLİ DOKUNUŞ BURADA)
-    # random.choice() fonksiyonu liste içinden kura çeker gibi birini alır.
+    conn = getattr(_okuyucular, "conn", None)
+    if conn is None or _okuyucular.yol != DB_YOLU:
+        conn = sqlite3.connect(DB_YOLU, timeout=5, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA query_only=1')
+        _okuyucular.conn, _okuyucular.yol = conn, DB_YOLU
+    try:
+        return [dict(satir) for satir in conn.execute(sorgu, parametreler)]
+    finally:
+        if conn.in_transaction: # WAL'da açık okuma, checkpoint'i bekletmesin
+            conn.rollback()
+
+def analiz_ozeti():
+    """Tüm zamanlar: toplam analiz, ortalama skor, en son analiz zamanı."""
+    return _oku('''
+        SELECT COALESCE(SUM(adet), 0) AS toplam, CAST(SUM(skor_toplam) AS REAL) / SUM(adet) AS ortalama_skor,
+               MAX(son_tarih) AS son_tarih
+        FROM gunluk_ozet
+    ''')[0]
+
+def gunluk_ozetler(gun_sayisi=None):
+    """Gün başına adet, ortalama skor ve ortalama leke (eskiden yeniye). gun_sayisi: sadece son N gün."""
+    return _oku('''
+        SELECT * FROM (
+            SELECT gun, adet, CAST(skor_toplam AS REAL) / adet AS ortalama_skor, CAST(leke_toplam AS REAL) / adet AS ortalama_leke
+            FROM gunluk_ozet ORDER BY gun DESC LIMIT ?
+        ) ORDER BY gun
+    ''', (gun_sayisi or -1,))
+
+def skor_dagilimi(baslangic_gunu=None):
+    """Skor dilimi başına analiz sayısı; baslangic_gunu ('YYYY-MM-DD') verilirse o günden itibaren."""
+    return _oku(f'''
+        SELECT dilim * {sema.SKOR_DILIMI} AS alt_sinir, SUM(adet) AS adet FROM gunluk_skor_dagilimi
+        WHERE gun >= ? GROUP BY dilim ORDER BY dilim
+    ''', (baslangic_gunu or "",))
+
+def urun_oneri_sayilari(limit=10):
+    """En çok önerilen ürünler (katalogdan silinmiş ürünün adı boş)."""
+    return _oku('''
+        SELECT s.urun_id, u.urun_adi AS urun, u.marka, s.adet, s.son_tarih
+        FROM urun_oneri_sayilari s LEFT JOIN urunler u ON u.id = s.urun_id
+        ORDER BY s.adet DESC LIMIT ?
+    ''', (limit,))
+
+# ==========================================
+# ANALİZ GEÇMİŞİ (Keyset sayfalama)
+# ==========================================
+# Sıra (tarih, id) azalan: id aynı saniyedeki satırları ayırır. İmleç son
+# satırın (tarih, id)'si; sonraki sayfa "ondan küçük" satırlarla başlar, bu
+# yüzden araya yeni kayıt girse de sayfalar kaymaz ve OFFSET taraması olmaz.
+# Ürün filtresi (urun_id, tarih, id) indeksini, diğerleri (tarih, id)
+# indeksini kullanır; skor aralığı o tarama sırasında elenir. Ürün adı
+# verilirse katalogda id'ye çevrilir, sorgu yine tamsayı indeksinden gider.
+
+SAYFA_LIMITI = 200
+
+def imlec_olustur(tarih, kayit_id):
+    return base64.urlsafe_b64encode(f"{tarih}|{kayit_id}".encode()).decode()
+
+def imlec_coz(imlec):
+    """İmleç -> (tarih, id). Bozuksa ValueError."""
     try:
-        urun_listesi = URUN_HAVUZU.get(secilen_kategori, URUN_HAVUZU["normal"])
-        secilen_urun = random.choice(urun_listesi)
-        return secilen_urun
-    except:
-        # Herhangi bir hata olursa varsayılan dön
-        return {"marka": "Nivea", "urun_adi": "Aqua Sensation", "link": "https://www.trendyol.com/sr?q=nivea"}
\ No newline at end of file
+        tarih, kayit_id = base64.urlsafe_b64decode(imlec.encode()).decode().rsplit("|", 1)
+        return tarih, int(kayit_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Geçersiz imleç: {imlec}") from e
+
+def _urun_kosulu(urun):
+    """Ürün adı -> analizler üzerinde koşul. Katalogda olmayan ad (varsayılan ürün) kayıttaki metinle eşlenir."""
+    idler = [u["id"] for u in urun_katalogu.gorunum.urunler if u["urun_adi"] == urun]
+    if len(idler) == 1:
+        return 'a.urun_id = ?', idler
+    if idler: # Aynı ad, farklı markalar
+        return f'a.urun_id IN ({", ".join("?" * len(idler))})', idler
+    return 'a.onerilen_urun = ?', [urun]
+
+def analiz_sayfasi(limit=50, imlec=None, baslangic=None, bitis=None, skor_min=None, skor_max=None, urun=None,
+                   urun_id=None):
+    """
+    Yeniden eskiye bir sayfa analiz. baslangic dahil, bitis hariç ('YYYY-MM-DD'
+    ya da 'YYYY-MM-DD HH:MM:SS'); skor_min/skor_max dahil. urun_id verilirse
+    urun (ad) yok sayılır.
+    Dönüş: {"analizler": [...], "sonraki_imlec": son sayfadaysa None}.
+    """
+    limit = max(1, min(int(limit), SAYFA_LIMITI))
+    kosullar, parametreler = [], []
+    if imlec:
+        kosullar.append('(a.tarih, a.id) < (?, ?)')
+        parametreler += imlec_coz(imlec)
+    for kosul, deger in (('a.tarih >= ?', baslangic), ('a.tarih < ?', bitis), ('a.genel_skor >= ?', skor_min),
+                         ('a.genel_skor <= ?', skor_max), ('a.urun_id = ?', urun_id)):
+        if deger is not None:
+            kosullar.append(kosul)
+            parametreler.append(deger)
+    if urun is not None and urun_id is None:
+        kosul, degerler = _urun_kosulu(urun)
+        kosullar.append(kosul)
+        parametreler += degerler
+    nerede = f"WHERE {' AND '.join(kosullar)}" if kosullar else ""
+    satirlar = _oku(f'''
+        SELECT a.id, a.tarih, a.leke_sayisi, a.genel_skor, a.onerilen_urun, a.urun_id, u.marka
+        FROM analizler a LEFT JOIN urunler u ON u.id = a.urun_id {nerede}
+        ORDER BY a.tarih DESC, a.id DESC LIMIT ?
+    ''', parametreler + [limit + 1]) # Fazladan bir satır: sonraki sayfa var mı
+    sonraki = imlec_olustur(satirlar[limit - 1]["tarih"], satirlar[limit - 1]["id"]) if len(satirlar) > limit else None
+    return {"analizler": satirlar[:limit], "sonraki_imlec": sonraki}
+
+# ==========================================
+# ARKA PLAN YAZICI (Write-behind)
+# ==========================================
+# Her analiz için istek yolunda bağlantı aç + INSERT + commit + kapat
+# yapılıyordu; eşzamanlı isteklerde "database is locked" ile satırlar
+# kayboluyordu. Artık istekler sadece sınırlı bir kuyruğa ekler; tek bir
+# thread tek ve kalıcı bağlantıyla (WAL, synchronous=NORMAL) kuyruktakileri
+# birkaç ms'de bir tek transaction'da yazar. Kapanışta kuyruk boşaltılır.
+
+KAYIT_KUYRUGU_LIMITI = int(os.environ.get("DB_KAYIT_KUYRUGU_LIMITI", 10000)) # satır
+YAZMA_ARALIGI_MS = float(os.environ.get("DB_YAZMA_ARALIGI_MS", 5)) # İlk satırdan sonra toplanacak süre
+YIGIN_LIMITI = 500 # Tek transaction'daki en fazla satır
+YENIDEN_DENEME = 3 # Kilit/IO hatasında aynı yığın için deneme sayısı
+
+_DUR = object()
+
+
+class KayitYazici:
+    """Sınırlı kuyruk + tek bağlantılı arka plan yazıcı. Sayaçlar /metrics'e okunur."""
+
+    def __init__(self, limit=KAYIT_KUYRUGU_LIMITI):
+        self._kuyruk = queue.Queue(maxsize=limit)
+        self._kilit = threading.Lock()
+        self._thread = None
+        self._durdur = threading.Event()
+        self.yazilan = 0
+        self.dusen = 0 # Kuyruk doluyken gelen satırlar
+        self.hatali = 0 # Denemeler tükendiği için yazılamayan satırlar
+        self.yazma_histogrami = metrikler.Histogram("islem")
+
+    @property
+    def derinlik(self):
+        return self._kuyruk.qsize()
+
+    @property
+    def calisiyor(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def baslat(self):
+        with self._kilit:
+            if not self.calisiyor:
+                self._durdur.clear()
+                self._thread = threading.Thread(target=self._dongu, name="db-yazici", daemon=True)
+                self._thread.start()
+
+    def ekle(self, kayitlar):
+        """(leke_sayisi, genel_skor, onerilen_urun, urun_id) satırlarını kuyruğa ekler; beklemez."""
+        self.baslat()
+        dusen = 0
+        for kayit in kayitlar:
+            try:
+                self._kuyruk.put_nowait(kayit)
+            except queue.Full:
+                dusen += 1
+        if dusen:
+            with self._kilit:
+                self.dusen += dusen
+            print(f"Kayıt Hatası: yazma kuyruğu dolu ({self._kuyruk.maxsize}), {dusen} satır atlandı")
+
+    def kapat(self, zaman_asimi=10):
+        """Kuyruktaki her şeyi yazar ve thread'i durdurur; en fazla zaman_asimi sn bekler."""
+        if not self.calisiyor:
+            return
+        son = time.monotonic() + zaman_asimi
+        # Kuyruk doluyken (yazıcı kilitte takılı) _DUR sığmayabilir; bayrak döngüyü yine durdurur
+        self._durdur.set()
+        try:
+            self._kuyruk.put(_DUR, timeout=zaman_asimi)
+        except queue.Full:
+            print(f"Kayıt Hatası: kapanışta yazma kuyruğu dolu, {self.derinlik} satır yazılamayabilir")
+        self._thread.join(max(0, son - time.monotonic()))
+
+    def _baglan(self):
+        conn = sqlite3.connect(DB_YOLU, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL') # WAL'da commit başına fsync yok, checkpoint'te var
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _dongu(self):
+        conn = self._baglan()
+        bitti = False
+        while not bitti:
+            try:
+                kayit = self._kuyruk.get(timeout=0.5)
+            except queue.Empty:
+                if self._durdur.is_set():
+                    break
+                continue
+            if kayit is _DUR:
+                break
+            yigin = [kayit]
+            son = time.monotonic() + YAZMA_ARALIGI_MS / 1000
+            while len(yigin) < YIGIN_LIMITI:
+                kalan = son - time.monotonic()
+                try:
+                    kayit = self._kuyruk.get(timeout=kalan) if kalan > 0 else self._kuyruk.get_nowait()
+                except queue.Empty:
+                    break
+                if kayit is _DUR:
+                    bitti = True
+                    break
+                yigin.append(kayit)
+            self._yaz(conn, yigin)
+        # Durdurulurken kuyrukta kalanlar
+        kalanlar = []
+        while True:
+            try:
+                kayit = self._kuyruk.get_nowait()
+            except queue.Empty:
+                break
+            if kayit is not _DUR:
+                kalanlar.append(kayit)
+        for i in range(0, len(kalanlar), YIGIN_LIMITI):
+            self._yaz(conn, kalanlar[i:i + YIGIN_LIMITI])
+        conn.close()
+
+    def _yaz(self, conn, yigin):
+        for deneme in range(YENIDEN_DENEME):
+            t0 = time.perf_counter()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany('INSERT INTO analizler (leke_sayisi, genel_skor, onerilen_urun, urun_id) VALUES (?, ?, ?, ?)', yigin)
+                conn.execute('COMMIT')
+                self.yazma_histogrami.gozlemle("yazma", time.perf_counter() - t0)
+                with self._kilit:
+                    self.yazilan += len(yigin)
+                return
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                print(f"Kayıt Hatası (deneme {deneme + 1}/{YENIDEN_DENEME}, {len(yigin)} satır): {e}")
+                time.sleep(0.05 * (deneme + 1))
+        with self._kilit:
+            self.hatali += len(yigin)
+
+
+yazici = KayitYazici()
+
+def _kayit(leke_sayisi, genel_skor, urun):
+    # Ad, kayıt anındaki haliyle saklanır (arşiv/dışa aktarım); sorgular urun_id'den gider
+    return (leke_sayisi, genel_skor, urun["urun_adi"], urun.get("id"))
+
+def analiz_kaydet(leke_sayisi, genel_skor, urun):
+    """urun: katalog ürünü (sözlük); katalog dışı ürünün 'id'si yoksa urun_id NULL kalır."""
+    yazici.ekle([_kayit(leke_sayisi, genel_skor, urun)])
+
+def analizleri_kaydet(kayitlar):
+    """Toplu kayıt: (leke_sayisi, genel_skor, ürün) listesi aynı yazıcı kuyruğuna eklenir."""
+    yazici.ekle([_kayit(*k) for k in kayitlar])
+
+# ==========================================
+# ÜRÜN KATALOĞU
+# ==========================================
+urun_katalogu = katalog.Katalog(DB_YOLU, DATA_JSON_YOLU)
+
+def urun_ekle_sql(ad, marka, problem, esik, link, fiyat):
+    """Admin formu: ürünü kataloğa ekler (aynı ad+marka varsa günceller)."""
+    urun_katalogu.urun_ekle({"urun_adi": ad, "marka": marka, "kategori": problem,
+                             "esik_deger": esik, "link": link, "fiyat": fiyat})
+
+def tum_urunleri_getir():
+    """Katalogdaki tüm ürünler (eşiğe göre artan)."""
+    return urun_katalogu.tumu()
+
+onerici = oneri.Onerici(urun_katalogu)
+
+def urunleri_bul(sonuclar, fiyat_ust=None, markalar=None):
+    """Toplu öneri: analiz sonuçları için sırayla ürün (ya da None) döner."""
+    return [en_uygun_urunu_bul(sonuc, fiyat_ust, markalar) for sonuc in sonuclar]
+
+def en_uygun_urunu_bul(sonuc, fiyat_ust=None, markalar=None):
+    """
+    Analiz sonucuna (leke, kırışıklık, cilt tipi, kızarıklık, göz altı) en
+    uygun ürünlerden RASTGELE birini seçer (bkz. oneri.py).
+    fiyat_ust / markalar filtresine uyan ürün yoksa None döner.
+    """
+    return onerici.oner(sonuc, fiyat_ust, markalar)
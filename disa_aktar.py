@@ -0,0 +1,115 @@
+"""
+Analiz geçmişini CSV ya da JSONL olarak akış halinde dışa aktarır.
+
+Satırlar tek bir okuma imleciyle fetchmany ile parça parça çekilir, her
+parça hemen yazılır/gönderilir; bellek kullanımı satır sayısından
+bağımsızdır. gzip istenirse çıktı aynı akışta sıkıştırılır (zlib, gzip
+başlıklı). Arşive taşınmış aylar zaten JSONL.gz dosyalarıdır (bkz. arsiv.py).
+
+Kullanım:
+    python disa_aktar.py [--bicim csv|jsonl] [--gzip] [--baslangic 2026-01-01] [--bitis 2026-02-01] [-o dosya]
+
+Çıktı dosyası verilmezse stdout'a yazılır; '.gz' ile biten dosya adı gzip'i açar.
+API karşılığı: GET /analizler/disa_aktar
+"""
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import zlib
+
+import database
+
+BICIMLER = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+PARCA_SATIR = 1000 # fetchmany başına satır (= bir yanıt parçası)
+
+ALANLAR = ("id", "tarih", "leke_sayisi", "genel_skor", "onerilen_urun", "urun_id")
+
+
+def satir_parcalari(baslangic=None, bitis=None, db_yolu=None):
+    """(tarih, id) sırasıyla satır listeleri üretir. baslangic dahil, bitis hariç."""
+    kosullar, parametreler = [], []
+    if baslangic is not None:
+        kosullar.append('tarih >= ?')
+        parametreler.append(baslangic)
+    if bitis is not None:
+        kosullar.append('tarih < ?')
+        parametreler.append(bitis)
+    nerede = f"WHERE {' AND '.join(kosullar)}" if kosullar else ""
+    # Akış yanıtında parçalar farklı thread'lerden çekilebilir
+    conn = sqlite3.connect(db_yolu or database.DB_YOLU, timeout=5, check_same_thread=False)
+    try:
+        imlec = conn.execute(f'SELECT {", ".join(ALANLAR)} FROM analizler {nerede} ORDER BY tarih, id', parametreler)
+        while True:
+            satirlar = imlec.fetchmany(PARCA_SATIR)
+            if not satirlar:
+                break
+            yield satirlar
+    finally:
+        conn.close()
+
+
+def _csv_parcalari(parcalar):
+    tampon = io.StringIO()
+    yazar = csv.writer(tampon)
+    yazar.writerow(ALANLAR)
+    for satirlar in parcalar:
+        yazar.writerows(satirlar)
+        yield tampon.getvalue().encode("utf-8")
+        tampon.seek(0)
+        tampon.truncate()
+    if tampon.tell(): # Hiç satır yoksa sadece başlık
+        yield tampon.getvalue().encode("utf-8")
+
+
+def _jsonl_parcalari(parcalar):
+    for satirlar in parcalar:
+        yield "".join(json.dumps(dict(zip(ALANLAR, s)), ensure_ascii=False) + "\n" for s in satirlar).encode("utf-8")
+
+
+def _gzip_parcalari(parcalar):
+    sikistirici = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31: gzip başlığı + CRC
+    for parca in parcalar:
+        cikti = sikistirici.compress(parca)
+        if cikti:
+            yield cikti
+    yield sikistirici.flush()
+
+
+def akis(bicim="csv", sikistir=False, baslangic=None, bitis=None, db_yolu=None):
+    """Dışa aktarım baytlarını parça parça üretir. Geçersiz biçim ValueError."""
+    if bicim not in BICIMLER:
+        raise ValueError(f"bicim şunlardan biri olmalı: {', '.join(BICIMLER)}")
+    parcalar = satir_parcalari(baslangic, bitis, db_yolu)
+    baytlar = _csv_parcalari(parcalar) if bicim == "csv" else _jsonl_parcalari(parcalar)
+    return _gzip_parcalari(baytlar) if sikistir else baytlar
+
+
+def dosya_adi(bicim, sikistir):
+    return f"analizler.{bicim}" + (".gz" if sikistir else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bicim", choices=list(BICIMLER), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--baslangic", help="Dahil (YYYY-MM-DD ya da 'YYYY-MM-DD HH:MM:SS', UTC)")
+    parser.add_argument("--bitis", help="Hariç")
+    parser.add_argument("-o", "--cikti", help="Çıktı dosyası (varsayılan: stdout)")
+    args = parser.parse_args()
+
+    database.tablolari_olustur() # Şema güncel değilse urun_id sütunu yoktur
+    sikistir = args.gzip or bool(args.cikti and args.cikti.endswith(".gz"))
+    hedef = open(args.cikti, "wb") if args.cikti else sys.stdout.buffer
+    try:
+        for parca in akis(args.bicim, sikistir, args.baslangic, args.bitis):
+            hedef.write(parca)
+    finally:
+        if args.cikti:
+            hedef.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,22 @@ from PIL import Image
 import io
 import database # SQL Veritabanı modülümüzü çağırıyoruz
 import pandas as pd # Tablo ve grafikler için
+from datetime import timedelta
 
 # --- AYARLAR ---
-API_URL = "http://127.0.0.1:8000/analiz_et"
+API_KOKU = "http://127.0.0.1:8000"
+API_URL = f"{API_KOKU}/analiz_et"
+GECMIS_URL = f"{API_KOKU}/analizler" # Geçmiş sayfaları API'den (filtre doğrulaması ve imleç biçimi tek yerde)
+GECMIS_SAYFA_BOYUTU = 25
 st.set_page_config(page_title="BeautyTech AI", page_icon="💄", layout="wide")
 
+@st.cache_resource
+def veritabani_hazirla():
+    # Tablolar/özetler API kapalıyken de hazır olsun; Streamlit her etkileşimde script'i yeniden çalıştırır, bu bir kez çalışır
+    database.tablolari_olustur()
+
+veritabani_hazirla()
+
 # --- YAN MENÜ ---
 st.sidebar.title("BeautyTech Menü")
 secim = st.sidebar.radio("Git:", ["👤 Kullanici Modu", "📊 Patron Ekrani (Admin)"])
@@ -79,149 +90,72 @@ elif secim == "📊 Patron Ekrani (Admin)":
         with tab1:
             st.subheader("Sistem Performans Raporu")
             
-            # Veritabanından geçmişi çek
-            gecmis_data = database.analiz_gecmisini_getir()
+            # Özet tablolarından oku (gün sayısı kadar satır; tüm geçmiş yüklenmez)
+            ozet = database.analiz_ozeti()
             
-            if gecmis_data:
-                df = pd.DataFrame(gecmis_data)
-                
+            if ozet['toplam']:
                 # Özet Kartlar
                 c1, c2, c3 = st.columns(3)
-                c1.metric("Toplam Analiz", len(df))
-                c2.metric("Ortalama Cilt Skoru", int(df['cilt_skoru'].mean()))
-                c3.metric("En Son Analiz", df['tarih'].iloc[0])
+                c1.metric("Toplam Analiz", ozet['toplam'])
+                c2.metric("Ortalama Cilt Skoru", int(ozet['ortalama_skor']))
+                c3.metric("En Son Analiz", ozet['son_tarih'])
                 
-                # Tabloyu Göster
-                st.dataframe(df, use_container_width=True)
+                # Grafik: Günlük Ortalama Cilt Skoru
+                gunluk = pd.DataFrame(database.gunluk_ozetler(gun_sayisi=90))
+                st.subheader("Zaman icinde Analiz Skorlari (gunluk ortalama)")
+                st.line_chart(gunluk.set_index('gun')['ortalama_skor'])
+                st.bar_chart(gunluk.set_index('gun')['adet'])
                 
-                # Grafik: Zamanla Cilt Skoru Değişimi
-                st.subheader("Zaman icinde Analiz Skorlari")
-                st.line_chart(df.set_index('tarih')['cilt_skoru'])
-            else:
-                st.info("Henuz hic analiz yapilmadi.")
-
-        # --- SEKME 2: ÜRÜN EKLEME ---
-        with tab2:
-            st.subheader("Yeni Urun Ekle")
-            with st.form("sql_urun_form"):
-                ad = st.text_input("Urun Adi")
-                marka = st.text_input("Marka")
-                problem = st.selectbox("Hedef Problem", ["Problemli", "Yorgun", "Mükemmel", "Kuru"])
-                esik = st.slider("Leke Esik Degeri", 0, 100, 30)
-                fiyat = st.number_input("Fiyat (TL)", 0, 5000, 100)
-                link = st.text_input("Satis Linki")
+                g1, g2 = st.columns(2)
+                with g1:
+                    st.subheader("Skor Dagilimi")
+                    dagilim = pd.DataFrame(database.skor_dagilimi())
+                    st.bar_chart(dagilim.set_index('alt_sinir')['adet'])
+                with g2:
+                    st.subheader("En Cok Onerilen Urunler")
+                    st.table(database.urun_oneri_sayilari())
                 
-                if st.form_submit_button("Veritabanina Kaydet"):
-                    database.urun_ekle_sql(ad, marka, problem, esik, link, fiyat)
-                    st.success("✅ Urun SQL Veritabanina Eklendi!")
-                    st.experimental_rerun()
-                    
-            st.divider()
-            st.subheader("Mevcut Urunler")
-            urunler = database.tum_urunleri_getir()
-            st.table(urunler)
-            
-    else:
-
-import streamlit as st
-import requests
-from PIL import Image
-import io
-import database # SQL Veritabanı modülümüzü çağırıyoruz
-import pandas as pd # Tablo ve grafikler için
-
-# --- AYARLAR ---
-API_URL = "http://127.0.0.1:8000/analiz_et"
-st.set_page_config(page_title="BeautyTech AI", page_icon="💄", layout="wide")
-
-# --- YAN MENÜ ---
-st.sidebar.title("BeautyTech Menü")
-secim = st.sidebar.radio("Git:", ["👤 Kullanici Modu", "📊 Patron Ekrani (Admin)"])
-
-# ==========================================
-# MOD 1: KULLANICI ARAYÜZÜ
-# ==========================================
-if secim == "👤 Kullanici Modu":
-    st.header("Yapay Zeka Cilt Analizi 📸")
-    
-    # Kamera veya Dosya Seçimi
-    kaynak = st.radio("Fotograf Kaynagi:", ["Dosya Yukle", "Kamera Ac"], horizontal=True)
-    
-    img_file = None
-    if kaynak == "Dosya Yukle":
-        img_file = st.file_uploader("Fotograf Sec...", type=["jpg", "png"])
-    else:
-        img_file = st.camera_input("Selfie Cek")
-
-    if img_file is not None:
-        # Görseli göster (Sadece dosya yüklemedeyse, kamera zaten gösteriyor)
-        if kaynak == "Dosya Yukle":
-            image = Image.open(img_file)
-            st.image(image, width=300)
-        else:
-            image = Image.open(img_file)
-
-        if st.button("🔍 Analiz Et", type="primary"):
-            with st.spinner('AI cildinizi tarıyor...'):
+                # Geçmiş: filtreli, sayfa sayfa (keyset imleciyle; yeni kayıtlar sayfaları kaydırmaz)
+                st.subheader("Analiz Gecmisi")
+                f1, f2, f3 = st.columns(3)
+                tarih_araligi = f1.date_input("Tarih Araligi", value=())
+                skor_araligi = f2.slider("Skor Araligi", 0, 100, (0, 100))
+                # Katalogdan seçim: filtre urun_id ile indeksten gider
+                urun_secenekleri = {None: "(Tumu)"}
+                urun_secenekleri.update((u['id'], f"{u['urun_adi']} ({u['marka']})") for u in database.tum_urunleri_getir())
+                urun_filtresi = f3.selectbox("Onerilen Urun", list(urun_secenekleri), format_func=urun_secenekleri.get)
+                filtre = {
+                    "baslangic": str(tarih_araligi[0]) if len(tarih_araligi) == 2 else None,
+                    "bitis": str(tarih_araligi[1] + timedelta(days=1)) if len(tarih_araligi) == 2 else None, # bitiş günü dahil
+                    "skor_min": skor_araligi[0] or None,
+                    "skor_max": skor_araligi[1] if skor_araligi[1] < 100 else None,
+                    "urun_id": urun_filtresi,
+                }
+                if st.session_state.get("gecmis_filtresi") != filtre:
+                    st.session_state.gecmis_filtresi = filtre
+                    st.session_state.gecmis_imlecleri = [None] # Açık sayfaların başlangıç imleçleri
+                imlecler = st.session_state.gecmis_imlecleri
+                
+                sayfa = {'analizler': [], 'sonraki_imlec': None}
                 try:
-                    # API'ye Gönderim Hazırlığı
-                    img_byte_arr = io.BytesIO()
-                    image.save(img_byte_arr, format='JPEG') # Hepsini JPEG'e çevir
-                    img_bytes = img_byte_arr.getvalue()
-
-                    files = {'file': ('image.jpg', img_bytes, 'image/jpeg')}
-                    response = requests.post(API_URL, files=files)
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        # Sonuçları Göster
-                        col1, col2, col3 = st.columns(3)
-                        col1.metric("Cilt Skoru", f"{data['cilt_skoru']}/100", f"{data['cilt_skoru']-100}")
-                        col2.metric("Leke Sayisi", f"{data['leke_sayisi']} adet")
-                        col3.metric("Tespit", data['reçete']['sorun'])
-                        
-                        st.success(f"Oneri: {data['reçete']['onerilen_urun']} ({data['reçete']['marka']})")
-                        st.link_button("🛒 Satin Al", data['reçete']['link'])
-                        
+                    # None olan parametreleri requests göndermez
+                    yanit = requests.get(GECMIS_URL, params=dict(filtre, limit=GECMIS_SAYFA_BOYUTU, imlec=imlecler[-1]), timeout=10)
+                    if yanit.status_code == 200:
+                        sayfa = yanit.json()
                     else:
-                        st.error("Analiz yapilamadi. Yuz net gorunmuyor olabilir.")
+                        st.error(f"Gecmis alinamadi: {yanit.json().get('detail', yanit.status_code)}")
                 except Exception as e:
                     st.error(f"Baglanti Hatasi: {e}")
-
-# ==========================================
-# MOD 2: PATRON EKRANI (DASHBOARD)
-# ==========================================
-elif secim == "📊 Patron Ekrani (Admin)":
-    st.title("Yonetim Paneli 🛠️")
-    
-    sifre = st.sidebar.text_input("Admin Sifresi", type="password")
-    
-    if sifre == "admin123":
-        tab1, tab2 = st.tabs(["📈 Analiz Gecmisi", "➕ Urun Yonetimi"])
-        
-        # --- SEKME 1: ANALİZ RAPORLARI ---
-        with tab1:
-            st.subheader("Sistem Performans Raporu")
-            
-            # Veritabanından geçmişi çek
-            gecmis_data = database.analiz_gecmisini_getir()
-            
-            if gecmis_data:
-                df = pd.DataFrame(gecmis_data)
+                st.dataframe(pd.DataFrame(sayfa['analizler']), use_container_width=True)
                 
-                # Özet Kartlar
-                c1, c2, c3 = st.columns(3)
-                c1.metric("Toplam Analiz", len(df))
-                c2.metric("Ortalama Cilt Skoru", int(df['cilt_skoru'].mean()))
-                c3.metric("En Son Analiz", df['tarih'].iloc[0])
-                
-                # Tabloyu Göster
-                st.dataframe(df, use_container_width=True)
-                
-                # Grafik: Zamanla Cilt Skoru Değişimi
-                st.subheader("Zaman icinde Analiz Skorlari")
-                st.line_chart(df.set_index('tarih')['cilt_skoru'])
+                p1, p2, p3 = st.columns([1, 1, 4])
+                if p1.button("◀ Onceki", disabled=len(imlecler) == 1):
+                    imlecler.pop()
+                    st.experimental_rerun()
+                if p2.button("Sonraki ▶", disabled=sayfa['sonraki_imlec'] is None):
+                    imlecler.append(sayfa['sonraki_imlec'])
+                    st.experimental_rerun()
+                p3.caption(f"Sayfa {len(imlecler)}")
             else:
                 st.info("Henuz hic analiz yapilmadi.")
 
@@ -247,5 +181,4 @@ elif secim == "📊 Patron Ekrani (Admin)":
             st.table(urunler)
             
     else:
-
         st.warning("Giris yapmak icin sifreyi giriniz.")
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+beauty.db'yi son şema sürümüne getirir ve eski beauty_tech.db'yi içine katar.
+
+beauty.db: sema.py'deki göçler uygulanır (analizler.urun_id doldurulur,
+ürün sayaçları id'ye taşınır, indeksler kurulur).
+
+beauty_tech.db (admin formunun eski dosyası):
+  products          -> urunler (aynı ad + marka varsa güncellenir, kaynak 'admin')
+  analysis_history  -> analizler (cilt_skoru -> genel_skor, onerilen_urun_id -> yeni urun_id)
+Geçmiş satırları özet tetikleyicisinden geçer, panelde de görünür. Hepsi tek
+transaction'da yapılır ve 'aktarimlar' tablosuna yazılır; tekrar çalıştırmak
+aynı satırları ikinci kez eklemez. Eski dosya değiştirilmez, silinmez.
+
+Kullanım:
+    python goc.py [--eski beauty_tech.db] [--kuru]
+"""
+import argparse
+import os
+import sqlite3
+
+import database
+import katalog
+import sema
+
+
+def _eski_gecmis(yol):
+    """analysis_history satırları, eski ürün id'siyle birlikte ürün adı ve markası."""
+    conn = sqlite3.connect(f"file:{yol}?mode=ro", uri=True)
+    try:
+        return conn.execute('''
+            SELECT h.tarih, h.leke_sayisi, h.cilt_skoru, p.ad, COALESCE(p.marka, '')
+            FROM analysis_history h LEFT JOIN products p ON p.id = h.onerilen_urun_id
+            ORDER BY h.tarih, h.id
+        ''').fetchall()
+    finally:
+        conn.close()
+
+
+def eski_dbyi_kat(yol=database.ESKI_DB_YOLU, db_yolu=None, kuru=False):
+    """
+    beauty_tech.db'yi beauty.db'ye katar. {"urun": n, "analiz": n, "atlandi": bool} döner.
+    Dosya yoksa ya da daha önce katıldıysa hiçbir şey yazılmaz.
+    """
+    kaynak = os.path.basename(yol)
+    if not os.path.exists(yol):
+        return {"urun": 0, "analiz": 0, "atlandi": True}
+    urunler = katalog.eski_dbden(yol)
+    try:
+        gecmis = _eski_gecmis(yol)
+    except sqlite3.Error as e:
+        print(f"Göç Hatası ({yol}): {e}")
+        gecmis = []
+    if kuru:
+        return {"urun": len(urunler), "analiz": len(gecmis), "atlandi": False}
+
+    conn = sqlite3.connect(db_yolu or database.DB_YOLU, timeout=5)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('SELECT 1 FROM aktarimlar WHERE kaynak = ?', (kaynak,)).fetchone():
+            conn.rollback()
+            return {"urun": 0, "analiz": 0, "atlandi": True}
+        katalog.urunleri_yaz(conn, urunler, "admin")
+        idler = dict(((ad, marka), urun_id) for urun_id, ad, marka in conn.execute('SELECT id, urun_adi, marka FROM urunler'))
+        conn.executemany('INSERT INTO analizler (tarih, leke_sayisi, genel_skor, onerilen_urun, urun_id) VALUES (?, ?, ?, ?, ?)',
+                         [(tarih, leke, skor, ad, idler.get((ad, marka))) for tarih, leke, skor, ad, marka in gecmis])
+        conn.execute('INSERT INTO aktarimlar (kaynak, satir) VALUES (?, ?)', (kaynak, len(gecmis)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {"urun": len(urunler), "analiz": len(gecmis), "atlandi": False}
+
+
+def eslesmeyen_satirlar(db_yolu=None):
+    """Adı katalogda olduğu halde urun_id'si boş kalmış analiz sayısı (göçten sonra 0 olmalı)."""
+    conn = sqlite3.connect(db_yolu or database.DB_YOLU, timeout=5)
+    try:
+        return conn.execute('''
+            SELECT COUNT(*) FROM analizler a
+            WHERE a.urun_id IS NULL AND EXISTS (SELECT 1 FROM urunler u WHERE u.urun_adi = a.onerilen_urun)
+        ''').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eski", default=database.ESKI_DB_YOLU, help="Katılacak eski veritabanı")
+    parser.add_argument("--kuru", action="store_true", help="Sadece aktarılacak satırları say, beauty.db'ye yazma")
+    args = parser.parse_args()
+
+    if args.kuru:
+        sonuc = eski_dbyi_kat(args.eski, kuru=True)
+        print(f"{args.eski}: {sonuc['urun']} ürün, {sonuc['analiz']} analiz aktarılacak (kuru çalışma)")
+        return
+
+    eski_surum = 0
+    if os.path.exists(database.DB_YOLU):
+        conn = sqlite3.connect(database.DB_YOLU)
+        eski_surum = sema.surum(conn)
+        conn.close()
+    database.tablolari_olustur()
+    print(f"{database.DB_YOLU}: şema sürümü {eski_surum} -> {sema.SON_SURUM}")
+    eslesmeyen = eslesmeyen_satirlar()
+    if eslesmeyen:
+        print(f"Göç Uyarısı: katalogdaki bir ürünü öneren {eslesmeyen} analizin urun_id'si boş")
+
+    sonuc = eski_dbyi_kat(args.eski)
+    if sonuc["atlandi"]:
+        print(f"{args.eski}: bulunamadı ya da daha önce aktarılmış, atlandı")
+    else:
+        print(f"{args.eski}: {sonuc['urun']} ürün, {sonuc['analiz']} analiz aktarıldı")
+
+
+if __name__ == "__main__":
+    main()
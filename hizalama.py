@@ -0,0 +1,128 @@
+import cv2
+import numpy as np
+
+# ==========================================
+# KANONİK YÜZ HİZALAMA
+# ==========================================
+# Doku modüllerinin parametreleri (9x9 tophat, eşik 35, 17x17 blur, 25px blok,
+# 15-400 px² leke alanı) piksel cinsinden. Ham karede çalışınca maliyet
+# megapiksel ile büyüyor, skorlar da kamera çözünürlüğüyle kayıyor.
+# Burada yüz, göz ve çene landmark'larıyla sabit boyutlu bir kareye oturtulur;
+# analiz her cihazda aynı ölçekte ve sabit maliyetle yapılır.
+
+KANONIK_BOYUT = 512
+
+# Benzerlik dönüşümünün hedefleri: sol göz dış köşesi, sağ göz dış köşesi, çene ucu
+HIZALAMA_NOKTALARI = [33, 263, 152]
+KANONIK_HEDEFLER = np.array([[131.0, 170.0], [381.0, 170.0], [256.0, 480.0]], dtype=np.float32)
+
+# Bölge maskelerinin kanonik uzaydaki landmark şablonu.
+# Paketteki Cilt_Raporu_1764601789.jpg'nin landmark'larının bu dosyadaki
+# dönüşümle hizalanmış hali; yeniden üretmek için: python hizalama.py
+KANONIK_SABLON = {
+    4: (250.4, 281.7), 5: (250.3, 256.6), 6: (250.7, 193.0), 9: (249.8, 132.8), 10: (249.8, 34.3),
+    21: (75.4, 104.1), 33: (133.1, 167.9), 36: (173.6, 272.7), 50: (128.3, 268.5), 54: (88.3, 76.6),
+    58: (96.9, 339.3), 63: (104.9, 120.0), 66: (163.9, 122.6), 67: (152.4, 41.9), 70: (92.3, 130.0),
+    93: (78.2, 250.9), 100: (188.6, 236.4), 101: (163.4, 248.8), 103: (112.7, 55.3), 105: (128.9, 116.7),
+    107: (206.1, 130.0), 109: (196.8, 35.5), 116: (86.4, 218.3), 117: (117.2, 218.7), 118: (138.6, 228.4),
+    123: (91.9, 256.4), 126: (205.3, 246.2), 127: (70.3, 173.5), 132: (85.2, 293.6), 136: (129.6, 407.6),
+    137: (78.4, 254.4), 148: (221.4, 478.4), 149: (172.4, 451.6), 150: (152.2, 433.6), 152: (256.9, 481.9),
+    162: (70.2, 134.6), 168: (250.8, 171.7), 172: (112.3, 377.8), 176: (194.7, 467.5), 195: (250.5, 234.7),
+    197: (250.6, 214.3), 198: (213.8, 253.1), 203: (184.3, 297.1), 205: (150.6, 293.3), 209: (204.9, 261.5),
+    234: (73.9, 211.6), 249: (371.1, 176.7), 251: (433.7, 102.5), 263: (378.1, 170.1), 266: (334.0, 272.0),
+    280: (381.6, 267.9), 284: (417.9, 75.2), 288: (427.6, 340.2), 293: (399.0, 123.8), 296: (336.8, 124.5),
+    297: (349.1, 41.1), 300: (414.5, 134.7), 323: (442.8, 251.1), 329: (317.8, 235.8), 330: (344.0, 248.2),
+    332: (391.1, 54.1), 334: (372.7, 119.5), 336: (295.1, 130.9), 338: (303.7, 35.1), 340: (406.4, 205.5),
+    345: (425.5, 218.1), 346: (393.9, 220.4), 347: (371.3, 228.9), 348: (338.5, 225.3), 349: (315.4, 217.0),
+    352: (421.4, 256.2), 355: (300.3, 245.6), 356: (445.6, 172.5), 361: (438.0, 294.2), 365: (392.2, 408.2),
+    366: (439.2, 254.7), 373: (352.7, 184.3), 374: (337.3, 184.6), 377: (292.7, 478.3), 378: (344.7, 451.5),
+    379: (367.4, 433.8), 384: (314.2, 163.6), 385: (330.5, 157.8), 386: (346.9, 157.3), 387: (361.9, 160.2),
+    388: (370.1, 164.3), 389: (442.0, 132.9), 390: (363.5, 181.1), 397: (411.5, 378.5), 398: (302.3, 172.2),
+    400: (320.4, 467.2), 420: (290.3, 252.8), 423: (323.6, 296.2), 425: (358.8, 292.8), 429: (300.6, 260.9),
+    454: (444.6, 211.2), 466: (374.7, 167.5),
+}
+
+
+def donusum_hesapla(noktalar):
+    """
+    Tam karedeki piksel landmark'larından kanonik kareye 2x3 benzerlik matrisi
+    (dönme + eşit ölçek + öteleme). Üç noktaya en küçük kareler ile oturtulur;
+    kesme (shear) olmadığı için doku ve leke alanları bozulmaz.
+    """
+    kaynak = noktalar[HIZALAMA_NOKTALARI].astype(np.float64)
+    hedef = KANONIK_HEDEFLER.astype(np.float64)
+    ks, hs = kaynak - kaynak.mean(axis=0), hedef - hedef.mean(axis=0)
+    payda = (ks ** 2).sum()
+    a = (ks * hs).sum() / payda
+    b = (ks[:, 0] * hs[:, 1] - ks[:, 1] * hs[:, 0]).sum() / payda
+    R = np.array([[a, -b], [b, a]])
+    t = hedef.mean(axis=0) - R @ kaynak.mean(axis=0)
+    return np.hstack([R, t[:, None]])
+
+
+def noktalari_donustur(noktalar, M):
+    return noktalar @ M[:, :2].T + M[:, 2]
+
+
+def kanonik_kare(frame, M):
+    """
+    Yüzü KANONIK_BOYUT karesine oturtur. Çok büyük yüklemelerde önce sadece
+    yüzün düştüğü alan INTER_AREA ile küçültülür (warpAffine tek başına
+    aliasing üretir); kalan iş her zaman sabit boyutlu bir warp'tır.
+    """
+    olcek = np.sqrt(abs(np.linalg.det(M[:, :2])))
+    if olcek < 0.5:
+        # Kanonik karenin köşelerinin tam karede düştüğü alan
+        ters = cv2.invertAffineTransform(M)
+        S = KANONIK_BOYUT
+        koseler = noktalari_donustur(np.array([[0, 0], [S, 0], [0, S], [S, S]], dtype=np.float64), ters)
+        h, w = frame.shape[:2]
+        x0, y0 = np.clip(np.floor(koseler.min(axis=0)).astype(int), 0, [w, h])
+        x1, y1 = np.clip(np.ceil(koseler.max(axis=0)).astype(int), 0, [w, h])
+        if x1 > x0 and y1 > y0:
+            kucuk = cv2.resize(frame[y0:y1, x0:x1], None, fx=olcek, fy=olcek, interpolation=cv2.INTER_AREA)
+            # kucuk'teki q noktası tam karede q / olcek + (x0, y0)'a karşılık gelir
+            A = np.array([[1 / olcek, 0, x0], [0, 1 / olcek, y0], [0, 0, 1]])
+            return cv2.warpAffine(kucuk, M @ A, (KANONIK_BOYUT, KANONIK_BOYUT), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return cv2.warpAffine(frame, M, (KANONIK_BOYUT, KANONIK_BOYUT), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def sablon_noktalari():
+    """KANONIK_SABLON'u landmark indeksiyle adreslenebilen (478, 2) diziye çevirir."""
+    noktalar = np.zeros((478, 2), dtype=np.float64)
+    for i, (x, y) in KANONIK_SABLON.items():
+        noktalar[i] = (x, y)
+    return noktalar
+
+
+def sablon_uret(resim_yolu):
+    """Verilen resmin landmark'larını hizalayıp KANONIK_SABLON sözlüğünü üretir."""
+    import analiz
+
+    frame = cv2.imread(resim_yolu)
+    face_mesh = analiz.yuz_mesh_olustur()
+    landmarks = analiz.landmark_bul(frame, face_mesh)
+    face_mesh.close()
+    h, w = frame.shape[:2]
+    noktalar = np.array([(p.x * w, p.y * h) for p in landmarks.landmark])
+    kanonik = noktalari_donustur(noktalar, donusum_hesapla(noktalar))
+    indeksler = sorted({i for indeksler, _ in analiz.BOLGELER.values() for i in indeksler} | set(HIZALAMA_NOKTALARI))
+    return {i: (round(kanonik[i][0], 1), round(kanonik[i][1], 1)) for i in indeksler}
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    yol = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cilt_Raporu_1764601789.jpg")
+    sablon = sablon_uret(yol)
+    print("KANONIK_SABLON = {")
+    satir = []
+    for i, (x, y) in sablon.items():
+        satir.append(f"{i}: ({x}, {y})")
+        if len(satir) == 5:
+            print("    " + ", ".join(satir) + ",")
+            satir = []
+    if satir:
+        print("    " + ", ".join(satir) + ",")
+    print("}")
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# ==========================================
+# GÖRÜNTÜ KALİTE KAPISI (Pahalı pipeline'dan önce)
+# ==========================================
+# Bulanık, karanlık ya da yüzsüz yüklemeler de bilateral + CLAHE + FaceMesh
+# maliyetini ödüyordu. Burada ~160px'lik küçük kopyada birkaç milisaniyede
+# Laplacian varyansı, pozlama histogramı ve hızlı bir yüz yoklaması yapılır.
+
+KUCUK_BOYUT = 160
+BULANIKLIK_ESIGI = float(os.environ.get("KALITE_BULANIKLIK_ESIGI", 80)) # 160px kopyada Laplacian varyansı
+KARANLIK_ORANI = 0.60 # Piksellerin bu kadarı < 30 ise karanlık
+PARLAK_ORANI = 0.50 # Piksellerin bu kadarı > 245 ise aşırı pozlanmış
+
+# Bu kodlardan biri çıkarsa analiz hiç başlamaz; diğerleri sadece uyarı olarak döner.
+RED_KODLARI = set(filter(None, os.environ.get("KALITE_RED_KODLARI", "YUZ_YOK").split(",")))
+
+KODLAR = ("BULANIK", "KARANLIK", "ASIRI_POZLAMA", "YUZ_YOK")
+
+_yerel = threading.local()
+
+
+def _yuz_dedektoru():
+    # BlazeFace kısa mesafe modeli: FaceMesh'in kendi içinde kullandığı dedektör.
+    # Örnekler thread-safe değil; havuz thread'leri sabit olduğu için thread başına bir tane.
+    if not hasattr(_yerel, "dedektor"):
+        import mediapipe as mp
+        _yerel.dedektor = mp.solutions.face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+    return _yerel.dedektor
+
+
+def kontrol(frame):
+    """
+    Kareyi küçük kopyada değerlendirir.
+    {"kodlar": [...], "red": bool, "laplacian": float, "parlaklik": float} döner.
+    """
+    h, w = frame.shape[:2]
+    olcek = KUCUK_BOYUT / max(h, w)
+    kucuk = cv2.resize(frame, None, fx=olcek, fy=olcek, interpolation=cv2.INTER_AREA) if olcek < 1 else frame
+    gri = cv2.cvtColor(kucuk, cv2.COLOR_BGR2GRAY)
+
+    kodlar = []
+    laplacian = float(cv2.Laplacian(gri, cv2.CV_64F).var())
+    if laplacian < BULANIKLIK_ESIGI:
+        kodlar.append("BULANIK")
+
+    hist = cv2.calcHist([gri], [0], None, [256], [0, 256]).ravel() / gri.size
+    if hist[:30].sum() > KARANLIK_ORANI:
+        kodlar.append("KARANLIK")
+    elif hist[246:].sum() > PARLAK_ORANI:
+        kodlar.append("ASIRI_POZLAMA")
+
+    sonuc = _yuz_dedektoru().process(cv2.cvtColor(kucuk, cv2.COLOR_BGR2RGB))
+    if not sonuc.detections:
+        kodlar.append("YUZ_YOK")
+
+    return {
+        "kodlar": kodlar,
+        "red": any(k in RED_KODLARI for k in kodlar),
+        "laplacian": round(laplacian, 1),
+        "parlaklik": round(float(np.dot(hist, np.arange(256))), 1),
+    }
+
+
+class KaliteSayaclari:
+    """
+    API sürecinde tutulur (işçi süreçlerdeki sayaçlar /metrics'e ulaşmaz).
+    Kapının kazandırdığı süre, reddedilen her kare için tam analizin kayan
+    ortalaması kadar sayılır.
+    """
+
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self.kontrol = 0
+        self.red = {k: 0 for k in KODLAR}
+        self.uyari = {k: 0 for k in KODLAR}
+        self.kapi_sn = 0.0
+        self.tasarruf_sn = 0.0
+        self._analiz_ort_sn = None
+
+    def isle(self, sonuc):
+        kalite = sonuc.get("kalite")
+        if kalite is None:
+            return
+        with self._kilit:
+            self.kontrol += 1
+            self.kapi_sn += kalite["sure_ms"] / 1000
+            hedef = self.red if kalite["red"] else self.uyari
+            for kod in kalite["kodlar"]:
+                hedef[kod] += 1
+            if kalite["red"]:
+                if self._analiz_ort_sn is not None:
+                    self.tasarruf_sn += self._analiz_ort_sn
+            elif "analiz_ms" in sonuc:
+                sn = sonuc["analiz_ms"] / 1000
+                self._analiz_ort_sn = sn if self._analiz_ort_sn is None else 0.9 * self._analiz_ort_sn + 0.1 * sn
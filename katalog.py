@@ -0,0 +1,243 @@
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# ==========================================
+# ÜRÜN KATALOĞU (Tek kaynak, bellekte indeksli)
+# ==========================================
+# Ürünler üç yerdeydi: database.URUN_HAVUZU (API), beauty_tech.db'deki
+# products tablosu (admin formu) ve data.json'daki PRODUCTS (masaüstü
+# script'leri, her karede yeniden sıralanıyordu). Hepsi artık tek bir
+# 'urunler' tablosunda; katalog onu bir kez okur ve kategori başına eşiğe
+# göre sıralı diziler tutar, eşik sorguları bisect ile yapılır.
+#
+# Yeniden yükleme okuyucuyu bekletmez: yeni görünüm ayrı kurulur ve tek
+# atamayla değiştirilir, okuyucular o an elindeki görünümle devam eder.
+# Değişiklik, tablodaki tetikleyicilerin artırdığı katalog_meta.surum ve
+# data.json'un mtime'ı ile arka plan thread'inde fark edilir. Son aktarılan
+# mtime da katalog_meta'da durur: yeni açılan süreç dosyayı yeniden aktarmaz
+# (admin düzenlemeleri ezilmez), dosya değişince de süreçlerden sadece biri aktarır.
+
+KATALOG_KONTROL_SN = float(os.environ.get("KATALOG_KONTROL_SN", 1.0))
+
+# Masaüstü script'lerinin ve admin formunun kullandığı durum kategorileri
+# (API'nin kategorileri: kuru, yagli, leke, kirisik, normal).
+DURUM_KATEGORILERI = ("Problemli", "Yorgun", "Mükemmel", "Kuru")
+
+ALANLAR = ("id", "urun_adi", "marka", "kategori", "esik_deger", "link", "fiyat", "renk_kodu_bgr", "kaynak")
+
+KatalogGorunumu = namedtuple("KatalogGorunumu", "surum kategoriler urunler")
+# kategoriler: kategori -> (artan eşikler listesi, aynı sırada ürünler)
+
+
+def tablo_olustur(conn):
+    """Katalog tabloları; çağıranın transaction'ında çalışır (bkz. sema.py)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS urunler (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            urun_adi TEXT NOT NULL,
+            marka TEXT NOT NULL DEFAULT '',
+            kategori TEXT NOT NULL,
+            esik_deger INTEGER NOT NULL DEFAULT 0,
+            link TEXT DEFAULT '',
+            fiyat REAL,
+            renk_kodu_bgr TEXT,
+            kaynak TEXT
+        )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS urunler_ad_marka ON urunler (urun_adi, marka)')
+    conn.execute('CREATE TABLE IF NOT EXISTS katalog_meta (id INTEGER PRIMARY KEY CHECK (id = 1), surum INTEGER NOT NULL)')
+    conn.execute('INSERT OR IGNORE INTO katalog_meta (id, surum) VALUES (1, 0)')
+    for ad, olay in (("urunler_ekle", "INSERT"), ("urunler_guncelle", "UPDATE"), ("urunler_sil", "DELETE")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {ad} AFTER {olay} ON urunler
+            BEGIN UPDATE katalog_meta SET surum = surum + 1 WHERE id = 1; END
+        ''')
+
+
+def urunleri_yaz(conn, urunler, kaynak):
+    """
+    urunler: urun_adi, marka, kategori, esik_deger, link, fiyat, renk_kodu_bgr
+    anahtarlı sözlükler. Aynı (urun_adi, marka) varsa güncellenir.
+    """
+    conn.executemany('''
+        INSERT INTO urunler (urun_adi, marka, kategori, esik_deger, link, fiyat, renk_kodu_bgr, kaynak)
+        VALUES (:urun_adi, :marka, :kategori, :esik_deger, :link, :fiyat, :renk_kodu_bgr, :kaynak)
+        ON CONFLICT (urun_adi, marka) DO UPDATE SET
+            kategori = excluded.kategori, esik_deger = excluded.esik_deger, link = excluded.link,
+            fiyat = COALESCE(excluded.fiyat, fiyat), renk_kodu_bgr = COALESCE(excluded.renk_kodu_bgr, renk_kodu_bgr)
+    ''', [{
+        "urun_adi": u["urun_adi"], "marka": u.get("marka") or "", "kategori": u["kategori"],
+        "esik_deger": int(u.get("esik_deger") or 0), "link": u.get("link") or "", "fiyat": u.get("fiyat"),
+        "renk_kodu_bgr": json.dumps(list(u["renk_kodu_bgr"])) if u.get("renk_kodu_bgr") else None,
+        "kaynak": kaynak,
+    } for u in urunler])
+
+
+def havuzdan(havuz):
+    """database.URUN_HAVUZU biçimi ({kategori: [ürün, ...]}) -> satırlar."""
+    return [dict(u, kategori=kategori, esik_deger=0) for kategori, liste in havuz.items() for u in liste]
+
+
+def eski_dbden(yol):
+    """beauty_tech.db'deki products tablosu -> satırlar. Dosya/tablo yoksa boş liste."""
+    if not os.path.exists(yol):
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{yol}?mode=ro", uri=True)
+        satirlar = conn.execute('SELECT ad, marka, problem_turu, esik_deger, link, fiyat FROM products').fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Katalog Hatası ({yol}): {e}")
+        return []
+    return [{"urun_adi": ad, "marka": marka, "kategori": problem, "esik_deger": esik, "link": link, "fiyat": fiyat}
+            for ad, marka, problem, esik, link, fiyat in satirlar]
+
+
+def jsondan(yol):
+    """data.json'daki PRODUCTS -> satırlar. Okunamazsa None (mevcut katalog korunur)."""
+    try:
+        with open(yol, "r", encoding="utf-8") as f:
+            urunler = json.load(f)["PRODUCTS"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Katalog Hatası ({yol}): {e}")
+        return None
+    return [{"urun_adi": u["urun_adi"], "marka": u.get("marka"), "kategori": u["hedef_problem"],
+             "esik_deger": u.get("esik_deger"), "link": u.get("alisveris_linki"), "renk_kodu_bgr": u.get("renk_kodu_bgr")}
+            for u in urunler]
+
+
+class Katalog:
+    """
+    'urunler' tablosunun bellekteki, salt okunur görünümü. Okuma metotları
+    kilit almaz; yeniden yükleme ve değişiklik takibi _kilit altında yapılır.
+    """
+
+    def __init__(self, db_yolu, json_yolu=None, kontrol_sn=KATALOG_KONTROL_SN):
+        self.db_yolu = db_yolu
+        self.json_yolu = json_yolu
+        self.kontrol_sn = kontrol_sn
+        self._gorunum = None
+        self._kilit = threading.Lock()
+        self._izleyici = None
+        self.yukleme_sayisi = 0
+
+    # --- Okuma (kilitsiz) ---
+
+    @property
+    def gorunum(self):
+        gorunum = self._gorunum
+        if gorunum is None:
+            gorunum = self.yenile()
+        return gorunum
+
+    def uygunlar(self, kategori, leke_sayisi):
+        """Kategorinin eşiği leke_sayisi'nı geçmeyen ürünleri (eşiğe göre artan)."""
+        esikler, urunler = self.gorunum.kategoriler.get(kategori, ((), ()))
+        return urunler[:bisect.bisect_right(esikler, leke_sayisi)]
+
+    def esige_gore(self, leke_sayisi, kategoriler=DURUM_KATEGORILERI):
+        """Verilen kategoriler içinde eşiği leke_sayisi'nı geçmeyen en yüksek eşikli ürün (yoksa None)."""
+        secilen = None
+        for kategori in kategoriler:
+            esikler, urunler = self.gorunum.kategoriler.get(kategori, ((), ()))
+            i = bisect.bisect_right(esikler, leke_sayisi)
+            if i and (secilen is None or esikler[i - 1] > secilen["esik_deger"]):
+                secilen = urunler[i - 1]
+        return secilen
+
+    def tumu(self):
+        return list(self.gorunum.urunler)
+
+    # --- Yükleme / yazma ---
+
+    def _baglan(self):
+        conn = sqlite3.connect(self.db_yolu, timeout=5)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def yenile(self):
+        """Tabloyu okuyup yeni görünümü kurar ve yerine koyar."""
+        with self._kilit:
+            conn = self._baglan()
+            try:
+                surum = conn.execute('SELECT surum FROM katalog_meta WHERE id = 1').fetchone()[0]
+                satirlar = conn.execute(f'SELECT {", ".join(ALANLAR)} FROM urunler ORDER BY esik_deger, id').fetchall()
+            finally:
+                conn.close()
+            urunler = []
+            kategoriler = {}
+            for satir in satirlar:
+                urun = dict(satir)
+                urun["renk_kodu_bgr"] = tuple(json.loads(urun["renk_kodu_bgr"])) if urun["renk_kodu_bgr"] else None
+                urunler.append(urun)
+                esikler, liste = kategoriler.setdefault(urun["kategori"], ([], []))
+                esikler.append(urun["esik_deger"])
+                liste.append(urun)
+            self._gorunum = KatalogGorunumu(surum, {k: (e, tuple(l)) for k, (e, l) in kategoriler.items()}, tuple(urunler))
+            self.yukleme_sayisi += 1
+        self.izlemeyi_baslat()
+        return self._gorunum
+
+    def urun_ekle(self, urun, kaynak="admin"):
+        """Tek ürünü ekler/günceller; görünüm hemen yenilenir (yazan taraf kendi değişikliğini görür)."""
+        conn = self._baglan()
+        try:
+            with conn:
+                urunleri_yaz(conn, [urun], kaynak)
+        finally:
+            conn.close()
+        self.yenile()
+
+    # --- Değişiklik takibi ---
+
+    def izlemeyi_baslat(self):
+        if self._izleyici is None and self.kontrol_sn > 0:
+            self._izleyici = threading.Thread(target=self._izle, name="katalog-izleyici", daemon=True)
+            self._izleyici.start()
+
+    def _izle(self):
+        while True:
+            time.sleep(self.kontrol_sn)
+            try:
+                self.kontrol_et()
+            except Exception as e:
+                print(f"Katalog Hatası: {e}")
+
+    def kontrol_et(self):
+        """data.json değiştiyse tabloya aktarır; tablo değiştiyse (admin, başka süreç) görünümü yeniler."""
+        conn = self._baglan()
+        try:
+            surum, json_mtime = conn.execute('SELECT surum, json_mtime FROM katalog_meta WHERE id = 1').fetchone()
+            if self.json_yolu and os.path.exists(self.json_yolu):
+                mtime = os.path.getmtime(self.json_yolu)
+                if mtime != json_mtime and self._json_aktar(conn, json_mtime, mtime):
+                    surum = conn.execute('SELECT surum FROM katalog_meta WHERE id = 1').fetchone()[0]
+        finally:
+            conn.close()
+        if self._gorunum is None or surum != self._gorunum.surum:
+            self.yenile()
+
+    def _json_aktar(self, conn, eski_mtime, mtime):
+        """
+        mtime'ı katalog_meta'ya yazar, dosyayı aktarır; aktardıysa True. Başka
+        süreç aynı değişikliği önce aldıysa hiçbir şey yapılmaz. eski_mtime None
+        ise (ilk kurulum ya da göç) dosya tohumlamada zaten okunmuştur, sadece
+        mtime kaydedilir.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            alindi = conn.execute('UPDATE katalog_meta SET json_mtime = ? WHERE id = 1 AND json_mtime IS ?',
+                                  (mtime, eski_mtime)).rowcount
+            urunler = jsondan(self.json_yolu) if alindi and eski_mtime is not None else None
+            if urunler is not None:
+                urunleri_yaz(conn, urunler, "json")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return urunler is not None
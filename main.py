@@ -1,9 +1,21 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, Header, UploadFile, HTTPException, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-import cv2
-import mediapipe as mp
-import numpy as np
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from datetime import datetime
+from typing import List, Optional
+import analiz
+import arsiv
+import asyncio
+import canli
+import json
+import os
 import database 
+import disa_aktar
+import kalite
+import metrikler
+import motor
+import onbellek
+import time
 import traceback 
 
 # ==========================================
@@ -20,269 +32,470 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DB Başlatma
-try:
-    database.tablolari_olustur()
-    database.baslangic_verisi_ekle()
-except Exception as e:
-    print(f"DB Log: {e}")
-
-# MediaPipe (Yüz Haritalama - 468 Nokta)
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=True,
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5
-)
+# Analiz Motoru (FaceMesh havuzu + sınırlı executor / işçi süreçler)
+# Import sırasında değil startup'ta kurulur: "process" modunda spawn edilen
+# işçiler bu modülü yeniden import ederse kendi motorlarını açmasınlar.
+# Mesh'ler arka planda ısınır; trafik /readyz 200 dönene kadar yönlendirilmemeli.
+analiz_motoru = None
+
+@app.on_event("startup")
+def motoru_baslat():
+    global analiz_motoru
+    # DB Başlatma (import'ta değil: main'i import eden araçlar beauty.db açmasın)
+    try:
+        database.tablolari_olustur()
+        database.baslangic_verisi_ekle()
+        database.yazici.baslat()
+        arsiv.zamanlayici_baslat() # ARSIV_ARALIGI_SAAT > 0 ise
+    except Exception as e:
+        print(f"DB Log: {e}")
+    analiz_motoru = motor.motor_olustur()
+
+@app.on_event("shutdown")
+def motoru_kapat():
+    # Motor kurulamadıysa ya da kapanırken hata verirse de kuyruktaki kayıtlar yazılır
+    try:
+        if analiz_motoru is not None:
+            analiz_motoru.kapat()
+    finally:
+        arsiv.zamanlayici_durdur()
+        database.yazici.kapat() # Kuyrukta bekleyen kayıtlar yazılmadan çıkılmaz
+
+# Aynı resmin tekrarları (retry, çift tıklama) motora hiç gitmez
+sonuc_onbellegi = onbellek.SonucOnbellegi()
+
+def _onbellek_sayaclari():
+    ist = sonuc_onbellegi.istatistik()
+    return [({"sonuc": "isabet"}, ist["isabet"]), ({"sonuc": "disk_isabet"}, ist["disk_isabet"]), ({"sonuc": "iska"}, ist["iska"])]
+
+def _tahliye_sayaclari():
+    ist = sonuc_onbellegi.istatistik()
+    return [({"katman": "bellek"}, ist["tahliye"]), ({"katman": "disk"}, ist["disk_tahliye"])]
+
+metrikler.kaydet("beauty_onbellek_istek_toplam", "counter", "Sonuç önbelleği sorguları", _onbellek_sayaclari)
+metrikler.kaydet("beauty_onbellek_tahliye_toplam", "counter", "Atılan kayıtlar (bellek: LRU, disk: TTL ve disk kapasitesi)",
+                 _tahliye_sayaclari)
+metrikler.kaydet("beauty_onbellek_boyut", "gauge", "Bellekteki kayıt sayısı",
+                 lambda: [({}, sonuc_onbellegi.istatistik()["boyut"])])
+# Kalite kapısı sayaçları (ret nedenleri ayrı raporlanır)
+kalite_sayaclari = kalite.KaliteSayaclari()
+
+metrikler.kaydet("beauty_kalite_kontrol_toplam", "counter", "Kalite kapısından geçen kareler",
+                 lambda: [({}, kalite_sayaclari.kontrol)])
+metrikler.kaydet("beauty_kalite_red_toplam", "counter", "Kalite kapısında reddedilen kareler (neden koduna göre)",
+                 lambda: [({"kod": k}, v) for k, v in kalite_sayaclari.red.items()])
+metrikler.kaydet("beauty_kalite_uyari_toplam", "counter", "Kabul edilen ama işaretlenen kareler (neden koduna göre)",
+                 lambda: [({"kod": k}, v) for k, v in kalite_sayaclari.uyari.items()])
+metrikler.kaydet("beauty_kalite_kapi_saniye_toplam", "counter", "Kalite kapısında harcanan toplam süre",
+                 lambda: [({}, round(kalite_sayaclari.kapi_sn, 4))])
+metrikler.kaydet("beauty_kalite_tasarruf_saniye_toplam", "counter", "Reddedilen karelerin atlanan tahmini analiz süresi",
+                 lambda: [({}, round(kalite_sayaclari.tasarruf_sn, 4))])
+metrikler.kaydet("beauty_canli_baglanti", "gauge", "Açık /ws/analiz bağlantıları",
+                 lambda: [({}, canli.sayaclar.baglanti)])
+metrikler.kaydet("beauty_canli_baglanti_red_toplam", "counter", "Limit dolu olduğu için reddedilen canlı bağlantılar",
+                 lambda: [({}, canli.sayaclar.reddedilen_baglanti)])
+metrikler.kaydet("beauty_canli_kare_toplam", "counter", "Canlı kareler (işlenen / üstüne yazılan / bütçeyi aşıp atılan)",
+                 lambda: [({"sonuc": k}, v) for k, v in canli.sayaclar.kare.items()])
+metrikler.kaydet("beauty_db_kuyruk_derinlik", "gauge", "Yazılmayı bekleyen analiz kayıtları",
+                 lambda: [({}, database.yazici.derinlik)])
+metrikler.kaydet("beauty_db_kayit_toplam", "counter", "Arka plan yazıcının kayıtları (yazılan / kuyruk dolu / hatalı)",
+                 lambda: [({"sonuc": "yazilan"}, database.yazici.yazilan), ({"sonuc": "dusen"}, database.yazici.dusen),
+                          ({"sonuc": "hatali"}, database.yazici.hatali)])
+metrikler.kaydet("beauty_db_yazma_saniye", "histogram", "Bir yığının tek transaction'da yazılma süresi",
+                 database.yazici.yazma_histogrami.degerler)
+metrikler.kaydet("beauty_oneri_onbellek_toplam", "counter", "Ürün önerisi önbelleği sorguları (nicemlenmiş özellik vektörüne göre)",
+                 lambda: [({"sonuc": "isabet"}, database.onerici.isabet), ({"sonuc": "iska"}, database.onerici.iska)])
+metrikler.kaydet("beauty_arsiv_satir_toplam", "counter", "Saklama süresini aşıp arşiv dosyalarına taşınan analizler",
+                 lambda: [({}, arsiv.sayaclar["arsivlenen"])])
+metrikler.kaydet("beauty_arsiv_vakum_sayfa_toplam", "counter", "incremental_vacuum ile dosyaya geri verilen sayfalar",
+                 lambda: [({}, arsiv.sayaclar["vakum_sayfa"])])
+metrikler.kaydet("beauty_motor_hazir_isci", "gauge", "Modeli ısınmış işçi sayısı",
+                 lambda: [({}, analiz_motoru.hazir_isci)] if analiz_motoru else [])
+metrikler.kaydet("beauty_motor_aktif", "gauge", "Motorda işlenen + bekleyen istek",
+                 lambda: [({}, analiz_motoru.doluluk()["aktif"])] if analiz_motoru else [])
+metrikler.kaydet("beauty_motor_isci_yeniden_baslatma_toplam", "counter", "Ölüp yeniden başlatılan işçi süreçler",
+                 lambda: [({}, getattr(analiz_motoru, "yeniden_baslatilan", 0))] if analiz_motoru else [])
+
+# Aşama süreleri (kuyruk, decode, kalite, landmark, hizalama, modüller, DB...)
+asama_histogrami = metrikler.Histogram("asama")
+metrikler.kaydet("beauty_asama_saniye", "histogram", "Analiz aşamalarının süresi", asama_histogrami.degerler)
+
+def _sureleri_isle(sureler):
+    for ad, ms in sureler.items():
+        asama_histogrami.gozlemle(ad, ms / 1000)
+
+# Toplu yüklemede tek istekte kabul edilen en fazla dosya
+BATCH_LIMITI = int(os.environ.get("ANALIZ_BATCH_LIMITI", 32))
+
+# İstek X-Deadline-Ms başlığı ya da 'deadline_ms' seçeneği vermezse uygulanan hedef (0: kapalı).
+# Kuyrukta geçen süre bütçeyi yedikçe analiz daha ucuz kademelere iner (bkz. analiz.KADEMELER).
+DEADLINE_MS = float(os.environ.get("ANALIZ_DEADLINE_MS", 0))
+
+kademe_sayaclari = {k: 0 for k in analiz.KADEMELER}
+metrikler.kaydet("beauty_kademe_toplam", "counter", "Motorun analiz ettiği yüklemeler, kullanılan kademeye göre",
+                 lambda: [({"kademe": k}, v) for k, v in kademe_sayaclari.items()])
 
 # ==========================================
-# 2. GÖRÜNTÜ İŞLEME MODÜLLERİ
+# 2. KARAR MOTORU (MASTERMIND)
 # ==========================================
 
-def preprocess_image(image):
-    """Görüntüyü laboratuvar standardına getirir."""
-    try:
-        denoised = cv2.bilateralFilter(image, d=9, sigmaColor=75, sigmaSpace=75)
-        lab = cv2.cvtColor(denoised, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        cl = clahe.apply(l)
-        processed = cv2.merge((cl,a,b))
-        return cv2.cvtColor(processed, cv2.COLOR_LAB2BGR)
-    except:
-        return image 
-
-def create_face_mask(h, w, landmarks):
-    """Sadece cilt dokusunu izole eder."""
-    mask = np.zeros((h, w), dtype=np.uint8)
-    face_oval = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109]
-    points = np.array([[int(landmarks.landmark[i].x * w), int(landmarks.landmark[i].y * h)] for i in face_oval], np.int32)
-    cv2.fillConvexPoly(mask, points, 255)
-    return mask
-
-# --- MODÜL 1: KIRIŞIKLIK (Hassasiyet Ayarlı) ---
-def detect_wrinkles_tophat(gray_image, mask):
-    try:
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
-        tophat = cv2.morphologyEx(gray_image, cv2.MORPH_TOPHAT, kernel)
-        tophat = cv2.bitwise_and(tophat, tophat, mask=mask)
-        # Eşik değeri 35'te tutuyoruz (Gençleri yaşlı sanmasın diye)
-        _, thresh = cv2.threshold(tophat, 35, 255, cv2.THRESH_BINARY)
-        wrinkle_pixels = cv2.countNonZero(thresh)
-        face_area = cv2.countNonZero(mask)
-        if face_area == 0: return 0
-        ratio = (wrinkle_pixels / face_area) * 1000 
-        return ratio
-    except:
-        return 0 
-
-# --- MODÜL 2: LEKE VE AKNE ---
-def detect_spots_adaptive(gray_image, mask):
-    try:
-        blur = cv2.GaussianBlur(gray_image, (17, 17), 0)
-        thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 3)
-        thresh = cv2.bitwise_and(thresh, thresh, mask=mask)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        spot_count = 0
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if 15 < area < 400: spot_count += 1
-        return spot_count
-    except:
-        return 0
-
-# --- MODÜL 3: CİLT TİPİ (T-Bölgesi Parlaklığı) ---
-def detect_skin_type_advanced(image, landmarks):
-    try:
-        h, w, c = image.shape
-        t_zone_indices = [10, 338, 297, 332, 284, 251, 389, 356, 168, 6, 197, 195, 5, 4]
-        mask = np.zeros((h, w), dtype=np.uint8)
-        points = np.array([[int(landmarks.landmark[i].x * w), int(landmarks.landmark[i].y * h)] for i in t_zone_indices], np.int32)
-        hull = cv2.convexHull(points)
-        cv2.fillConvexPoly(mask, hull, 255)
-        
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        v_channel = hsv[:,:,2] 
-        t_zone_brightness = cv2.mean(v_channel, mask=mask)[0]
-        
-        # Daha bilimsel kategoriler
-        if t_zone_brightness > 160: return "Yağlı/Parlak"
-        elif t_zone_brightness < 100: return "Kuru/Mat"
-        else: return "Karma/Dengeli"
-    except:
-        return "Karma/Dengeli"
-
-# --- MODÜL 4: GÖZ ALTI MORLUKLARI (YENİ 🌟) ---
-def detect_dark_circles(image, landmarks):
+VARSAYILAN_URUN = {"urun_adi": "Günlük Bakım Kremi", "marka": "Simple", "link": ""}
+URUN_YOK = {"urun_adi": "-", "marka": "", "link": ""} # Fiyat/marka filtresine uyan ürün yok
+
+def _hata_yaniti(ana_sorun="Hata"):
+    return {"status": "error", "genel_skor": 0, "detaylar": {"ana_sorun": ana_sorun}, "reçete": {"onerilen_urun": "-", "link": ""}}
+
+def _kalite_ozeti(sonuc):
+    k = sonuc["kalite"]
+    return {"kodlar": k["kodlar"], "laplacian": k["laplacian"], "parlaklik": k["parlaklik"]}
+
+def _durum_yaniti(sonuc):
+    """Yüz bulunamayan / kalite kapısında reddedilen / çözülemeyen kareler için kısa yanıt."""
+    if sonuc["durum"] == "yuz_yok" or (sonuc["durum"] == "red" and "YUZ_YOK" in sonuc["kalite"]["kodlar"]):
+        yanit = {"status": "success", "genel_skor": 0, "detaylar": {"ana_sorun": "Yüz Bulunamadı"}, "reçete": {"onerilen_urun": "-"}}
+    elif sonuc["durum"] == "red":
+        yanit = {"status": "error", "genel_skor": 0, "detaylar": {"ana_sorun": "Görüntü Kalitesi Yetersiz"}, "reçete": {"onerilen_urun": "-"}}
+    else:
+        return {"status": "error", "genel_skor": 0}
+    if "kalite" in sonuc:
+        yanit["kalite"] = _kalite_ozeti(sonuc)
+    return yanit
+
+# Yanıttaki detay alanları; sonuçta olmayanlar (istenmeyen modüller) atlanır
+DETAY_ALANLARI = ("leke_skoru", "leke_sayisi", "leke_detay", "kirisiklik_skoru", "kirisiklik_indeksi",
+                  "cilt_tipi", "goz_alti_morlugu", "kizariklik", "ana_sorun")
+
+def _yanit_olustur(sonuc, onerilen_urun=None):
+    """Sadece çalışan modüllerin bölümleri döner; reçete sadece "recete" modülüyle."""
+    yanit = {"status": "success"}
+    if "genel_skor" in sonuc:
+        yanit["genel_skor"] = sonuc["genel_skor"]
+    detaylar = {alan: sonuc[alan] for alan in DETAY_ALANLARI if alan in sonuc} # ana_sorun ÖRN: "Nem İhtiyacı"
+    if "kirisiklik_indeksi" in detaylar:
+        detaylar["kirisiklik_indeksi"] = round(detaylar["kirisiklik_indeksi"], 2)
+    yanit["detaylar"] = detaylar
+    if onerilen_urun is not None:
+        yanit["reçete"] = {
+            "sorun": sonuc["ana_sorun"],
+            "onerilen_urun": onerilen_urun['urun_adi'],
+            "marka": onerilen_urun['marka'],
+            "link": onerilen_urun['link']
+        }
+    if "kalite" in sonuc:
+        yanit["kalite"] = _kalite_ozeti(sonuc)
+    if "kademe" in sonuc:
+        yanit["kademe"] = sonuc["kademe"]
+    return yanit
+
+def _coklu_yanit(sonuc, oneriler):
+    """Çok yüzlü sonuç: yüz başına bir bölüm (analiz.yuzleri_bul sırasıyla) + ortak kalite."""
+    yuzler = []
+    for sira, (yuz, urun) in enumerate(zip(sonuc["yuzler"], oneriler)):
+        yanit = _yanit_olustur(yuz, urun)
+        del yanit["status"]
+        yanit["sira"] = sira
+        yanit["kutu"] = yuz["kutu"] # tam karede [x, y, w, h]
+        yuzler.append(yanit)
+    return {"status": "success", "yuz_sayisi": len(yuzler), "yuzler": yuzler, "kalite": _kalite_ozeti(sonuc),
+            "kademe": sonuc.get("kademe", "tam")}
+
+def _yuz_sonuclari(sonuc):
+    """Tek ya da çok yüzlü 'tamam' sonucunu yüz başına sonuç listesine açar."""
+    return sonuc["yuzler"] if "yuzler" in sonuc else [sonuc]
+
+def _gecmise_yazilir(sonuc):
+    """
+    Geçmişe ve özet tablolarına sadece tam kademe sonuçlar yazılır: ucuz
+    kademelerin skoru tam analizden kayabilir, istemciye 'kademe' alanıyla döner.
+    """
+    return sonuc.get("kademe", "tam") == "tam"
+
+def _oneri_ve_kayit(yuzler, filtre, yazilacak=None):
+    """
+    Yüz sonuçları için önerileri tek seferde çeker, kayıtları tek transaction'da yazar.
+    yazilacak: yüz başına bool (verilmezse hepsi); False olan yüzün önerisi döner, kaydı yazılmaz.
+    """
     try:
-        h, w, c = image.shape
-        # Sol ve Sağ göz altı bölgesi
-        left_eye_indices = [349, 348, 347, 346, 345, 340, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-        
-        mask = np.zeros((h, w), dtype=np.uint8)
-        points = np.array([[int(landmarks.landmark[i].x * w), int(landmarks.landmark[i].y * h)] for i in left_eye_indices], np.int32)
-        hull = cv2.convexHull(points)
-        cv2.fillConvexPoly(mask, hull, 255)
-        
-        # LAB renk uzayında L (Lightness) kanalına bak
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l_channel = lab[:,:,0]
-        
-        eye_brightness = cv2.mean(l_channel, mask=mask)[0]
-        
-        # Yanak parlaklığıyla kıyasla (Referans noktası)
-        cheek_brightness = eye_brightness + 20 # Varsayılan referans
-        
-        diff = cheek_brightness - eye_brightness
-        
-        if diff > 40: return True # Göz altı çok koyu
-        return False
-    except:
-        return False
-
-# --- MODÜL 5: KIZARIKLIK / HASSASİYET (YENİ 🌟) ---
-def detect_redness(image, landmarks):
+        oneriler = [urun or URUN_YOK for urun in database.urunleri_bul(yuzler, **filtre)]
+    except Exception:
+        print(f"HATA: {traceback.format_exc()}")
+        oneriler = [VARSAYILAN_URUN] * len(yuzler)
+    yazilacak = [True] * len(yuzler) if yazilacak is None else yazilacak
+    database.analizleri_kaydet([(s["leke_sayisi"], s["genel_skor"], o) for s, o, y in zip(yuzler, oneriler, yazilacak) if y])
+    return oneriler
+
+SIRALAMALAR = ("boyut", "konum")
+
+def _secenekleri_al(modules, yuz_sayisi, siralama, secenekler, deadline_ms=None):
+    """
+    Sorgu parametreleri, X-Deadline-Ms başlığı ve/veya multipart 'secenekler' JSON'u
+    ({"modules": [...], "yuz_sayisi": 3, "siralama": "konum", "deadline_ms": 300}) -> motor seçenekleri.
+    Modül verilmezse hepsi çalışır. Geçersiz değer 400 döner.
+    """
+    istenen = [m.strip() for m in modules.split(",") if m.strip()] if modules else []
+    deadline_ms = DEADLINE_MS if deadline_ms is None else deadline_ms
+    if secenekler:
+        try:
+            ek = json.loads(secenekler)
+            istenen += list(ek.get("modules", []))
+            yuz_sayisi = int(ek.get("yuz_sayisi", yuz_sayisi))
+            siralama = ek.get("siralama", siralama)
+            deadline_ms = float(ek.get("deadline_ms", deadline_ms))
+        except (ValueError, AttributeError, TypeError):
+            raise HTTPException(status_code=400, detail="'secenekler' geçerli bir JSON nesnesi olmalı.")
+    if deadline_ms < 0:
+        raise HTTPException(status_code=400, detail="deadline_ms negatif olamaz.")
+    if not 1 <= yuz_sayisi <= analiz.COKLU_YUZ_LIMITI:
+        raise HTTPException(status_code=400, detail=f"yuz_sayisi 1 ile {analiz.COKLU_YUZ_LIMITI} arasında olmalı.")
+    if siralama not in SIRALAMALAR:
+        raise HTTPException(status_code=400, detail=f"siralama şunlardan biri olmalı: {', '.join(SIRALAMALAR)}")
     try:
-        h, w, c = image.shape
-        # Yanak bölgesi
-        cheek_indices = [116, 117, 118, 100, 126, 209, 198, 50, 101, 203, 205, 36, 123, 137]
-        
-        mask = np.zeros((h, w), dtype=np.uint8)
-        points = np.array([[int(landmarks.landmark[i].x * w), int(landmarks.landmark[i].y * h)] for i in cheek_indices], np.int32)
-        hull = cv2.convexHull(points)
-        cv2.fillConvexPoly(mask, hull, 255)
-        
-        # LAB renk uzayında A kanalı (Yeşil-Kırmızı ekseni)
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        a_channel = lab[:,:,1]
-        
-        redness_score = cv2.mean(a_channel, mask=mask)[0]
-        
-        if redness_score > 150: return True # Cilt kızarık
-        return False
-    except:
-        return False
+        moduller = analiz.modulleri_coz(istenen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"moduller": moduller, "yuz_sayisi": yuz_sayisi, "siralama": siralama, "deadline_ms": deadline_ms}
 
-# ==========================================
-# 3. KARAR MOTORU (MASTERMIND)
-# ==========================================
+def _oneri_filtresi_al(fiyat_ust, markalar, secenekler):
+    """
+    Reçete filtresi: sorgu parametreleri ve/veya 'secenekler' JSON'undaki
+    "fiyat_ust" (sayı) ve "markalar" (liste) -> database.en_uygun_urunu_bul argümanları.
+    Analiz seçeneklerinden ayrı tutulur: motora ve önbellek anahtarına girmez.
+    """
+    markalar = [m.strip() for m in markalar.split(",") if m.strip()] if markalar else []
+    if secenekler:
+        try:
+            ek = json.loads(secenekler)
+            fiyat_ust = float(ek["fiyat_ust"]) if ek.get("fiyat_ust") is not None else fiyat_ust
+            markalar += [str(m) for m in ek.get("markalar", [])]
+        except (ValueError, AttributeError, TypeError):
+            raise HTTPException(status_code=400, detail="'secenekler' geçerli bir JSON nesnesi olmalı.")
+    if fiyat_ust is not None and fiyat_ust < 0:
+        raise HTTPException(status_code=400, detail="fiyat_ust negatif olamaz.")
+    return {"fiyat_ust": fiyat_ust, "markalar": markalar or None}
+
+def _onbellek_anahtari(contents, secenekler):
+    """
+    İçerik özeti + varsayılandan farklı seçenekler (kısmi/çok yüzlü sonuç tam istekte kullanılmaz).
+    Deadline anahtara girmez: önbellekte sadece tam kademe sonuçlar durur, her deadline'a uyar.
+    """
+    anahtar = onbellek.anahtar_uret(contents)
+    if analiz.ON_ISLEME_MOTORU != "bilateral":
+        anahtar += f":on_isleme={analiz.ON_ISLEME_MOTORU}" # Disk katmanı motor değişikliğinden sonra da paylaşılır
+    for ad, deger in sorted(secenekler.items()):
+        if ad != "deadline_ms" and deger != analiz.VARSAYILAN_SECENEKLER.get(ad):
+            anahtar += f":{ad}=" + (",".join(sorted(deger)) if isinstance(deger, frozenset) else str(deger))
+    return anahtar
+
+async def _analiz(contents, secenekler):
+    """
+    Önce önbellek, yoksa motor. Sadece deterministik ve tam kademe sonuçlar
+    önbelleğe girer. Dönen sonucun 'sureler' alanı bu isteğin aşama sürelerini (ms) taşır.
+    """
+    sureler = {}
+    with metrikler.asama(sureler, "onbellek"):
+        anahtar = _onbellek_anahtari(contents, secenekler)
+        sonuc = sonuc_onbellegi.al(anahtar)
+    if sonuc is not None:
+        sonuc["sureler"] = sureler
+        return sonuc
+
+    sonuc = await analiz_motoru.analiz_et(contents, **secenekler)
+    kalite_sayaclari.isle(sonuc)
+    sureler.update(sonuc.pop("sureler", {}))
+    if "kademe" in sonuc:
+        kademe_sayaclari[sonuc["kademe"]] += 1
+    if sonuc["durum"] in ("tamam", "yuz_yok", "red") and sonuc.get("kademe", "tam") == "tam":
+        sonuc_onbellegi.koy(anahtar, sonuc)
+    sonuc["sureler"] = sureler
+    return sonuc
+
+def _motor_dolu_hatasi():
+    return HTTPException(
+        status_code=503,
+        detail="Sunucu yoğun, lütfen biraz sonra tekrar deneyin.",
+        headers={"Retry-After": str(motor.RETRY_AFTER_SN)},
+    )
 
 @app.post("/analiz_et")
-async def analiz_et(file: UploadFile = File(...)):
+async def analiz_et(response: Response, file: UploadFile = File(...), modules: Optional[str] = None,
+                    yuz_sayisi: int = 1, siralama: str = "boyut", secenekler: Optional[str] = Form(None),
+                    fiyat_ust: Optional[float] = None, markalar: Optional[str] = None,
+                    x_deadline_ms: Optional[float] = Header(None)):
+    t0 = time.perf_counter()
+    secenek = _secenekleri_al(modules, yuz_sayisi, siralama, secenekler, x_deadline_ms)
+    filtre = _oneri_filtresi_al(fiyat_ust, markalar, secenekler)
+    moduller = secenek["moduller"]
+    contents = await file.read()
+
+    # Ağır CV işi event loop dışında çalışır; kuyruk doluysa hemen reddedilir.
     try:
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if frame is None: return {"status": "error", "genel_skor": 0}
-
-        h, w, c = frame.shape
-        processed_frame = preprocess_image(frame)
-        rgb_frame = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-        
-        if not results.multi_face_landmarks:
-            return {"status": "success", "genel_skor": 0, "detaylar": {"ana_sorun": "Yüz Bulunamadı"}, "reçete": {"onerilen_urun": "-"}}
-        
-        landmarks = results.multi_face_landmarks[0]
-        face_mask = create_face_mask(h, w, landmarks)
-        gray = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2GRAY)
-        
-        # --- ANALİZLERİ ÇALIŞTIR ---
-        wrinkle_index = detect_wrinkles_tophat(gray, face_mask)
-        spot_count = detect_spots_adaptive(gray, face_mask)
-        cilt_tipi_raw = detect_skin_type_advanced(processed_frame, landmarks)
-        has_dark_circles = detect_dark_circles(processed_frame, landmarks)
-        has_redness = detect_redness(processed_frame, landmarks)
-        
-        # --- PUANLAMA MANTIĞI ---
-        # Gençleri korumak için kırışıklık eşiğini çok yüksek tutuyoruz
-        if wrinkle_index < 12: kirisiklik_puani = 100 # HATA PAYI DÜŞÜRÜLDÜ
-        else: kirisiklik_puani = max(10, 100 - (wrinkle_index * 1.0))
-        
-        leke_puani = max(10, 100 - (spot_count * 0.8))
-        
-        genel_skor = int((kirisiklik_puani * 0.45) + (leke_puani * 0.45) + 10)
-        
-        # Bonus Puanlar (Cilt iyiyse ödüllendir)
-        if not has_dark_circles: genel_skor += 2
-        if not has_redness: genel_skor += 2
-        if genel_skor > 100: genel_skor = 100
-        
-        # --- TEŞHİS KOYMA (KARAR AĞACI) ---
-        # Burası Elon Musk seviyesi: Sadece sayıya bakmaz, duruma bakar.
-        
-        ana_sorun = "Cilt Dengesi İyi" # Varsayılan pozitif
-        
-        # 1. Öncelik: CİDDİ SORUNLAR
-        if genel_skor < 85:
-            if spot_count > 25: 
-                ana_sorun = "Akne/Leke Eğilimi"
-            elif kirisiklik_puani < 50: # Sadece puan çok düşükse yaşlanma de
-                ana_sorun = "Elastikiyet Kaybı (Yaşlanma)"
-            elif has_redness:
-                ana_sorun = "Hassas/Kızarık Cilt"
-            elif has_dark_circles:
-                ana_sorun = "Göz Çevresi Yorgunluğu"
-        
-        # 2. Öncelik: ORTA SEVİYE SORUNLAR (Gençler buraya düşer)
-        elif genel_skor < 94:
-            if cilt_tipi_raw == "Kuru/Mat":
-                ana_sorun = "Nem İhtiyacı (Kuruluk)"
-            elif cilt_tipi_raw == "Yağlı/Parlak":
-                ana_sorun = "Gözenek/Yağlanma Problemi"
-            elif has_dark_circles:
-                ana_sorun = "Yorgun Görünüm"
-            else:
-                ana_sorun = "Cilt Tonu Eşitsizliği"
-        
-        # 3. Öncelik: MÜKEMMEL CİLTLER
-        else:
-            if cilt_tipi_raw == "Yağlı/Parlak":
-                ana_sorun = "Doğal Işıltı (Parlak)"
-            else:
-                ana_sorun = "Mükemmel Cilt Dengesi"
-
-        # --- DB UYUMLULUĞU ---
-        # Veritabanı hala eski anahtar kelimeleri (kuru, yagli, leke, kirisik, normal) bekliyor.
-        # Bu yüzden teşhisi veritabanı diline çeviriyoruz (Mapping).
-        
-        db_category = "normal"
-        if "Kuru" in ana_sorun or "Nem" in ana_sorun: db_category = "Kuru Cilt"
-        elif "Yağ" in ana_sorun or "Gözenek" in ana_sorun: db_category = "Yağlı Cilt"
-        elif "Akne" in ana_sorun or "Leke" in ana_sorun or "Ton" in ana_sorun: db_category = "Karma/Normal" # Leke için özel kategori yoksa normalden ver
-        elif "Yaşlanma" in ana_sorun or "Elastikiyet" in ana_sorun: db_category = "Karma/Normal" # Kırışıklık parametresiyle zaten bulunacak
-        
+        sonuc = await _analiz(contents, secenek)
+    except motor.MotorDolu:
+        raise _motor_dolu_hatasi()
+    except Exception as e:
+        print(f"HATA: {traceback.format_exc()}")
+        return _hata_yaniti()
+
+    sureler = sonuc.pop("sureler")
+    try:
+        if sonuc["durum"] != "tamam": return _durum_yaniti(sonuc)
+        if "yuzler" in sonuc:
+            oneriler = [None] * len(sonuc["yuzler"])
+            if "recete" in moduller:
+                with metrikler.asama(sureler, "db_kayit"):
+                    oneriler = _oneri_ve_kayit(sonuc["yuzler"], filtre, [_gecmise_yazilir(sonuc)] * len(sonuc["yuzler"]))
+            return _coklu_yanit(sonuc, oneriler)
+        if "recete" not in moduller: return _yanit_olustur(sonuc)
+
         # Veritabanından ürün çek
         try:
             # Parametreleri gönderiyoruz
-            onerilen_urun = database.en_uygun_urunu_bul(spot_count, wrinkle_index, db_category)
-            database.analiz_kaydet(spot_count, genel_skor, onerilen_urun['urun_adi'])
+            with metrikler.asama(sureler, "db_oneri"):
+                onerilen_urun = database.en_uygun_urunu_bul(sonuc, **filtre) or URUN_YOK
+            if _gecmise_yazilir(sonuc):
+                with metrikler.asama(sureler, "db_kayit"):
+                    database.analiz_kaydet(sonuc["leke_sayisi"], sonuc["genel_skor"], onerilen_urun)
         except:
-            onerilen_urun = {"urun_adi": "Günlük Bakım Kremi", "marka": "Simple", "link": ""}
-
-        return {
-            "status": "success",
-            "genel_skor": genel_skor,
-            "detaylar": {
-                "leke_skoru": int(leke_puani),
-                "leke_sayisi": spot_count,
-                "kirisiklik_skoru": int(kirisiklik_puani),
-                "kirisiklik_indeksi": round(wrinkle_index, 2),
-                "ana_sorun": ana_sorun # ÖRN: "Nem İhtiyacı"
-            },
-            "reçete": {
-                "sorun": ana_sorun,
-                "onerilen_urun": onerilen_urun['urun_adi'],
-                "marka": onerilen_urun['marka'],
-                "link": onerilen_urun['link']
-            }
-        }
+            onerilen_urun = VARSAYILAN_URUN
+
+        return _yanit_olustur(sonuc, onerilen_urun)
 
     except Exception as e:
         print(f"HATA: {traceback.format_exc()}")
-        return {"status": "error", "genel_skor": 0, "detaylar": {"ana_sorun": "Hata"}, "reçete": {"onerilen_urun": "-", "link": ""}}
+        return _hata_yaniti()
+    finally:
+        sureler["toplam"] = (time.perf_counter() - t0) * 1000
+        _sureleri_isle(sureler)
+        response.headers["Server-Timing"] = metrikler.server_timing(sureler)
+
+@app.post("/analiz_et/batch")
+async def analiz_et_batch(files: List[UploadFile] = File(...), modules: Optional[str] = None,
+                          yuz_sayisi: int = 1, siralama: str = "boyut", secenekler: Optional[str] = Form(None),
+                          fiyat_ust: Optional[float] = None, markalar: Optional[str] = None,
+                          x_deadline_ms: Optional[float] = Header(None)):
+    """
+    Çoklu yükleme (öncesi/sonrası setleri, klinik arşivleri).
+    Sonuçlar giriş sırasıyla döner; bir dosyanın hatası diğerlerini etkilemez.
+    Seçenekler (modüller, yüz sayısı, deadline) tüm dosyalara ayrı ayrı uygulanır.
+    """
+    secenek = _secenekleri_al(modules, yuz_sayisi, siralama, secenekler, x_deadline_ms)
+    filtre = _oneri_filtresi_al(fiyat_ust, markalar, secenekler)
+    moduller = secenek["moduller"]
+    if len(files) > BATCH_LIMITI:
+        raise HTTPException(status_code=413, detail=f"Tek istekte en fazla {BATCH_LIMITI} dosya gönderilebilir.")
+
+    icerikler = [await f.read() for f in files]
+
+    # Toplu istek motoru tek başına doldurmasın: aynı anda en fazla işçi sayısı kadar kalem.
+    sinir = asyncio.Semaphore(analiz_motoru.isci_sayisi)
+
+    async def kalem_analizi(contents):
+        async with sinir:
+            return await _analiz(contents, secenek)
+
+    sonuclar = await asyncio.gather(*[kalem_analizi(c) for c in icerikler], return_exceptions=True)
+    for s in sonuclar:
+        if isinstance(s, dict):
+            _sureleri_isle(s.pop("sureler"))
+
+    # Öneri ve DB kaydı tüm batch (ve tüm yüzler) için tek seferde yapılır (tek transaction).
+    tamamlar = [s for s in sonuclar if isinstance(s, dict) and s["durum"] == "tamam"]
+    yuzler = [y for s in tamamlar for y in _yuz_sonuclari(s)]
+    yazilacak = [_gecmise_yazilir(s) for s in tamamlar for _ in _yuz_sonuclari(s)]
+    oneriler = _oneri_ve_kayit(yuzler, filtre, yazilacak) if "recete" in moduller else []
+
+    oneri_sirasi = iter(oneriler)
+    cikti = []
+    for f, sonuc in zip(files, sonuclar):
+        if isinstance(sonuc, motor.MotorDolu):
+            yanit = _hata_yaniti("Sunucu Yoğun")
+        elif isinstance(sonuc, BaseException):
+            print(f"HATA ({f.filename}): {''.join(traceback.format_exception(sonuc))}")
+            yanit = _hata_yaniti()
+        elif sonuc["durum"] != "tamam":
+            yanit = _durum_yaniti(sonuc)
+        elif "yuzler" in sonuc:
+            yanit = _coklu_yanit(sonuc, [next(oneri_sirasi, None) for _ in sonuc["yuzler"]])
+        else:
+            yanit = _yanit_olustur(sonuc, next(oneri_sirasi, None))
+        yanit["dosya"] = f.filename
+        cikti.append(yanit)
+
+    return {"status": "success", "adet": len(cikti), "sonuclar": cikti}
+
+@app.websocket("/ws/analiz")
+async def ws_analiz(websocket: WebSocket):
+    """
+    Canlı analiz: ikili mesaj = kare, metin mesaj = ayar JSON'u (bkz. canli.py).
+    Her işlenen kare için /analiz_et ile aynı biçimde (reçetesiz) bir sonuç döner.
+    """
+    await websocket.accept()
+    if not canli.sayaclar.baglan():
+        await websocket.close(code=1013, reason="Canlı bağlantı limiti dolu")
+        return
+    try:
+        await canli.CanliOturum(websocket).calistir(_yanit_olustur)
+    except Exception:
+        print(f"HATA: {traceback.format_exc()}")
+    finally:
+        canli.sayaclar.ayril()
+
+def _zaman_al(ad, deger):
+    """ISO tarih/zaman -> DB'deki biçim ('YYYY-MM-DD HH:MM:SS', UTC). Geçersizse 400."""
+    if deger is None:
+        return None
+    try:
+        return datetime.fromisoformat(deger).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{ad} ISO biçiminde olmalı (YYYY-MM-DD ya da YYYY-MM-DDTHH:MM:SS).")
+
+@app.get("/analizler")
+def analizler(limit: int = 50, imlec: Optional[str] = None, baslangic: Optional[str] = None, bitis: Optional[str] = None,
+              skor_min: Optional[int] = None, skor_max: Optional[int] = None, urun: Optional[str] = None,
+              urun_id: Optional[int] = None):
+    """
+    Analiz geçmişi, yeniden eskiye sayfa sayfa. Sonraki sayfa için yanıttaki
+    'sonraki_imlec' aynı filtrelerle 'imlec' olarak geri gönderilir.
+    baslangic dahil, bitis hariç; skor aralığı dahil. Ürün: urun_id (katalog id'si) ya da urun (ad).
+    """
+    if not 1 <= limit <= database.SAYFA_LIMITI:
+        raise HTTPException(status_code=400, detail=f"limit 1 ile {database.SAYFA_LIMITI} arasında olmalı.")
+    try:
+        return database.analiz_sayfasi(limit, imlec, _zaman_al("baslangic", baslangic), _zaman_al("bitis", bitis),
+                                       skor_min, skor_max, urun, urun_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/analizler/disa_aktar")
+def analizleri_disa_aktar(bicim: str = "csv", gzip: bool = False, baslangic: Optional[str] = None, bitis: Optional[str] = None):
+    """
+    Tüm geçmiş (ya da tarih aralığı) CSV/JSONL olarak, parça parça akış halinde.
+    gzip=true ile .gz dosyası olarak sıkıştırılmış gönderilir. baslangic dahil, bitis hariç.
+    """
+    if bicim not in disa_aktar.BICIMLER:
+        raise HTTPException(status_code=400, detail=f"bicim şunlardan biri olmalı: {', '.join(disa_aktar.BICIMLER)}")
+    parcalar = disa_aktar.akis(bicim, gzip, _zaman_al("baslangic", baslangic), _zaman_al("bitis", bitis))
+    return StreamingResponse(parcalar, media_type="application/gzip" if gzip else disa_aktar.BICIMLER[bicim],
+                             headers={"Content-Disposition": f'attachment; filename="{disa_aktar.dosya_adi(bicim, gzip)}"'})
+
+@app.get("/healthz")
+def healthz():
+    """Süreç ayakta mı (liveness). Model ya da DB'ye dokunmaz."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Trafik alabilir mi (readiness): tüm işçiler ısınmış ve DB erişilebilir."""
+    isciler = analiz_motoru.doluluk() if analiz_motoru else {"isci": 0, "hazir_isci": 0}
+    db = database.saglik_kontrolu()
+    hazir = analiz_motoru is not None and analiz_motoru.hazir and db
+    icerik = {"status": "ok" if hazir else "hazir_degil", "isci": isciler["isci"], "hazir_isci": isciler["hazir_isci"], "db": db}
+    return JSONResponse(icerik, status_code=200 if hazir else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metin formatında sayaçlar."""
+    return PlainTextResponse(metrikler.prometheus_metni(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,108 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# METRİKLER (Prometheus metin formatı, harici collector gerekmez)
+# ==========================================
+# Her metrik, o anki değerlerini (etiketler, değer) listesi olarak veren bir
+# fonksiyonla kaydedilir. Sayaçlar asıl sahiplerinde (önbellek, motor...)
+# tutulur; /metrics sadece okur, sıcak yola ek maliyet bindirmez.
+
+_KAYITLAR = []
+_kilit = threading.Lock()
+
+
+def kaydet(ad, tip, aciklama, fonksiyon):
+    """
+    tip: 'counter' | 'gauge' | 'histogram'.
+    fonksiyon() -> [(etiket_sozlugu, deger), ...] ya da son ekli satırlar için
+    [(son_ek, etiket_sozlugu, deger), ...] (örn. histogramın _bucket/_sum/_count'u).
+    """
+    with _kilit:
+        _KAYITLAR[:] = [k for k in _KAYITLAR if k[0] != ad]
+        _KAYITLAR.append((ad, tip, aciklama, fonksiyon))
+
+
+def _etiket_metni(etiketler):
+    if not etiketler:
+        return ""
+    icerik = ",".join(f'{k}="{v}"' for k, v in sorted(etiketler.items()))
+    return "{" + icerik + "}"
+
+
+def prometheus_metni():
+    satirlar = []
+    with _kilit:
+        kayitlar = list(_KAYITLAR)
+    for ad, tip, aciklama, fonksiyon in kayitlar:
+        try:
+            degerler = fonksiyon()
+        except Exception as e:
+            print(f"Metrik Hatası ({ad}): {e}")
+            continue
+        satirlar.append(f"# HELP {ad} {aciklama}")
+        satirlar.append(f"# TYPE {ad} {tip}")
+        for kayit in degerler:
+            son_ek, etiketler, deger = kayit if len(kayit) == 3 else ("",) + tuple(kayit)
+            satirlar.append(f"{ad}{son_ek}{_etiket_metni(etiketler)} {deger}")
+    return "\n".join(satirlar) + "\n"
+
+
+# ==========================================
+# AŞAMA SÜRELERİ
+# ==========================================
+# İşçi (thread ya da süreç) her aşamanın süresini sonuç sözlüğündeki
+# "sureler" alanına ms olarak yazar; API süreci bunları histogramlara işler
+# ve aynı istek için Server-Timing başlığına koyar. Aşama başına maliyet
+# iki perf_counter çağrısı, yani analizin yanında ölçülemeyecek kadar küçük.
+
+VARSAYILAN_SINIRLAR = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@contextmanager
+def asama(sureler, ad):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        sureler[ad] = sureler.get(ad, 0.0) + (time.perf_counter() - t0) * 1000
+
+
+class Histogram:
+    """Sabit kovalı, etiketli histogram (saniye)."""
+
+    def __init__(self, etiket_adi, sinirlar=VARSAYILAN_SINIRLAR):
+        self.etiket_adi = etiket_adi
+        self.sinirlar = tuple(sinirlar)
+        self._kilit = threading.Lock()
+        self._veri = {} # etiket -> [kova sayıları..., +Inf], toplam, adet
+
+    def gozlemle(self, etiket, saniye):
+        i = bisect.bisect_left(self.sinirlar, saniye)
+        with self._kilit:
+            veri = self._veri.get(etiket)
+            if veri is None:
+                veri = self._veri[etiket] = [[0] * (len(self.sinirlar) + 1), 0.0, 0]
+            veri[0][i] += 1
+            veri[1] += saniye
+            veri[2] += 1
+
+    def degerler(self):
+        with self._kilit:
+            kopya = {k: ([*v[0]], v[1], v[2]) for k, v in self._veri.items()}
+        satirlar = []
+        for etiket, (kovalar, toplam, adet) in sorted(kopya.items()):
+            kumulatif = 0
+            for sinir, sayi in zip(self.sinirlar + ("+Inf",), kovalar):
+                kumulatif += sayi
+                satirlar.append(("_bucket", {self.etiket_adi: etiket, "le": sinir}, kumulatif))
+            satirlar.append(("_sum", {self.etiket_adi: etiket}, round(toplam, 6)))
+            satirlar.append(("_count", {self.etiket_adi: etiket}, adet))
+        return satirlar
+
+
+def server_timing(sureler):
+    """{'asama': ms} -> 'asama;dur=12.3, ...' (Server-Timing başlığı)"""
+    return ", ".join(f"{ad};dur={ms:.1f}" for ad, ms in sureler.items())
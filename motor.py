@@ -0,0 +1,443 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import connection as mp_baglanti
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import analiz
+
+# ==========================================
+# ANALİZ MOTORU (Event loop'u bloklamadan CV)
+# ==========================================
+# FastAPI event loop'u tek thread'dir. 12 MP'lik bir selfie'yi orada işlemek
+# o worker'daki tüm bağlantıları dondurur. Bu yüzden analiz sınırlı bir
+# executor'a taşınır; her işçi slotu kendi FaceMesh örneğini kullanır.
+
+ISCI_SAYISI = int(os.environ.get("ANALIZ_ISCI_SAYISI", os.cpu_count() or 2))
+KUYRUK_LIMITI = int(os.environ.get("ANALIZ_KUYRUK_LIMITI", ISCI_SAYISI * 2))
+RETRY_AFTER_SN = int(os.environ.get("ANALIZ_RETRY_AFTER_SN", 2))
+
+# "thread": tek süreç, GIL'i paylaşan işçiler (varsayılan, geliştirme için)
+# "process": çekirdek başına bir süreç, kareler shared memory ile aktarılır
+MOTOR_MODU = os.environ.get("ANALIZ_MOTOR_MODU", "thread")
+SLOT_BAYT = int(os.environ.get("ANALIZ_SLOT_MB", 48)) * 1024 * 1024 # 12 MP BGR ~36 MB
+ISLEM_ZAMAN_ASIMI_SN = float(os.environ.get("ANALIZ_ZAMAN_ASIMI_SN", 60)) # Ölen işçiye sonsuza kadar bekleme
+ISCI_KONTROL_SN = 1.0 # Süreç motorunda okuyucunun en uzun bekleme aralığı
+ISCI_KISA_OMUR_SN = 30 # Bundan kısa yaşayıp ölen işçi "çöküş döngüsünde" sayılır
+ISCI_COKUS_LIMITI = 5 # Üst üste bu kadar kısa ömürlü ölümden sonra işçi yeniden başlatılmaz
+ISCI_EN_UZUN_BEKLEME_SN = 60 # Yeniden başlatma beklemesi 0, 1, 3, 7, ... sn; en fazla bu kadar
+
+
+class MotorDolu(Exception):
+    """Tüm işçiler meşgul ve bekleme kuyruğu dolu."""
+
+
+class IsParcacigiMotoru:
+    """
+    Sabit boyutlu thread havuzu + önceden kurulmuş FaceMesh havuzu.
+    Aynı anda en fazla (isci_sayisi + kuyruk_limiti) istek kabul edilir,
+    fazlası MotorDolu ile anında reddedilir.
+    """
+
+    def __init__(self, isci_sayisi=ISCI_SAYISI, kuyruk_limiti=KUYRUK_LIMITI):
+        self.isci_sayisi = isci_sayisi
+        self.kapasite = isci_sayisi + kuyruk_limiti
+        self._meshler = queue.SimpleQueue()
+        self._executor = ThreadPoolExecutor(max_workers=isci_sayisi, thread_name_prefix="analiz")
+        self._kilit = threading.Lock()
+        self._aktif = 0
+        self.hazir_isci = 0
+
+        # Mesh'ler arka planda, her havuz thread'inde bir tane kurulup ısıtılır;
+        # startup beklemez, /readyz hepsi bitene kadar 503 döner. Bariyer her
+        # ısınma işinin ayrı bir thread'e düşmesini sağlar (kalite kapısının
+        # dedektörü thread başına).
+        bariyer = threading.Barrier(isci_sayisi)
+        for _ in range(isci_sayisi):
+            self._executor.submit(self._isit, bariyer)
+
+    def _isit(self, bariyer):
+        try:
+            bariyer.wait(timeout=60)
+        except threading.BrokenBarrierError:
+            pass
+        mesh = analiz.yuz_mesh_olustur()
+        try:
+            analiz.isinma(mesh)
+        except Exception as e:
+            print(f"Isınma Hatası: {e}")
+        self._meshler.put(mesh)
+        with self._kilit:
+            self.hazir_isci += 1
+
+    def _is(self, contents, kabul_zamani, secenekler):
+        kuyruk_ms = (time.monotonic() - kabul_zamani) * 1000
+        # Havuzda işçi sayısı kadar mesh var (ısınma işleri executor'da bu işten
+        # önce sıralandığı için), bu get() hiç beklemez.
+        mesh = self._meshler.get()
+        try:
+            # Kuyruk süresi deadline'lı isteklerde kademe seçimine girer, baştan verilir.
+            return analiz.bytes_analiz(contents, mesh, {"kuyruk": kuyruk_ms}, **secenekler)
+        finally:
+            self._meshler.put(mesh)
+
+    def _birak(self, _future):
+        with self._kilit:
+            self._aktif -= 1
+
+    async def analiz_et(self, contents, **secenekler):
+        """
+        Analizi havuzda çalıştırır. Kapasite doluysa MotorDolu fırlatır.
+        secenekler analiz.kare_analiz'e iletilir (moduller, yuz_sayisi, siralama, deadline_ms).
+        """
+        with self._kilit:
+            if self._aktif >= self.kapasite:
+                raise MotorDolu()
+            self._aktif += 1
+        # Sayaç, istemci bağlantıyı kopartsa bile iş gerçekten bitince düşer.
+        future = self._executor.submit(self._is, contents, time.monotonic(), secenekler)
+        future.add_done_callback(self._birak)
+        return await asyncio.wrap_future(future)
+
+    @property
+    def hazir(self):
+        return self.hazir_isci >= self.isci_sayisi
+
+    def doluluk(self):
+        return {"aktif": self._aktif, "kapasite": self.kapasite, "isci": self.isci_sayisi, "hazir_isci": self.hazir_isci}
+
+    def kapat(self):
+        self._executor.shutdown(wait=True)
+        while not self._meshler.empty():
+            self._meshler.get().close()
+
+
+# ==========================================
+# ÇOK SÜREÇLİ MOTOR (Shared Memory ile kare aktarımı)
+# ==========================================
+# Tek Python süreci GIL ve MediaPipe'ın süreç başına grafiği ile sınırlı.
+# Burada her işçi ayrı bir süreçtir, bir çekirdeğe sabitlenir ve kendi
+# ısıtılmış FaceMesh'ini tutar. API süreci çözülmüş kareyi önceden ayrılmış
+# bir shared memory slotuna yazar; işçinin pipe'ından sadece (iş no, slot adı,
+# boyut) geçer, yani kare hiç pickle edilmez.
+
+def _surec_iscisi(cekirdek, is_al, sonuc_gonder):
+    if cekirdek is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cekirdek})
+    # Süreç tek çekirdeğe sabitli; OpenCV'nin kendi thread havuzu sadece çekişme yaratır.
+    analiz.cv2.setNumThreads(1)
+
+    mesh = analiz.yuz_mesh_olustur()
+    analiz.isinma(mesh)
+    sonuc_gonder.send(("hazir",))
+
+    slotlar = {}
+    while True:
+        try:
+            is_ = is_al.recv()
+        except EOFError: # API süreci gitti
+            break
+        if is_ is None:
+            break
+        is_no, slot_adi, boyut, kabul_zamani, decode_ms, secenekler = is_
+        # monotonic saat Linux'ta süreçler arası ortak, kuyruk süresi doğrudan ölçülebilir
+        kuyruk_ms = (time.monotonic() - kabul_zamani) * 1000
+        try:
+            shm = slotlar.get(slot_adi)
+            if shm is None:
+                shm = shared_memory.SharedMemory(name=slot_adi)
+                slotlar[slot_adi] = shm
+            frame = np.ndarray(boyut, dtype=np.uint8, buffer=shm.buf)
+            sonuc = analiz.kare_analiz(frame, mesh, {"kuyruk": kuyruk_ms, "decode": decode_ms}, **secenekler)
+            del frame
+        except Exception:
+            sonuc = {"durum": "hata", "hata": traceback.format_exc()}
+        sonuc_gonder.send(("sonuc", is_no, sonuc))
+        # Büyük kareler için açılan geçici segmentler kalıcı tutulmaz
+        # (zaman aşımında API tarafı silmiş olabilir, o zaman hiç açılamamıştır).
+        if not slot_adi.startswith("bt_slot_") and slot_adi in slotlar:
+            slotlar.pop(slot_adi).close()
+
+    for shm in slotlar.values():
+        shm.close()
+    mesh.close()
+
+
+class _Isci:
+    """Bir işçi süreç ve ona ait iki tek yönlü pipe (iş, sonuç). Ölünce pipe'larıyla birlikte yenilenir."""
+
+    def __init__(self, ctx, cekirdek):
+        is_al, self.is_gonder = ctx.Pipe(duplex=False)
+        self.sonuc_al, sonuc_gonder = ctx.Pipe(duplex=False)
+        self.surec = ctx.Process(target=_surec_iscisi, args=(cekirdek, is_al, sonuc_gonder), daemon=True)
+        self.surec.start()
+        # Çocuğun uçları kapatılır: süreç ölünce sonuc_al EOF verir
+        is_al.close()
+        sonuc_gonder.close()
+        self.baslama = time.monotonic()
+        self.hazir = False
+        self.yuk = 0 # Gönderilip sonucu henüz gelmemiş iş (zaman aşımına uğrayanlar dahil)
+        self.gonder_kilidi = threading.Lock()
+
+    def kapat(self):
+        self.is_gonder.close()
+        self.sonuc_al.close()
+
+
+class SurecMotoru:
+    """
+    N işçi süreç + sabit sayıda shared memory slotu. Boş slot yoksa istek
+    MotorDolu ile reddedilir; slot sayısı aynı zamanda kabul kapasitesidir.
+    Her işçinin kendi iş/sonuç pipe'ı vardır: iş en az yüklü canlı işçiye
+    gönderilir, ölen işçi paylaşılan bir kuyruğun kilidini tutup diğerlerini
+    kilitleyemez. Zaman aşımına uğrayan işin slotu hemen geri alınır, geç gelen
+    sonucu yok sayılır. Ölen işçinin bütün işleri 'hata' ile biter; işçi
+    artan beklemeyle yeniden başlatılır, üst üste çok kısa ömürlüyse bırakılır.
+    """
+
+    def __init__(self, isci_sayisi=ISCI_SAYISI, kuyruk_limiti=KUYRUK_LIMITI, slot_bayt=SLOT_BAYT):
+        self.isci_sayisi = isci_sayisi
+        self.kapasite = isci_sayisi + kuyruk_limiti
+        self.slot_bayt = slot_bayt
+        # fork, MediaPipe/OpenCV thread'leri olan bir süreçte güvenli değil.
+        self._ctx = mp.get_context("spawn")
+
+        self._slotlar = {}
+        self._bos_slotlar = queue.SimpleQueue()
+        for i in range(self.kapasite):
+            shm = shared_memory.SharedMemory(name=f"bt_slot_{os.getpid()}_{i}", create=True, size=slot_bayt)
+            self._slotlar[shm.name] = shm
+            self._bos_slotlar.put(shm.name)
+
+        self._sayac = itertools.count()
+        self._bekleyenler = {} # iş no -> (future, loop, slot adı, geçici segment, işçi no)
+        self._kilit = threading.Lock()
+        self.yeniden_baslatilan = 0
+        self._kapaniyor = False
+        self._dur_al, self._dur_gonder = self._ctx.Pipe(duplex=False) # Okuyucuyu uyandırıp durdurur
+
+        cekirdekler = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else [None]
+        self._cekirdekler = [cekirdekler[i % len(cekirdekler)] for i in range(isci_sayisi)]
+        self._isciler = [_Isci(self._ctx, c) for c in self._cekirdekler]
+        self._cokus = [0] * isci_sayisi # Üst üste kısa ömürlü ölüm sayısı
+        self._yeniden_baslat = {} # işçi no -> yeniden başlatma zamanı (monotonic)
+        self._okuyucu = threading.Thread(target=self._sonuclari_oku, name="analiz-sonuc", daemon=True)
+        self._okuyucu.start()
+
+    @property
+    def hazir_isci(self):
+        return sum(1 for isci in self._isciler if isci is not None and isci.hazir)
+
+    def _serbest_birak(self, is_no):
+        """İşi bekleyenlerden çıkarıp slotunu geri verir. (future, loop) ya da iş zaten bırakıldıysa None."""
+        with self._kilit:
+            kayit = self._bekleyenler.pop(is_no, None)
+        if kayit is None:
+            return None
+        future, loop, slot_adi, gecici, _ = kayit
+        if gecici is not None:
+            gecici.close()
+            gecici.unlink()
+        self._bos_slotlar.put(slot_adi)
+        return future, loop
+
+    def _bitir(self, is_no, sonuc):
+        birakilan = self._serbest_birak(is_no)
+        if birakilan is not None: # Zaman aşımıyla vazgeçilmiş işin geç sonucu yok sayılır
+            future, loop = birakilan
+            try:
+                loop.call_soon_threadsafe(_sonucu_yaz, future, sonuc)
+            except RuntimeError: # Döngü kapanmış
+                pass
+
+    def _sonuclari_oku(self):
+        while True:
+            baglantilar = {self._dur_al: None}
+            for no, isci in enumerate(self._isciler):
+                if isci is not None:
+                    baglantilar[isci.sonuc_al] = no
+                    baglantilar[isci.surec.sentinel] = no
+            bekleme = ISCI_KONTROL_SN
+            if self._yeniden_baslat:
+                bekleme = max(0.0, min(self._yeniden_baslat.values()) - time.monotonic())
+            for hazir in mp_baglanti.wait(list(baglantilar), timeout=bekleme):
+                if hazir is self._dur_al:
+                    return
+                no = baglantilar[hazir]
+                isci = self._isciler[no]
+                if isci is None:
+                    continue # Aynı turda öldüğü anlaşıldı
+                if hazir is isci.sonuc_al:
+                    try:
+                        self._mesaji_isle(isci, isci.sonuc_al.recv())
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                # Sonuç pipe'ı kapandı ya da süreç bitti; önce pipe'ta kalan sonuçlar okunur
+                self._isci_oldu(no)
+            self._zamani_gelenleri_baslat()
+
+    def _mesaji_isle(self, isci, mesaj):
+        if mesaj[0] == "hazir":
+            isci.hazir = True
+        elif mesaj[0] == "sonuc":
+            _, is_no, sonuc = mesaj
+            with self._kilit:
+                isci.yuk -= 1
+            self._bitir(is_no, sonuc)
+
+    def _isci_oldu(self, no):
+        isci = self._isciler[no]
+        try:
+            while isci.sonuc_al.poll():
+                self._mesaji_isle(isci, isci.sonuc_al.recv())
+        except (EOFError, OSError):
+            pass
+        isci.surec.join(timeout=1)
+        with self._kilit:
+            self._isciler[no] = None
+            kalanlar = [is_no for is_no, kayit in self._bekleyenler.items() if kayit[4] == no]
+        isci.kapat()
+        for is_no in kalanlar:
+            self._bitir(is_no, {"durum": "hata", "hata": f"İşçi süreç öldü (pid {isci.surec.pid}, çıkış kodu {isci.surec.exitcode})"})
+        if self._kapaniyor:
+            return
+        omur = time.monotonic() - isci.baslama
+        self._cokus[no] = self._cokus[no] + 1 if omur < ISCI_KISA_OMUR_SN else 0
+        if self._cokus[no] > ISCI_COKUS_LIMITI:
+            print(f"Motor Hatası: işçi {no} üst üste {self._cokus[no]} kez kısa sürede öldü, yeniden başlatılmayacak")
+            return
+        bekleme = min(2 ** self._cokus[no] - 1, ISCI_EN_UZUN_BEKLEME_SN)
+        print(f"Motor Hatası: işçi süreç öldü (pid {isci.surec.pid}, çıkış kodu {isci.surec.exitcode}), "
+              f"{bekleme:.0f} sn sonra yeniden başlatılacak")
+        self._yeniden_baslat[no] = time.monotonic() + bekleme
+
+    def _zamani_gelenleri_baslat(self):
+        simdi = time.monotonic()
+        for no, zaman in list(self._yeniden_baslat.items()):
+            if zaman <= simdi and not self._kapaniyor:
+                del self._yeniden_baslat[no]
+                isci = _Isci(self._ctx, self._cekirdekler[no])
+                with self._kilit:
+                    self._isciler[no] = isci
+                self.yeniden_baslatilan += 1
+
+    def _kareyi_yerlestir(self, contents, slot_adi):
+        """Kareyi çözer ve slota (veya sığmıyorsa geçici bir segmente) yazar."""
+        t0 = time.perf_counter()
+        frame = analiz.goruntu_coz(contents)
+        if frame is None:
+            return None, None, None, None
+        gecici = None
+        if frame.nbytes <= self.slot_bayt:
+            shm = self._slotlar[slot_adi]
+        else:
+            gecici = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            shm = gecici
+        hedef = np.ndarray(frame.shape, dtype=np.uint8, buffer=shm.buf)
+        np.copyto(hedef, frame)
+        del hedef
+        return shm.name, frame.shape, gecici, (time.perf_counter() - t0) * 1000
+
+    def _gonder(self, is_no, kayit, is_):
+        """İşi en az yüklü canlı işçiye gönderir. Canlı işçi yoksa MotorDolu."""
+        with self._kilit:
+            adaylar = [(isci.yuk, no) for no, isci in enumerate(self._isciler) if isci is not None]
+            if not adaylar:
+                raise MotorDolu()
+            _, no = min(adaylar)
+            isci = self._isciler[no]
+            isci.yuk += 1
+            self._bekleyenler[is_no] = kayit + (no,)
+        try:
+            with isci.gonder_kilidi:
+                isci.is_gonder.send(is_)
+        except (OSError, ValueError): # Bu arada öldü: iş okuyucu tarafından 'hata' ile bitirilir
+            pass
+
+    async def analiz_et(self, contents, **secenekler):
+        """Analizi işçi süreçlerde çalıştırır. Boş slot ya da canlı işçi yoksa MotorDolu fırlatır."""
+        try:
+            slot_adi = self._bos_slotlar.get_nowait()
+        except queue.Empty:
+            raise MotorDolu()
+
+        try:
+            ad, boyut, gecici, decode_ms = await asyncio.to_thread(self._kareyi_yerlestir, contents, slot_adi)
+        except BaseException:
+            self._bos_slotlar.put(slot_adi)
+            raise
+        if ad is None:
+            self._bos_slotlar.put(slot_adi)
+            return {"durum": "gecersiz"}
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        is_no = next(self._sayac)
+        try:
+            self._gonder(is_no, (future, loop, slot_adi, gecici), (is_no, ad, boyut, time.monotonic(), decode_ms, secenekler))
+        except MotorDolu:
+            if gecici is not None:
+                gecici.close()
+                gecici.unlink()
+            self._bos_slotlar.put(slot_adi)
+            raise
+        # Slot, istemci vazgeçse bile işçi bitirince (okuyucu thread'de) geri verilir.
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), ISLEM_ZAMAN_ASIMI_SN)
+        except asyncio.TimeoutError:
+            # Vazgeçilen iş: slot hemen geri alınır, işçinin geç sonucu okuyucuda yok sayılır
+            self._serbest_birak(is_no)
+            raise
+
+    @property
+    def hazir(self):
+        return self.hazir_isci >= self.isci_sayisi
+
+    def doluluk(self):
+        bos = self._bos_slotlar.qsize()
+        return {"aktif": self.kapasite - bos, "kapasite": self.kapasite, "isci": self.isci_sayisi, "hazir_isci": self.hazir_isci}
+
+    def kapat(self):
+        self._kapaniyor = True
+        isciler = [isci for isci in self._isciler if isci is not None]
+        for isci in isciler:
+            try:
+                with isci.gonder_kilidi:
+                    isci.is_gonder.send(None)
+            except (OSError, ValueError):
+                pass
+        for isci in isciler:
+            isci.surec.join(timeout=10)
+        self._dur_gonder.send(None)
+        self._okuyucu.join(timeout=10)
+        # Sonucu gelmeyen işler asılı kalmaz
+        with self._kilit:
+            kalanlar = list(self._bekleyenler)
+        for is_no in kalanlar:
+            self._bitir(is_no, {"durum": "hata", "hata": "Motor kapatıldı"})
+        for isci in isciler:
+            isci.kapat()
+        for shm in self._slotlar.values():
+            shm.close()
+            shm.unlink()
+
+
+def _sonucu_yaz(future, sonuc):
+    if not future.done():
+        future.set_result(sonuc)
+
+
+def motor_olustur():
+    """ANALIZ_MOTOR_MODU ortam değişkenine göre motoru kurar."""
+    if MOTOR_MODU == "process":
+        return SurecMotoru()
+    return IsParcacigiMotoru()
@@ -0,0 +1,179 @@
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# SONUÇ ÖNBELLEĞİ (İçerik adresli)
+# ==========================================
+# Mobil istemciler agresif retry yapıyor, Streamlit de "Analiz Et"e iki kez
+# basılınca aynı resmi tekrar yolluyor. Aynı baytlar aynı deterministik
+# analizi verir; burada sadece o kısım (skorlar, indeksler, ana_sorun) tutulur.
+# Ürün önerisi önbellekten gelen kategoriyle her seferinde yeniden çekilir ki
+# rastgele ürün rotasyonu bozulmasın.
+
+ONBELLEK_KAPASITE = int(os.environ.get("ONBELLEK_KAPASITE", 1024))
+ONBELLEK_TTL_SN = float(os.environ.get("ONBELLEK_TTL_SN", 3600))
+ONBELLEK_DIZINI = os.environ.get("ONBELLEK_DIZINI", "") # Boşsa disk katmanı kapalı
+ONBELLEK_DISK_KAPASITE = int(os.environ.get("ONBELLEK_DISK_KAPASITE", 20000)) # Disk katmanında en fazla kayıt (0: sınırsız)
+ONBELLEK_DISK_TARAMA_SN = float(os.environ.get("ONBELLEK_DISK_TARAMA_SN", 300)) # Disk temizliği aralığı (0: kapalı)
+
+
+def anahtar_uret(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+
+class SonucOnbellegi:
+    """
+    LRU + TTL'li süreç içi önbellek, isteğe bağlı disk katmanıyla.
+    Disk katmanı süreçler/yeniden başlatmalar arasında paylaşılır. Süresi
+    geçen dosya okunurken silinir; ayrıca arka plan thread'i her
+    disk_tarama_sn'de süresi geçenleri siler ve disk_kapasite aşıldıysa en
+    eski yazılanlardan başlayarak fazlasını atar (bkz. diski_tara).
+    """
+
+    def __init__(self, kapasite=ONBELLEK_KAPASITE, ttl_sn=ONBELLEK_TTL_SN, disk_dizini=ONBELLEK_DIZINI,
+                 disk_kapasite=ONBELLEK_DISK_KAPASITE, disk_tarama_sn=ONBELLEK_DISK_TARAMA_SN):
+        self.kapasite = kapasite
+        self.ttl_sn = ttl_sn
+        self.disk_dizini = disk_dizini or None
+        self.disk_kapasite = disk_kapasite
+        self.disk_tarama_sn = disk_tarama_sn
+        if self.disk_dizini:
+            os.makedirs(self.disk_dizini, exist_ok=True)
+        self._kayitlar = OrderedDict() # anahtar -> (eklenme zamanı, sonuç)
+        self._kilit = threading.Lock()
+        self._izleyici = None
+        self.isabet = 0
+        self.disk_isabet = 0
+        self.iska = 0
+        self.tahliye = 0
+        self.disk_tahliye = 0
+
+    def al(self, anahtar):
+        """Sonucun kopyasını döner, yoksa ya da süresi geçtiyse None."""
+        simdi = time.time()
+        with self._kilit:
+            kayit = self._kayitlar.get(anahtar)
+            if kayit is not None:
+                if simdi - kayit[0] <= self.ttl_sn:
+                    self._kayitlar.move_to_end(anahtar)
+                    self.isabet += 1
+                    return dict(kayit[1])
+                del self._kayitlar[anahtar]
+
+        sonuc = self._diskten_oku(anahtar, simdi)
+        with self._kilit:
+            if sonuc is None:
+                self.iska += 1
+                return None
+            self.disk_isabet += 1
+            self._bellege_yaz(anahtar, sonuc, simdi)
+        return dict(sonuc)
+
+    def koy(self, anahtar, sonuc):
+        simdi = time.time()
+        with self._kilit:
+            self._bellege_yaz(anahtar, dict(sonuc), simdi)
+            if self.disk_dizini and self.disk_tarama_sn > 0 and self._izleyici is None:
+                self._izleyici = threading.Thread(target=self._izle, name="onbellek-disk", daemon=True)
+                self._izleyici.start()
+        self._diske_yaz(anahtar, sonuc)
+
+    def _bellege_yaz(self, anahtar, sonuc, zaman):
+        self._kayitlar[anahtar] = (zaman, sonuc)
+        self._kayitlar.move_to_end(anahtar)
+        while len(self._kayitlar) > self.kapasite:
+            self._kayitlar.popitem(last=False)
+            self.tahliye += 1
+
+    def _disk_yolu(self, anahtar):
+        return os.path.join(self.disk_dizini, anahtar[:2], anahtar + ".json")
+
+    def _diskten_oku(self, anahtar, simdi):
+        if not self.disk_dizini:
+            return None
+        yol = self._disk_yolu(anahtar)
+        try:
+            if simdi - os.path.getmtime(yol) > self.ttl_sn:
+                os.remove(yol)
+                with self._kilit:
+                    self.disk_tahliye += 1
+                return None
+            with open(yol, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _diske_yaz(self, anahtar, sonuc):
+        if not self.disk_dizini:
+            return
+        yol = self._disk_yolu(anahtar)
+        try:
+            os.makedirs(os.path.dirname(yol), exist_ok=True)
+            gecici = f"{yol}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(gecici, "w", encoding="utf-8") as f:
+                json.dump(sonuc, f, ensure_ascii=False)
+            os.replace(gecici, yol) # Yarım yazılmış dosya okunmasın
+        except OSError as e:
+            print(f"Önbellek Disk Hatası: {e}")
+
+    # --- Disk temizliği ---
+
+    def _izle(self):
+        while True:
+            time.sleep(self.disk_tarama_sn)
+            try:
+                self.diski_tara()
+            except Exception as e:
+                print(f"Önbellek Disk Hatası: {e}")
+
+    def diski_tara(self, simdi=None):
+        """
+        Süresi geçen dosyaları siler; kalanlar disk_kapasite'yi aşıyorsa en
+        eski yazılanları atar. Silinen kayıt sayısını döner. Yarım kalmış
+        geçici dosyalar da TTL'den sonra silinir (sayılmaz).
+        """
+        if not self.disk_dizini:
+            return 0
+        simdi = time.time() if simdi is None else simdi
+        dosyalar = []
+        silinen = 0
+        for alt in os.scandir(self.disk_dizini):
+            if not alt.is_dir():
+                continue
+            for dosya in os.scandir(alt.path):
+                try:
+                    mtime = dosya.stat().st_mtime
+                    if simdi - mtime > self.ttl_sn:
+                        os.remove(dosya.path)
+                        silinen += dosya.name.endswith(".json")
+                    elif dosya.name.endswith(".json"):
+                        dosyalar.append((mtime, dosya.path))
+                except OSError:
+                    continue # Başka süreç aynı anda sildi/yazdı
+        if self.disk_kapasite and len(dosyalar) > self.disk_kapasite:
+            for _, yol in heapq.nsmallest(len(dosyalar) - self.disk_kapasite, dosyalar):
+                try:
+                    os.remove(yol)
+                    silinen += 1
+                except OSError:
+                    pass
+        with self._kilit:
+            self.disk_tahliye += silinen
+        return silinen
+
+    def istatistik(self):
+        with self._kilit:
+            return {
+                "isabet": self.isabet,
+                "disk_isabet": self.disk_isabet,
+                "iska": self.iska,
+                "tahliye": self.tahliye,
+                "disk_tahliye": self.disk_tahliye,
+                "boyut": len(self._kayitlar),
+                "kapasite": self.kapasite,
+            }
@@ -0,0 +1,157 @@
+import os
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ==========================================
+# ÜRÜN ÖNERİ MOTORU (Vektörel skorlama)
+# ==========================================
+# en_uygun_urunu_bul birkaç elle ayarlanmış eşikle beş kovadan birini seçip
+# random.choice yapıyordu; esik_deger ve fiyat hiç kullanılmıyordu. Burada
+# analizin tamamı (leke, kırışıklık, cilt tipi, kızarıklık, göz altı) bir
+# özellik vektörüne çevrilir ve tüm katalog tek NumPy işlemiyle ürünlerin
+# hedef profillerine göre skorlanır. Fiyat/marka filtreleri aynı işlemde
+# maske olarak uygulanır.
+#
+# Nicemlenmiş vektör + filtre -> en iyi adaylar sonucu LRU'da tutulur; katalog
+# sürümü (katalog_meta.surum) değişince matrisler ve önbellek yeniden kurulur.
+# Adaylar arasından rastgele seçim yapılır: aynı profildeki ürünler dönüşümlü
+# önerilmeye devam eder.
+
+ONERI_ONBELLEK_KAPASITE = int(os.environ.get("ONERI_ONBELLEK_KAPASITE", 4096))
+ADAY_SAYISI = int(os.environ.get("ONERI_ADAY_SAYISI", 5)) # Rastgele seçilecek en iyi K ürün
+ADAY_TOLERANSI = 0.25 # En iyi skordan bu kadar kötü olan aday elenir
+
+LEKE_OLCEGI = 40 # Bu kadar leke = leke ekseninde 1.0 ("Problemli" eşiği)
+KIRISIKLIK_NICEMI = 5 # kirisiklik_indeksi bu adımlarla önbellek anahtarına girer
+
+# Özellik ekseni ve ağırlığı (uzaklıktaki payı)
+EKSENLER = ("leke", "kirisiklik", "kuru", "yagli", "kizariklik", "goz_alti")
+AGIRLIKLAR = np.array([2.0, 2.0, 1.0, 1.0, 0.5, 0.5], dtype=np.float32)
+
+# Kategori -> hedef profil (eksik eksenler 0). Hem API (kuru, yagli, ...) hem
+# masaüstü/admin (Problemli, Yorgun, ...) kategorileri; bilinmeyen kategori
+# "normal" gibi davranır.
+KATEGORI_PROFILLERI = {
+    "kuru": {"kuru": 1.0},
+    "Kuru": {"kuru": 1.0},
+    "yagli": {"yagli": 1.0},
+    "leke": {"leke": 1.0},
+    "Problemli": {"leke": 1.0, "kizariklik": 0.5},
+    "kirisik": {"kirisiklik": 1.0},
+    "Yorgun": {"leke": 0.4, "goz_alti": 1.0},
+    "normal": {},
+    "Mükemmel": {},
+}
+
+
+def ozellik_vektoru(sonuc):
+    """Analiz sonucu -> (nicemlenmiş leke sayısı, nicemlenmiş kırışıklık, kuru, yağlı, kızarıklık, göz altı)."""
+    cilt_tipi = sonuc.get("cilt_tipi", "")
+    kuru = "Kuru" in cilt_tipi or sonuc.get("db_kategori") == "Kuru Cilt"
+    yagli = "Yağlı" in cilt_tipi or sonuc.get("db_kategori") == "Yağlı Cilt"
+    kirisiklik = int(round(sonuc.get("kirisiklik_indeksi", 0) / KIRISIKLIK_NICEMI)) * KIRISIKLIK_NICEMI
+    return (int(sonuc.get("leke_sayisi", 0)), kirisiklik, kuru, yagli,
+            bool(sonuc.get("kizariklik")), bool(sonuc.get("goz_alti_morlugu")))
+
+
+class _Matrisler:
+    """Bir katalog görünümünün skorlama dizileri."""
+
+    def __init__(self, gorunum):
+        self.surum = gorunum.surum
+        self.urunler = gorunum.urunler
+        n = len(self.urunler)
+        self.profiller = np.zeros((n, len(EKSENLER)), dtype=np.float32)
+        self.esikler = np.zeros(n, dtype=np.int64)
+        self.fiyatlar = np.full(n, np.nan, dtype=np.float64)
+        self.marka_kodlari = np.zeros(n, dtype=np.int64)
+        self.markalar = {} # küçük harf marka -> kod
+        for i, urun in enumerate(self.urunler):
+            for eksen, deger in KATEGORI_PROFILLERI.get(urun["kategori"], {}).items():
+                self.profiller[i, EKSENLER.index(eksen)] = deger
+            # Eşikli ürün o kadar lekeye yönelik: leke hedefi eşikten aşağı olamaz
+            self.profiller[i, 0] = max(self.profiller[i, 0], min(urun["esik_deger"] / LEKE_OLCEGI, 1.0))
+            self.esikler[i] = urun["esik_deger"]
+            if urun["fiyat"] is not None:
+                self.fiyatlar[i] = urun["fiyat"]
+            self.marka_kodlari[i] = self.markalar.setdefault((urun["marka"] or "").casefold(), len(self.markalar))
+        self.maks_esik = int(self.esikler.max()) if n else 0
+
+    def en_iyiler(self, vektor, fiyat_ust=None, markalar=None, k=ADAY_SAYISI):
+        """Filtrelerden geçen en iyi k ürünün indeksleri (en iyiden başlayarak) ve skorları."""
+        leke, kirisiklik, kuru, yagli, kizariklik, goz_alti = vektor
+        f = np.array([min(leke / LEKE_OLCEGI, 1.0), min(kirisiklik / 100, 1.0),
+                      kuru, yagli, kizariklik, goz_alti], dtype=np.float32)
+        skorlar = -(((self.profiller - f) ** 2) @ AGIRLIKLAR)
+        maske = self.esikler <= leke
+        if fiyat_ust is not None:
+            maske &= self.fiyatlar <= fiyat_ust # Fiyatı bilinmeyen ürün (NaN) elenir
+        if markalar:
+            kodlar = [self.markalar[m] for m in markalar if m in self.markalar]
+            maske &= np.isin(self.marka_kodlari, kodlar)
+        skorlar = np.where(maske, skorlar, -np.inf)
+        k = min(k, int(maske.sum()))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        secilen = np.argpartition(-skorlar, k - 1)[:k]
+        secilen = secilen[np.argsort(-skorlar[secilen], kind="stable")]
+        return secilen, skorlar[secilen]
+
+
+class Onerici:
+    """
+    Katalog üzerinde önbellekli öneri. oner() thread-safe'tir; matrisler
+    katalog sürümü değişince ilk istekte yeniden kurulur.
+    """
+
+    def __init__(self, katalog, kapasite=ONERI_ONBELLEK_KAPASITE):
+        self.katalog = katalog
+        self.kapasite = kapasite
+        self._matrisler = None
+        self._onbellek = OrderedDict() # (vektör, fiyat_ust, markalar) -> aday ürünler
+        self._kilit = threading.Lock()
+        self.isabet = 0
+        self.iska = 0
+
+    def _guncel_matrisler(self):
+        gorunum = self.katalog.gorunum
+        matrisler = self._matrisler
+        if matrisler is None or matrisler.surum != gorunum.surum:
+            matrisler = _Matrisler(gorunum)
+            with self._kilit:
+                self._matrisler = matrisler
+                self._onbellek.clear()
+        return matrisler
+
+    def adaylar(self, sonuc, fiyat_ust=None, markalar=None):
+        """Sonuca en uygun, birbirine yakın skorlu ürünler (filtreye uyan yoksa boş)."""
+        matrisler = self._guncel_matrisler()
+        vektor = ozellik_vektoru(sonuc)
+        # Eşiklerin hepsini geçen leke sayıları aynı maskeyi verir; leke ekseni LEKE_OLCEGI'nde doyar
+        vektor = (min(vektor[0], max(matrisler.maks_esik, LEKE_OLCEGI)),) + vektor[1:]
+        markalar = frozenset(m.casefold() for m in markalar) if markalar else None
+        anahtar = (vektor, fiyat_ust, markalar)
+        with self._kilit:
+            adaylar = self._onbellek.get(anahtar)
+            if adaylar is not None:
+                self._onbellek.move_to_end(anahtar)
+                self.isabet += 1
+                return adaylar
+            self.iska += 1
+
+        secilen, skorlar = matrisler.en_iyiler(vektor, fiyat_ust, markalar)
+        adaylar = tuple(matrisler.urunler[i] for i, s in zip(secilen, skorlar) if s >= skorlar[0] - ADAY_TOLERANSI)
+        with self._kilit:
+            if self._matrisler is matrisler: # Arada katalog değiştiyse eski sonucu saklama
+                self._onbellek[anahtar] = adaylar
+                while len(self._onbellek) > self.kapasite:
+                    self._onbellek.popitem(last=False)
+        return adaylar
+
+    def oner(self, sonuc, fiyat_ust=None, markalar=None):
+        """Adaylardan rastgele biri; filtreye uyan ürün yoksa None."""
+        adaylar = self.adaylar(sonuc, fiyat_ust, markalar)
+        return random.choice(adaylar) if adaylar else None
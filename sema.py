@@ -0,0 +1,189 @@
+import katalog
+
+# ==========================================
+# VERİTABANI ŞEMASI (Sürümlü)
+# ==========================================
+# beauty.db'nin şeması PRAGMA user_version ile sürümlenir. Her göç
+# (GOCLER'deki fonksiyon) tek transaction'da uygulanır ve sürümü bir artırır;
+# yarıda kalan göç geri alınır, bir sonraki açılışta baştan denenir.
+# Sürüm 0 (sürümsüz) dosyalar da 1. göçten geçer: oradaki her adım
+# IF NOT EXISTS ile yazıldığı için önceden kurulmuş tablolar korunur.
+#
+# Yeni göç eklerken eskilere dokunulmaz; değişiklik yeni bir fonksiyon olarak
+# listenin sonuna eklenir.
+
+SKOR_DILIMI = 10 # Skor dağılımında dilim genişliği (0-9, 10-19, ..., 90-100)
+
+
+def _surum_1(conn):
+    """Analizler, ürün kataloğu, özet tabloları ve geçmiş indeksleri."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analizler (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarih TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            leke_sayisi INTEGER,
+            genel_skor INTEGER,
+            onerilen_urun TEXT
+        )
+    ''')
+    katalog.tablo_olustur(conn)
+
+    # Özetler: sadece INSERT izlenir, arşivlenip silinen satırlar özetlerde kalır
+    kurulu = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'analizler_ozet'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS gunluk_ozet (
+            gun TEXT PRIMARY KEY,
+            adet INTEGER NOT NULL,
+            skor_toplam INTEGER NOT NULL,
+            leke_toplam INTEGER NOT NULL,
+            son_tarih TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS gunluk_skor_dagilimi (
+            gun TEXT NOT NULL,
+            dilim INTEGER NOT NULL,
+            adet INTEGER NOT NULL,
+            PRIMARY KEY (gun, dilim)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS urun_oneri_sayilari (
+            urun TEXT PRIMARY KEY,
+            adet INTEGER NOT NULL,
+            son_tarih TIMESTAMP
+        )
+    ''')
+    if not kurulu:
+        # Tetikleyiciden önceki satırlar bir kez, tetikleyiciyle aynı transaction'da sayılır
+        conn.execute('''
+            INSERT INTO gunluk_ozet (gun, adet, skor_toplam, leke_toplam, son_tarih)
+            SELECT date(tarih), COUNT(*), TOTAL(genel_skor), TOTAL(leke_sayisi), MAX(tarih) FROM analizler GROUP BY date(tarih)
+        ''')
+        conn.execute(f'''
+            INSERT INTO gunluk_skor_dagilimi (gun, dilim, adet)
+            SELECT date(tarih), MIN(MAX(COALESCE(genel_skor, 0), 0) / {SKOR_DILIMI}, 100 / {SKOR_DILIMI} - 1), COUNT(*)
+            FROM analizler GROUP BY 1, 2
+        ''')
+        conn.execute('''
+            INSERT INTO urun_oneri_sayilari (urun, adet, son_tarih)
+            SELECT onerilen_urun, COUNT(*), MAX(tarih) FROM analizler WHERE onerilen_urun IS NOT NULL GROUP BY onerilen_urun
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER analizler_ozet AFTER INSERT ON analizler
+            BEGIN
+                INSERT INTO gunluk_ozet (gun, adet, skor_toplam, leke_toplam, son_tarih)
+                VALUES (date(NEW.tarih), 1, COALESCE(NEW.genel_skor, 0), COALESCE(NEW.leke_sayisi, 0), NEW.tarih)
+                ON CONFLICT (gun) DO UPDATE SET adet = adet + 1, skor_toplam = skor_toplam + excluded.skor_toplam,
+                    leke_toplam = leke_toplam + excluded.leke_toplam, son_tarih = MAX(son_tarih, excluded.son_tarih);
+                INSERT INTO gunluk_skor_dagilimi (gun, dilim, adet)
+                VALUES (date(NEW.tarih), MIN(MAX(COALESCE(NEW.genel_skor, 0), 0) / {SKOR_DILIMI}, 100 / {SKOR_DILIMI} - 1), 1)
+                ON CONFLICT (gun, dilim) DO UPDATE SET adet = adet + 1;
+                INSERT INTO urun_oneri_sayilari (urun, adet, son_tarih)
+                SELECT NEW.onerilen_urun, 1, NEW.tarih WHERE NEW.onerilen_urun IS NOT NULL
+                ON CONFLICT (urun) DO UPDATE SET adet = adet + 1, son_tarih = MAX(son_tarih, excluded.son_tarih);
+            END
+        ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS analizler_tarih ON analizler (tarih, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS analizler_urun_tarih ON analizler (onerilen_urun, tarih, id)')
+
+
+def _surum_2(conn):
+    """
+    Ürünlere tamsayı referans: analizler.urun_id ve urun_oneri_sayilari.urun_id
+    (urunler.id). onerilen_urun metni kayıt anındaki ad olarak kalır (arşiv,
+    dışa aktarım, katalogda olmayan varsayılan ürün).
+    Ad -> id eşlemesi 'urunler'den yapılır: katalog bu göçten önce tohumlanmış
+    olmalı (bkz. database.tablolari_olustur).
+    """
+    sutunlar = [s[1] for s in conn.execute('PRAGMA table_info(analizler)')]
+    if "urun_id" not in sutunlar:
+        conn.execute('ALTER TABLE analizler ADD COLUMN urun_id INTEGER REFERENCES urunler (id)')
+    # Aynı adlı birden fazla ürün (farklı marka) varsa ilk eklenen
+    conn.execute('''
+        UPDATE analizler SET urun_id = (SELECT MIN(u.id) FROM urunler u WHERE u.urun_adi = analizler.onerilen_urun)
+        WHERE urun_id IS NULL AND onerilen_urun IS NOT NULL
+    ''')
+    conn.execute('DROP INDEX IF EXISTS analizler_urun_tarih')
+    conn.execute('CREATE INDEX IF NOT EXISTS analizler_urun_id ON analizler (urun_id, tarih, id)')
+
+    # Tetikleyici eski tabloya bağlı: tablo değişmeden önce kaldırılır, sonda yeniden kurulur
+    conn.execute('DROP TRIGGER IF EXISTS analizler_ozet')
+    # Katalogda karşılığı olmayan adların (varsayılan ürün) sayıları düşer
+    conn.execute('''
+        CREATE TABLE urun_oneri_sayilari_yeni (
+            urun_id INTEGER PRIMARY KEY REFERENCES urunler (id),
+            adet INTEGER NOT NULL,
+            son_tarih TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO urun_oneri_sayilari_yeni (urun_id, adet, son_tarih)
+        SELECT (SELECT MIN(u.id) FROM urunler u WHERE u.urun_adi = o.urun) AS urun_id, SUM(o.adet), MAX(o.son_tarih)
+        FROM urun_oneri_sayilari o WHERE urun_id IS NOT NULL GROUP BY 1
+    ''')
+    conn.execute('DROP TABLE urun_oneri_sayilari')
+    conn.execute('ALTER TABLE urun_oneri_sayilari_yeni RENAME TO urun_oneri_sayilari')
+
+    conn.execute(f'''
+        CREATE TRIGGER analizler_ozet AFTER INSERT ON analizler
+        BEGIN
+            INSERT INTO gunluk_ozet (gun, adet, skor_toplam, leke_toplam, son_tarih)
+            VALUES (date(NEW.tarih), 1, COALESCE(NEW.genel_skor, 0), COALESCE(NEW.leke_sayisi, 0), NEW.tarih)
+            ON CONFLICT (gun) DO UPDATE SET adet = adet + 1, skor_toplam = skor_toplam + excluded.skor_toplam,
+                leke_toplam = leke_toplam + excluded.leke_toplam, son_tarih = MAX(son_tarih, excluded.son_tarih);
+            INSERT INTO gunluk_skor_dagilimi (gun, dilim, adet)
+            VALUES (date(NEW.tarih), MIN(MAX(COALESCE(NEW.genel_skor, 0), 0) / {SKOR_DILIMI}, 100 / {SKOR_DILIMI} - 1), 1)
+            ON CONFLICT (gun, dilim) DO UPDATE SET adet = adet + 1;
+            INSERT INTO urun_oneri_sayilari (urun_id, adet, son_tarih)
+            SELECT NEW.urun_id, 1, NEW.tarih WHERE NEW.urun_id IS NOT NULL
+            ON CONFLICT (urun_id) DO UPDATE SET adet = adet + 1, son_tarih = MAX(son_tarih, excluded.son_tarih);
+        END
+    ''')
+
+    # Eski veritabanlarından (beauty_tech.db) yapılan aktarımlar: tekrar çalıştırmada atlanır (bkz. goc.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS aktarimlar (
+            kaynak TEXT PRIMARY KEY,
+            satir INTEGER NOT NULL,
+            tarih TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _surum_3(conn):
+    """
+    katalog_meta.json_mtime: data.json'un son aktarılan mtime'ı (bkz.
+    katalog.Katalog.kontrol_et). NULL: henüz kaydedilmedi, ilk kontrolde
+    dosya yeniden aktarılmadan doldurulur.
+    """
+    conn.execute('ALTER TABLE katalog_meta ADD COLUMN json_mtime REAL')
+
+
+GOCLER = [_surum_1, _surum_2, _surum_3]
+SON_SURUM = len(GOCLER)
+
+
+def surum(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def guncelle(conn, son=SON_SURUM):
+    """
+    Eksik göçleri 'son' sürüme kadar sırayla uygular. (eski sürüm, yeni sürüm)
+    döner. conn: varsayılan (legacy) transaction modu.
+    """
+    baslangic = surum(conn)
+    if baslangic > SON_SURUM:
+        raise RuntimeError(f"Veritabanı şeması ({baslangic}) bu koddan ({SON_SURUM}) yeni.")
+    for hedef in range(baslangic + 1, son + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            GOCLER[hedef - 1](conn)
+            conn.execute(f'PRAGMA user_version = {hedef}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return baslangic, max(baslangic, son)